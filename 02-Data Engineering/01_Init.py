@@ -28,16 +28,47 @@
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## Creating the watermark table in Bronze layer
+# MAGIC
+# MAGIC High-water mark of every source table, used by the incremental extraction of `12_ETL_Bronze_PySpark`.
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE TABLE IF NOT EXISTS jeromeaymon_lakehouse.bronze.load_watermark (
+# MAGIC     source_table STRING NOT NULL, -- Source table, e.g. SalesLT.Address
+# MAGIC     target_table STRING, -- Bronze table
+# MAGIC     watermark_column STRING, -- Column holding the last modification date
+# MAGIC     key_column STRING, -- Integer key breaking the ties on the watermark column
+# MAGIC     hwm_value TIMESTAMP, -- Highest modification date loaded
+# MAGIC     hwm_key BIGINT, -- Highest key loaded with that modification date
+# MAGIC     rows_extracted BIGINT, -- Rows extracted by the last run
+# MAGIC     updated_at TIMESTAMP
+# MAGIC )
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## Creating tables in Silver layer
 # MAGIC
-# MAGIC We add for each table an incremental surrogate key together with technical fields columns. 
+# MAGIC We add for each table a surrogate key together with technical fields columns. The surrogate key is not an identity
+# MAGIC column but a hash of the business key and of the start of validity, computed by the loads (`surrogate_key_expr` in
+# MAGIC `20_SCD2_Lib`): several tables can be written at the same time. Tables created with identity keys are migrated by
+# MAGIC `03_Migrate_Surrogate_Keys`.
+# MAGIC
+# MAGIC The tables are clustered on the current version flag `_tf_is_current`, the month of `_tf_valid_from` then the
+# MAGIC business key (its first two columns at most, liquid clustering takes four columns): once clustered (`OPTIMIZE`,
+# MAGIC run by `22_ETL_Silver_PySpark`), current and closed versions are in separate files and the readers filtering on
+# MAGIC `_tf_is_current` skip the files of the history using the min/max statistics of the flag. The validity month and
+# MAGIC the key form the interval index of the point-in-time queries (`as_of`, `history` in `20_SCD2_Lib`).
+# MAGIC Their Change Data Feed is enabled for the current snapshot tables below.
 
 # COMMAND ----------
 
 # MAGIC %sql
 # MAGIC CREATE OR REPLACE TABLE silver.address (
-# MAGIC     _tf_id BIGINT GENERATED ALWAYS AS IDENTITY (START WITH 1 INCREMENT BY 1) PRIMARY KEY NOT NULL, -- Incremental surrogate key
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
 # MAGIC
 # MAGIC     -- Source table columns
 # MAGIC     address_id INT,
@@ -51,17 +82,21 @@
 # MAGIC     modified_date TIMESTAMP,
 # MAGIC
 # MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
 # MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
 # MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
 # MAGIC     _tf_create_date TIMESTAMP,
 # MAGIC     _tf_update_date TIMESTAMP
-# MAGIC )
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, address_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
 
 # COMMAND ----------
 
 # MAGIC %sql
 # MAGIC CREATE OR REPLACE TABLE silver.customer (
-# MAGIC     _tf_id BIGINT GENERATED ALWAYS AS IDENTITY (START WITH 1 INCREMENT BY 1) PRIMARY KEY NOT NULL, -- Incremental surrogate key
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
 # MAGIC
 # MAGIC     -- Source table columns
 # MAGIC     customer_id INT,
@@ -81,17 +116,21 @@
 # MAGIC     modified_date TIMESTAMP,
 # MAGIC
 # MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
 # MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
 # MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
 # MAGIC     _tf_create_date TIMESTAMP,
 # MAGIC     _tf_update_date TIMESTAMP
-# MAGIC )
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, customer_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
 
 # COMMAND ----------
 
 # MAGIC %sql
 # MAGIC CREATE OR REPLACE TABLE silver.sales_order_header (
-# MAGIC     _tf_id BIGINT GENERATED ALWAYS AS IDENTITY (START WITH 1 INCREMENT BY 1) PRIMARY KEY NOT NULL, -- Incremental surrogate key
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
 # MAGIC
 # MAGIC     -- Source table columns
 # MAGIC     sales_order_id INT,
@@ -118,17 +157,21 @@
 # MAGIC     modified_date TIMESTAMP,
 # MAGIC
 # MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
 # MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
 # MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
 # MAGIC     _tf_create_date TIMESTAMP,
 # MAGIC     _tf_update_date TIMESTAMP
-# MAGIC )
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, sales_order_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
 
 # COMMAND ----------
 
 # MAGIC %sql
 # MAGIC CREATE OR REPLACE TABLE silver.sales_order_detail (
-# MAGIC     _tf_id BIGINT GENERATED ALWAYS AS IDENTITY (START WITH 1 INCREMENT BY 1) PRIMARY KEY NOT NULL, -- Incremental surrogate key
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
 # MAGIC
 # MAGIC     -- Source table columns
 # MAGIC     sales_order_id INT,
@@ -142,14 +185,439 @@
 # MAGIC     modified_date TIMESTAMP,
 # MAGIC
 # MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
+# MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
+# MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, sales_order_id, sales_order_detail_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC Bloom filter index on the order line keys: a lookup of one order or one line (support, reconciliation) only reads
+# MAGIC the files whose filter may contain the key. Each file's filter is written with the file, so files written before
+# MAGIC the index are only covered once rewritten (`OPTIMIZE`). `numItems` is the expected number of distinct values per
+# MAGIC file, `fpp` the false positive rate.
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE BLOOMFILTER INDEX ON TABLE silver.sales_order_detail
+# MAGIC FOR COLUMNS (
+# MAGIC   sales_order_id OPTIONS (fpp = 0.01, numItems = 250000),
+# MAGIC   sales_order_detail_id OPTIONS (fpp = 0.01, numItems = 1000000)
+# MAGIC );
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.customeraddress (
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     customer_id INT,
+# MAGIC     address_id INT,
+# MAGIC     address_type STRING,
+# MAGIC     rowguid CHAR(36),
+# MAGIC     modified_date TIMESTAMP,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
+# MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
+# MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, customer_id, address_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.product (
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     product_id INT,
+# MAGIC     name STRING,
+# MAGIC     product_number STRING,
+# MAGIC     color STRING,
+# MAGIC     standard_cost DECIMAL(19,4),
+# MAGIC     list_price DECIMAL(19,4),
+# MAGIC     size STRING,
+# MAGIC     weight DECIMAL(8,2),
+# MAGIC     product_category_id INT,
+# MAGIC     product_model_id INT,
+# MAGIC     sell_start_date TIMESTAMP,
+# MAGIC     sell_end_date TIMESTAMP,
+# MAGIC     discontinued_date TIMESTAMP,
+# MAGIC     thumbnail_photo_file_name STRING,
+# MAGIC     rowguid CHAR(36),
+# MAGIC     modified_date TIMESTAMP,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
+# MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
+# MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, product_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.productcategory (
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     product_category_id INT,
+# MAGIC     parent_product_category_id INT,
+# MAGIC     name STRING,
+# MAGIC     rowguid CHAR(36),
+# MAGIC     modified_date TIMESTAMP,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
+# MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
+# MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, product_category_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.productdescription (
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     product_description_id INT,
+# MAGIC     description STRING,
+# MAGIC     rowguid CHAR(36),
+# MAGIC     modified_date TIMESTAMP,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
+# MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
+# MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, product_description_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.productmodel (
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     product_model_id INT,
+# MAGIC     name STRING,
+# MAGIC     catalog_description STRING,
+# MAGIC     rowguid CHAR(36),
+# MAGIC     modified_date TIMESTAMP,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
+# MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
+# MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, product_model_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.productmodelproductdescription (
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     product_model_id INT,
+# MAGIC     product_description_id INT,
+# MAGIC     culture STRING,
+# MAGIC     rowguid CHAR(36),
+# MAGIC     modified_date TIMESTAMP,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
+# MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
+# MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, product_model_id, product_description_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.vgetallcategories (
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     product_category_id INT,
+# MAGIC     parent_product_category_name STRING,
+# MAGIC     name STRING,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
+# MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
+# MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, product_category_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.vproductanddescription (
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     product_id INT,
+# MAGIC     culture STRING,
+# MAGIC     name STRING,
+# MAGIC     product_model STRING,
+# MAGIC     description STRING,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
+# MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
+# MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, product_id, culture)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.vproductmodelcatalogdescription (
+# MAGIC     _tf_id BIGINT PRIMARY KEY NOT NULL, -- Surrogate key: hash of the business key and _tf_valid_from (see 20_SCD2_Lib)
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     product_model_id INT,
+# MAGIC     name STRING,
+# MAGIC     summary STRING,
+# MAGIC     manufacturer STRING,
+# MAGIC     copyright STRING,
+# MAGIC     producturl STRING,
+# MAGIC     warrantyperiod STRING,
+# MAGIC     warrantydescription STRING,
+# MAGIC     noofyears STRING,
+# MAGIC     maintenancedescription STRING,
+# MAGIC     wheel STRING,
+# MAGIC     saddle STRING,
+# MAGIC     pedal STRING,
+# MAGIC     bikeframe STRING,
+# MAGIC     crankset STRING,
+# MAGIC     pictureangle STRING,
+# MAGIC     picturesize STRING,
+# MAGIC     productphotoid STRING,
+# MAGIC     material STRING,
+# MAGIC     color STRING,
+# MAGIC     productline STRING,
+# MAGIC     style STRING,
+# MAGIC     riderexperience STRING,
+# MAGIC     rowguid CHAR(36),
+# MAGIC     modifieddate TIMESTAMP,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT, -- Fingerprint of the tracked columns (see 20_SCD2_Lib)
 # MAGIC     _tf_valid_from TIMESTAMP, -- Start of record validity
 # MAGIC     _tf_valid_to TIMESTAMP, -- End of record validity (NULL indicates current record)
+# MAGIC     _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL), -- Current version flag, first clustering column
+# MAGIC     _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE)), -- Interval index bucket (see as_of in 20_SCD2_Lib)
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (_tf_is_current, _tf_valid_from_month, product_model_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC Current snapshot of the silver tables read by gold: one row per business key, synchronized from the Change Data
+# MAGIC Feed of the history table after every load (see `sync_current_table` in `20_SCD2_Lib`) and clustered on the join
+# MAGIC keys of `33_ETL_Gold_Dim_PySpark` and `34_ETL_Gold_Fact_PySpark`. Their own Change Data Feed gives the orders to
+# MAGIC recompute in the incremental mode of `34_ETL_Gold_Fact_PySpark`.
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.address_current (
+# MAGIC     _tf_id BIGINT NOT NULL, -- Surrogate key of the current version in silver.address
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     address_id INT,
+# MAGIC     address_line1 STRING,
+# MAGIC     address_line2 STRING,
+# MAGIC     city STRING,
+# MAGIC     state_province STRING,
+# MAGIC     country_region STRING,
+# MAGIC     postal_code STRING,
+# MAGIC     rowguid CHAR(36),
+# MAGIC     modified_date TIMESTAMP,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT,
+# MAGIC     _tf_valid_from TIMESTAMP,
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (address_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.customer_current (
+# MAGIC     _tf_id BIGINT NOT NULL, -- Surrogate key of the current version in silver.customer
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     customer_id INT,
+# MAGIC     name_style BOOLEAN,
+# MAGIC     title STRING,
+# MAGIC     first_name STRING,
+# MAGIC     middle_name STRING,
+# MAGIC     last_name STRING,
+# MAGIC     suffix STRING,
+# MAGIC     company_name STRING,
+# MAGIC     sales_person STRING,
+# MAGIC     email_address STRING,
+# MAGIC     phone STRING,
+# MAGIC     password_hash STRING,
+# MAGIC     password_salt STRING,
+# MAGIC     rowguid CHAR(36),
+# MAGIC     modified_date TIMESTAMP,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT,
+# MAGIC     _tf_valid_from TIMESTAMP,
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (customer_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.sales_order_header_current (
+# MAGIC     _tf_id BIGINT NOT NULL, -- Surrogate key of the current version in silver.sales_order_header
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     sales_order_id INT,
+# MAGIC     revision_number SMALLINT,
+# MAGIC     order_date TIMESTAMP,
+# MAGIC     due_date TIMESTAMP,
+# MAGIC     ship_date TIMESTAMP,
+# MAGIC     status SMALLINT,
+# MAGIC     online_order_flag BOOLEAN,
+# MAGIC     sales_order_number STRING,
+# MAGIC     purchase_order_number STRING,
+# MAGIC     account_number STRING,
+# MAGIC     customer_id INT,
+# MAGIC     ship_to_address_id INT,
+# MAGIC     bill_to_address_id INT,
+# MAGIC     ship_method STRING,
+# MAGIC     credit_card_approval_code STRING,
+# MAGIC     sub_total DECIMAL(19,4),
+# MAGIC     tax_amt DECIMAL(19,4),
+# MAGIC     freight DECIMAL(19,4),
+# MAGIC     total_due DECIMAL(19,4),
+# MAGIC     comment STRING,
+# MAGIC     rowguid CHAR(36),
+# MAGIC     modified_date TIMESTAMP,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT,
+# MAGIC     _tf_valid_from TIMESTAMP,
 # MAGIC     _tf_create_date TIMESTAMP,
 # MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (sales_order_id, customer_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE silver.sales_order_detail_current (
+# MAGIC     _tf_id BIGINT NOT NULL, -- Surrogate key of the current version in silver.sales_order_detail
+# MAGIC
+# MAGIC     -- Source table columns
+# MAGIC     sales_order_id INT,
+# MAGIC     sales_order_detail_id INT,
+# MAGIC     order_qty SMALLINT,
+# MAGIC     product_id INT,
+# MAGIC     unit_price DECIMAL(19,4),
+# MAGIC     unit_price_discount DECIMAL(19,4),
+# MAGIC     line_total DECIMAL(38,6),
+# MAGIC     rowguid CHAR(36),
+# MAGIC     modified_date TIMESTAMP,
+# MAGIC
+# MAGIC     -- Technical columns
+# MAGIC     _tf_row_hash BIGINT,
+# MAGIC     _tf_valid_from TIMESTAMP,
+# MAGIC     _tf_create_date TIMESTAMP,
+# MAGIC     _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (sales_order_id, sales_order_detail_id)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC Last version processed by each reader of a Change Data Feed: silver tables reading bronze (incremental mode of
+# MAGIC `22_ETL_Silver_PySpark`) and current snapshot tables reading their history table.
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE TABLE IF NOT EXISTS silver.cdf_checkpoint (
+# MAGIC     consumer STRING NOT NULL, -- Table reading the changes, e.g. silver.address
+# MAGIC     source_table STRING NOT NULL, -- Table whose Change Data Feed is read, e.g. bronze.address
+# MAGIC     last_version BIGINT, -- Last version of source_table processed
+# MAGIC     updated_at TIMESTAMP
 # MAGIC )
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC Point-in-time SQL functions of the silver tables: `silver.<table>_as_of(ts)` and `silver.<table>_versions(from_ts, to_ts)`.
+
+# COMMAND ----------
+
+# MAGIC %run ./02_Column_Lineage
+
+# COMMAND ----------
+
+# MAGIC %run ./20_SCD2_Lib
+
+# COMMAND ----------
+
+create_point_in_time_functions(SILVER_MAPPINGS)
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## Create tables in Gold
 
@@ -223,8 +691,8 @@
 
 # MAGIC %sql
 # MAGIC CREATE OR REPLACE TABLE gold.dim_geography (
-# MAGIC   -- Incremental surrogate key
-# MAGIC   _tf_dim_geography_id BIGINT GENERATED BY DEFAULT AS IDENTITY (START WITH 1 INCREMENT BY 1) PRIMARY KEY NOT NULL,
+# MAGIC   -- Surrogate key: hash of geo_address_id (see 30_Gold_Key_Map_Lib), -9 for the unknown member
+# MAGIC   _tf_dim_geography_id BIGINT PRIMARY KEY NOT NULL,
 # MAGIC
 # MAGIC   -- Attributes
 # MAGIC   geo_address_id INT,
@@ -236,6 +704,7 @@
 # MAGIC   geo_postal_code STRING,
 # MAGIC
 # MAGIC   -- Technical columns
+# MAGIC   _tf_row_hash BIGINT, -- Fingerprint of the attributes (see 20_SCD2_Lib)
 # MAGIC   _tf_create_date TIMESTAMP,
 # MAGIC   _tf_update_date TIMESTAMP
 # MAGIC );
@@ -261,8 +730,8 @@
 
 # MAGIC %sql
 # MAGIC CREATE OR REPLACE TABLE gold.dim_customer (
-# MAGIC   -- Incremental surrogate key
-# MAGIC   _tf_dim_customer_id BIGINT GENERATED BY DEFAULT AS IDENTITY (START WITH 1 INCREMENT BY 1) PRIMARY KEY NOT NULL,
+# MAGIC   -- Surrogate key: hash of cust_customer_id (see 30_Gold_Key_Map_Lib), -9 for the unknown member
+# MAGIC   _tf_dim_customer_id BIGINT PRIMARY KEY NOT NULL,
 # MAGIC
 # MAGIC   -- Attributes
 # MAGIC   cust_customer_id INT,
@@ -277,6 +746,7 @@
 # MAGIC   cust_phone STRING,
 # MAGIC
 # MAGIC   -- Technical columns
+# MAGIC   _tf_row_hash BIGINT, -- Fingerprint of the attributes (see 20_SCD2_Lib)
 # MAGIC   _tf_create_date TIMESTAMP,
 # MAGIC   _tf_update_date TIMESTAMP
 # MAGIC );
@@ -306,8 +776,8 @@
 
 # MAGIC %sql
 # MAGIC CREATE OR REPLACE TABLE gold.fact_sales (
-# MAGIC   -- Incremental surrogate key
-# MAGIC   _tf_fact_sales_id BIGINT GENERATED ALWAYS AS IDENTITY (START WITH 1 INCREMENT BY 1) PRIMARY KEY NOT NULL, 
+# MAGIC   -- Surrogate key: hash of sales_order_id and sales_order_detail_id (see 20_SCD2_Lib)
+# MAGIC   _tf_fact_sales_id BIGINT PRIMARY KEY NOT NULL,
 # MAGIC
 # MAGIC   -- Source id
 # MAGIC   sales_order_id INT,
@@ -328,6 +798,22 @@
 # MAGIC   sales_line_total DECIMAL(38, 6),
 # MAGIC   
 # MAGIC   -- Technical columns
+# MAGIC   _tf_calendar_month INT GENERATED ALWAYS AS (CAST(_tf_dim_calendar_id DIV 100 AS INT)), -- yyyymm, clustering key
 # MAGIC   _tf_create_date TIMESTAMP,
 # MAGIC   _tf_update_date TIMESTAMP
+# MAGIC ) CLUSTER BY (_tf_calendar_month, _tf_dim_customer_id, _tf_dim_geography_id);
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC Bloom filter index on the business keys: `fact_sales` is clustered by month, a lookup by order or by line only
+# MAGIC reads the files whose filter may contain the key (see `silver.sales_order_detail`).
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE BLOOMFILTER INDEX ON TABLE gold.fact_sales
+# MAGIC FOR COLUMNS (
+# MAGIC   sales_order_id OPTIONS (fpp = 0.01, numItems = 250000),
+# MAGIC   sales_order_detail_id OPTIONS (fpp = 0.01, numItems = 1000000)
 # MAGIC );
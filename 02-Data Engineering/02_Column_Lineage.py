@@ -0,0 +1,306 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Column lineage
+# MAGIC
+# MAGIC Single description of which source columns are used downstream, shared by the bronze and silver notebooks.
+# MAGIC Include it with `%run ./02_Column_Lineage`.
+# MAGIC
+# MAGIC - `SILVER_MAPPINGS`: business key and source column to silver column, per silver table (the table specs run by
+# MAGIC   the SCD2 engine of `20_SCD2_Lib` in `22_ETL_Silver_PySpark`)
+# MAGIC   (`current_table`: companion table with the current versions only, read by the gold notebooks)
+# MAGIC - `UNEXTRACTED_COLUMNS`: mapped source columns deliberately left in SQL Server (the credentials)
+# MAGIC - `QUERY_COLUMNS`: bronze columns read directly by the notebooks of `Queries/`
+# MAGIC
+# MAGIC `projected_columns` derives from them the columns the bronze extraction has to pull from the source: every column
+# MAGIC historized in silver, so that the row hash versions all of them, plus the columns read by the queries. Columns
+# MAGIC nobody maps (`Product.ThumbNailPhoto`, ...) and the credentials stay in SQL Server. Their silver columns are the
+# MAGIC only ones loaded as typed NULLs by `scd2_select_exprs` (`20_SCD2_Lib`).
+# MAGIC
+# MAGIC **To historize a new table in silver, add its entry to `SILVER_MAPPINGS`**, its DDL to `01_Init` and its source
+# MAGIC table to the bronze manifest of `12_ETL_Bronze_PySpark`.
+# MAGIC
+# MAGIC **When a silver table or a query starts using a new column, add it here**: the next bronze run sees that the
+# MAGIC bronze table lacks the column and reloads the table in full.
+# MAGIC
+# MAGIC The SQL notebooks (`11_ETL_Bronze_SQL`, `21_ETL_Silver_SQL`) only leave out the credentials and the thumbnail.
+
+# COMMAND ----------
+
+SILVER_MAPPINGS = {
+    "silver.address": {
+        "business_key": ["address_id"],
+        "source_table": "SalesLT.Address",
+        "bronze_table": "bronze.address",
+        "current_table": "silver.address_current",
+        "columns": [
+            ("AddressID", "address_id"),
+            ("AddressLine1", "address_line1"),
+            ("AddressLine2", "address_line2"),
+            ("City", "city"),
+            ("StateProvince", "state_province"),
+            ("CountryRegion", "country_region"),
+            ("PostalCode", "postal_code"),
+            ("rowguid", "rowguid"),
+            ("ModifiedDate", "modified_date"),
+        ],
+    },
+    "silver.customer": {
+        "business_key": ["customer_id"],
+        "source_table": "SalesLT.Customer",
+        "bronze_table": "bronze.customer",
+        "current_table": "silver.customer_current",
+        "columns": [
+            ("CustomerID", "customer_id"),
+            ("NameStyle", "name_style"),
+            ("Title", "title"),
+            ("FirstName", "first_name"),
+            ("MiddleName", "middle_name"),
+            ("LastName", "last_name"),
+            ("Suffix", "suffix"),
+            ("CompanyName", "company_name"),
+            ("SalesPerson", "sales_person"),
+            ("EmailAddress", "email_address"),
+            ("Phone", "phone"),
+            ("PasswordHash", "password_hash"),
+            ("PasswordSalt", "password_salt"),
+            ("rowguid", "rowguid"),
+            ("ModifiedDate", "modified_date"),
+        ],
+    },
+    "silver.sales_order_detail": {
+        "business_key": ["sales_order_id", "sales_order_detail_id"],
+        "source_table": "SalesLT.SalesOrderDetail",
+        "bronze_table": "bronze.salesorderdetail",
+        "current_table": "silver.sales_order_detail_current",
+        "columns": [
+            ("SalesOrderID", "sales_order_id"),
+            ("SalesOrderDetailID", "sales_order_detail_id"),
+            ("OrderQty", "order_qty"),
+            ("ProductID", "product_id"),
+            ("UnitPrice", "unit_price"),
+            ("UnitPriceDiscount", "unit_price_discount"),
+            ("LineTotal", "line_total"),
+            ("rowguid", "rowguid"),
+            ("ModifiedDate", "modified_date"),
+        ],
+    },
+    "silver.sales_order_header": {
+        "business_key": ["sales_order_id"],
+        "source_table": "SalesLT.SalesOrderHeader",
+        "bronze_table": "bronze.salesorderheader",
+        "current_table": "silver.sales_order_header_current",
+        "columns": [
+            ("SalesOrderID", "sales_order_id"),
+            ("RevisionNumber", "revision_number"),
+            ("OrderDate", "order_date"),
+            ("DueDate", "due_date"),
+            ("ShipDate", "ship_date"),
+            ("Status", "status"),
+            ("OnlineOrderFlag", "online_order_flag"),
+            ("SalesOrderNumber", "sales_order_number"),
+            ("PurchaseOrderNumber", "purchase_order_number"),
+            ("AccountNumber", "account_number"),
+            ("CustomerID", "customer_id"),
+            ("ShipToAddressID", "ship_to_address_id"),
+            ("BillToAddressID", "bill_to_address_id"),
+            ("ShipMethod", "ship_method"),
+            ("CreditCardApprovalCode", "credit_card_approval_code"),
+            ("SubTotal", "sub_total"),
+            ("TaxAmt", "tax_amt"),
+            ("Freight", "freight"),
+            ("TotalDue", "total_due"),
+            ("Comment", "comment"),
+            ("rowguid", "rowguid"),
+            ("ModifiedDate", "modified_date"),
+        ],
+    },
+    "silver.customeraddress": {
+        "business_key": ["customer_id", "address_id"],
+        "source_table": "SalesLT.CustomerAddress",
+        "bronze_table": "bronze.customeraddress",
+        "columns": [
+            ("CustomerID", "customer_id"),
+            ("AddressID", "address_id"),
+            ("AddressType", "address_type"),
+            ("rowguid", "rowguid"),
+            ("ModifiedDate", "modified_date"),
+        ],
+    },
+    "silver.product": {
+        "business_key": ["product_id"],
+        "source_table": "SalesLT.Product",
+        "bronze_table": "bronze.product",
+        "columns": [
+            ("ProductID", "product_id"),
+            ("Name", "name"),
+            ("ProductNumber", "product_number"),
+            ("Color", "color"),
+            ("StandardCost", "standard_cost"),
+            ("ListPrice", "list_price"),
+            ("Size", "size"),
+            ("Weight", "weight"),
+            ("ProductCategoryID", "product_category_id"),
+            ("ProductModelID", "product_model_id"),
+            ("SellStartDate", "sell_start_date"),
+            ("SellEndDate", "sell_end_date"),
+            ("DiscontinuedDate", "discontinued_date"),
+            ("ThumbnailPhotoFileName", "thumbnail_photo_file_name"),
+            ("rowguid", "rowguid"),
+            ("ModifiedDate", "modified_date"),
+        ],
+    },
+    "silver.productcategory": {
+        "business_key": ["product_category_id"],
+        "source_table": "SalesLT.ProductCategory",
+        "bronze_table": "bronze.productcategory",
+        "columns": [
+            ("ProductCategoryID", "product_category_id"),
+            ("ParentProductCategoryID", "parent_product_category_id"),
+            ("Name", "name"),
+            ("rowguid", "rowguid"),
+            ("ModifiedDate", "modified_date"),
+        ],
+    },
+    "silver.productdescription": {
+        "business_key": ["product_description_id"],
+        "source_table": "SalesLT.ProductDescription",
+        "bronze_table": "bronze.productdescription",
+        "columns": [
+            ("ProductDescriptionID", "product_description_id"),
+            ("Description", "description"),
+            ("rowguid", "rowguid"),
+            ("ModifiedDate", "modified_date"),
+        ],
+    },
+    "silver.productmodel": {
+        "business_key": ["product_model_id"],
+        "source_table": "SalesLT.ProductModel",
+        "bronze_table": "bronze.productmodel",
+        "columns": [
+            ("ProductModelID", "product_model_id"),
+            ("Name", "name"),
+            ("CatalogDescription", "catalog_description"),
+            ("rowguid", "rowguid"),
+            ("ModifiedDate", "modified_date"),
+        ],
+    },
+    "silver.productmodelproductdescription": {
+        "business_key": ["product_model_id", "product_description_id", "culture"],
+        "source_table": "SalesLT.ProductModelProductDescription",
+        "bronze_table": "bronze.productmodelproductdescription",
+        "columns": [
+            ("ProductModelID", "product_model_id"),
+            ("ProductDescriptionID", "product_description_id"),
+            ("Culture", "culture"),
+            ("rowguid", "rowguid"),
+            ("ModifiedDate", "modified_date"),
+        ],
+    },
+    "silver.vgetallcategories": {
+        "business_key": ["product_category_id"],
+        "source_table": "SalesLT.vGetAllCategories",
+        "bronze_table": "bronze.vgetallcategories",
+        "columns": [
+            ("ProductCategoryID", "product_category_id"),
+            ("ParentProductCategoryName", "parent_product_category_name"),
+            ("ProductCategoryName", "name"),
+        ],
+    },
+    "silver.vproductanddescription": {
+        "business_key": ["product_id", "culture"],
+        "source_table": "SalesLT.vProductAndDescription",
+        "bronze_table": "bronze.vproductanddescription",
+        "columns": [
+            ("ProductID", "product_id"),
+            ("Culture", "culture"),
+            ("Name", "name"),
+            ("ProductModel", "product_model"),
+            ("Description", "description"),
+        ],
+    },
+    "silver.vproductmodelcatalogdescription": {
+        "business_key": ["product_model_id"],
+        "source_table": "SalesLT.vProductModelCatalogDescription",
+        "bronze_table": "bronze.vproductmodelcatalogdescription",
+        "columns": [
+            ("ProductModelID", "product_model_id"),
+            ("Name", "name"),
+            ("Summary", "summary"),
+            ("Manufacturer", "manufacturer"),
+            ("Copyright", "copyright"),
+            ("ProductURL", "producturl"),
+            ("WarrantyPeriod", "warrantyperiod"),
+            ("WarrantyDescription", "warrantydescription"),
+            ("NoOfYears", "noofyears"),
+            ("MaintenanceDescription", "maintenancedescription"),
+            ("Wheel", "wheel"),
+            ("Saddle", "saddle"),
+            ("Pedal", "pedal"),
+            ("BikeFrame", "bikeframe"),
+            ("Crankset", "crankset"),
+            ("PictureAngle", "pictureangle"),
+            ("PictureSize", "picturesize"),
+            ("ProductPhotoID", "productphotoid"),
+            ("Material", "material"),
+            ("Color", "color"),
+            ("ProductLine", "productline"),
+            ("Style", "style"),
+            ("RiderExperience", "riderexperience"),
+            ("rowguid", "rowguid"),
+            ("ModifiedDate", "modifieddate"),
+        ],
+    },
+}
+
+# Source columns never extracted, although a silver column maps them: their silver column stays NULL
+UNEXTRACTED_COLUMNS = {
+    "SalesLT.Customer": ["PasswordHash", "PasswordSalt"],
+}
+
+# Bronze columns read by the notebooks of Queries/ (04_activ-product lists the descriptive columns of the products)
+QUERY_COLUMNS = {
+    "SalesLT.Address": ["AddressID", "StateProvince"],
+    "SalesLT.Customer": ["CustomerID", "FirstName", "LastName"],
+    "SalesLT.SalesOrderHeader": ["SalesOrderID", "CustomerID", "BillToAddressID"],
+    "SalesLT.SalesOrderDetail": ["ProductID", "UnitPriceDiscount"],
+    "SalesLT.Product": [
+        "ProductID", "Name", "ProductNumber", "Color", "StandardCost", "ListPrice", "Size", "Weight",
+        "ProductCategoryID", "ProductModelID", "SellStartDate", "SellEndDate", "DiscontinuedDate"
+    ],
+    "SalesLT.ProductCategory": ["ProductCategoryID", "ParentProductCategoryID", "Name"],
+}
+
+# COMMAND ----------
+
+def projected_columns(source_table, key_columns=(), full_fidelity=False, watermark_column="ModifiedDate"):
+    """
+    Get the source columns the bronze extraction needs for a table.
+
+    All the columns mapped by the silver tables are extracted, except UNEXTRACTED_COLUMNS.
+
+    Args:
+        source_table (str): Source table, e.g. "SalesLT.Customer".
+        key_columns (list): Primary key columns, always extracted.
+        full_fidelity (bool): Extract every column, for a raw archival of the source.
+        watermark_column (str): Column used by the incremental load, always extracted (None if there is none).
+
+    Returns:
+        list: Source columns, or None for all the columns.
+    """
+    if full_fidelity:
+        return None
+
+    silver_tables = [table for table, mapping in SILVER_MAPPINGS.items() if mapping["source_table"] == source_table]
+    if not silver_tables and source_table not in QUERY_COLUMNS:
+        # Unknown downstream usage: keep everything
+        return None
+
+    columns = list(key_columns)
+    unextracted = UNEXTRACTED_COLUMNS.get(source_table, [])
+    for silver_table in silver_tables:
+        columns += [source for source, _ in SILVER_MAPPINGS[silver_table]["columns"] if source not in unextracted]
+    columns += QUERY_COLUMNS.get(source_table, [])
+    if watermark_column:
+        columns.append(watermark_column)
+
+    return list(dict.fromkeys(columns))
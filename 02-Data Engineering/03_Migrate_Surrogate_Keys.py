@@ -0,0 +1,59 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Migrating the surrogate keys
+# MAGIC
+# MAGIC One-off migration of a lakehouse created before the hash surrogate keys (see `20_SCD2_Lib`): the `IDENTITY`
+# MAGIC columns of the silver and gold tables are replaced by the hash keys the loads now compute, and the columns
+# MAGIC referencing them are remapped. Tables already migrated, or created by the current `01_Init`, are skipped, so the
+# MAGIC notebook can be run again after a failure.
+# MAGIC
+# MAGIC Stop the silver and gold jobs while it runs. The old to new key map of every table is kept in
+# MAGIC `silver.surrogate_key_migration`.
+
+# COMMAND ----------
+
+# MAGIC %run ./02_Column_Lineage
+
+# COMMAND ----------
+
+# MAGIC %run ./20_SCD2_Lib
+
+# COMMAND ----------
+
+# MAGIC %run ./30_Gold_Key_Map_Lib
+
+# COMMAND ----------
+
+spark.sql("USE CATALOG levkiwi_lakehouse")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Silver
+# MAGIC
+# MAGIC `_tf_id` becomes the hash of the business key and `_tf_valid_from`, in the history, current snapshot and archive
+# MAGIC tables.
+
+# COMMAND ----------
+
+migrate_scd2_keys(SILVER_MAPPINGS)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Gold
+# MAGIC
+# MAGIC The dimensions first, remapping the keys held by `gold.fact_sales`; the unknown member keeps `-9`. Then the
+# MAGIC surrogate key of the fact itself.
+
+# COMMAND ----------
+
+for dim_table, spec in DIM_KEY_MAPS.items():
+    migrate_surrogate_key(
+        dim_table, spec["surrogate_key"], surrogate_key_expr([spec["natural_key"]]),
+        references={"gold.fact_sales": spec["surrogate_key"]}, keep_keys=(UNKNOWN_MEMBER_ID,)
+    )
+
+migrate_surrogate_key(
+    "gold.fact_sales", "_tf_fact_sales_id", surrogate_key_expr(["sales_order_id", "sales_order_detail_id"])
+)
@@ -0,0 +1,616 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Bronze JDBC extraction library
+# MAGIC
+# MAGIC Helper functions shared by the bronze notebooks. Include them with `%run ./10_Bronze_JDBC_Lib`.
+# MAGIC
+# MAGIC ## Parallel range-partitioned extraction
+# MAGIC
+# MAGIC A plain `spark.read.jdbc(url, table, properties)` opens a single connection and reads the whole table in one task.
+# MAGIC `read_jdbc_partitioned` looks up the bounds of an integer key on the source and splits it into ranges that are
+# MAGIC read concurrently, one JDBC connection per Spark task:
+# MAGIC
+# MAGIC - `strategy="range"`: `MIN`/`MAX` of the key, split into `num_partitions` equal-width ranges (Spark `partitionColumn`).
+# MAGIC - `strategy="histogram"`: `NTILE` boundaries computed on the source, so every range holds about the same number of rows even when the key has gaps.
+
+# COMMAND ----------
+
+import math
+
+# Default number of rows fetched per JDBC round trip (the SQL Server driver default is very small)
+DEFAULT_FETCHSIZE = 10000
+
+# Target number of rows per partition, used when num_partitions is not given
+DEFAULT_ROWS_PER_PARTITION = 50000
+
+# COMMAND ----------
+
+def read_jdbc_query(jdbc_url, properties, query, fetchsize=DEFAULT_FETCHSIZE):
+    """
+    Run a query on the source database and return the result as a DataFrame.
+
+    Args:
+        jdbc_url (str): JDBC URL of the source database.
+        properties (dict): JDBC connection properties (user, password, driver).
+        query (str): SQL query executed on the source.
+        fetchsize (int): Number of rows fetched per round trip.
+
+    Returns:
+        DataFrame: Result of the query.
+    """
+    return spark.read.jdbc(
+        url=jdbc_url,
+        table=f"({query}) AS q",
+        properties={**properties, "fetchsize": str(fetchsize)}
+    )
+
+
+def get_key_bounds(jdbc_url, properties, table, key):
+    """
+    Get the minimum, maximum and row count of an integer key on the source.
+
+    Args:
+        jdbc_url (str): JDBC URL of the source database.
+        properties (dict): JDBC connection properties.
+        table (str): Source table (or subquery aliased as a table).
+        key (str): Integer key column.
+
+    Returns:
+        tuple: (lower_bound, upper_bound, row_count). Bounds are None for an empty table.
+    """
+    row = read_jdbc_query(
+        jdbc_url, properties,
+        f"SELECT MIN({key}) AS lower_bound, MAX({key}) AS upper_bound, COUNT(*) AS row_count FROM {table}"
+    ).first()
+    return row["lower_bound"], row["upper_bound"], int(row["row_count"] or 0)
+
+
+def get_key_histogram(jdbc_url, properties, table, key, num_partitions):
+    """
+    Split an integer key into ranges holding the same number of rows.
+
+    The boundaries are computed on the source with NTILE, so only num_partitions rows
+    travel over the network. NULL keys are left out: histogram_predicates() reads them
+    in a partition of their own.
+
+    Args:
+        jdbc_url (str): JDBC URL of the source database.
+        properties (dict): JDBC connection properties.
+        table (str): Source table.
+        key (str): Integer key column.
+        num_partitions (int): Number of ranges.
+
+    Returns:
+        list: Lower bound of each range, sorted.
+    """
+    rows = read_jdbc_query(
+        jdbc_url, properties,
+        f"SELECT bucket, MIN({key}) AS lower_bound "
+        f"FROM (SELECT {key}, NTILE({num_partitions}) OVER (ORDER BY {key}) AS bucket "
+        f"FROM {table} WHERE {key} IS NOT NULL) AS t "
+        f"GROUP BY bucket"
+    ).collect()
+    return sorted(row["lower_bound"] for row in rows if row["lower_bound"] is not None)
+
+
+def histogram_predicates(key, lower_bounds):
+    """
+    Build one WHERE predicate per range from the histogram lower bounds.
+
+    Args:
+        key (str): Integer key column.
+        lower_bounds (list): Sorted lower bound of each range.
+
+    Returns:
+        list: Non-overlapping predicates covering the whole key domain.
+    """
+    predicates = []
+    for i, lower in enumerate(lower_bounds):
+        if i + 1 < len(lower_bounds):
+            predicates.append(f"{key} >= {lower} AND {key} < {lower_bounds[i + 1]}")
+        else:
+            predicates.append(f"{key} >= {lower}")
+    # Rows with a NULL key are not covered by the ranges
+    predicates.append(f"{key} IS NULL")
+    return predicates
+
+
+def default_num_partitions(row_count, rows_per_partition=DEFAULT_ROWS_PER_PARTITION):
+    """
+    Number of partitions used when none is given: enough to keep partitions around
+    rows_per_partition rows, capped by the number of cores of the cluster.
+    """
+    wanted = max(1, math.ceil(row_count / rows_per_partition))
+    return min(wanted, spark.sparkContext.defaultParallelism)
+
+# COMMAND ----------
+
+def read_jdbc_partitioned(jdbc_url, properties, table, partition_column=None, num_partitions=None,
+                          fetchsize=DEFAULT_FETCHSIZE, strategy="range"):
+    """
+    Read a source table with several concurrent JDBC connections.
+
+    Args:
+        jdbc_url (str): JDBC URL of the source database.
+        properties (dict): JDBC connection properties.
+        table (str): Source table, e.g. "SalesLT.SalesOrderDetail".
+        partition_column (str): Integer key used to split the table. None reads with a single connection.
+        num_partitions (int): Number of concurrent reads. Defaults to default_num_partitions().
+        fetchsize (int): Number of rows fetched per round trip.
+        strategy (str): "range" (equal-width ranges between MIN and MAX) or "histogram" (equal-count ranges).
+
+    Returns:
+        DataFrame: Content of the source table.
+    """
+    read_properties = {**properties, "fetchsize": str(fetchsize)}
+
+    if partition_column is None:
+        return spark.read.jdbc(url=jdbc_url, table=table, properties=read_properties)
+
+    lower_bound, upper_bound, row_count = get_key_bounds(jdbc_url, properties, table, partition_column)
+    if num_partitions is None:
+        num_partitions = default_num_partitions(row_count)
+
+    if row_count == 0 or num_partitions <= 1 or lower_bound == upper_bound:
+        return spark.read.jdbc(url=jdbc_url, table=table, properties=read_properties)
+
+    if strategy == "range":
+        return spark.read.jdbc(
+            url=jdbc_url,
+            table=table,
+            column=partition_column,
+            lowerBound=int(lower_bound),
+            upperBound=int(upper_bound),
+            numPartitions=num_partitions,
+            properties=read_properties
+        )
+
+    if strategy == "histogram":
+        lower_bounds = get_key_histogram(jdbc_url, properties, table, partition_column, num_partitions)
+        return spark.read.jdbc(
+            url=jdbc_url,
+            table=table,
+            predicates=histogram_predicates(partition_column, lower_bounds),
+            properties=read_properties
+        )
+
+    raise ValueError(f"Unknown partitioning strategy: {strategy}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Watermark-based incremental extraction
+# MAGIC
+# MAGIC The high-water mark of every source table (highest `ModifiedDate` and, for ties, highest key already loaded) is kept
+# MAGIC in `bronze.load_watermark`. The next run only extracts the rows above it, with the filter pushed down to the source,
+# MAGIC and MERGEs them into the bronze table. Deleted rows are not visible in such a delta: `reconcile_deletes` compares the
+# MAGIC keys only and removes the missing ones.
+
+# COMMAND ----------
+
+from datetime import datetime
+
+from pyspark.sql.functions import col
+
+WATERMARK_TABLE = "bronze.load_watermark"
+
+
+def ensure_watermark_table():
+    """
+    Create the watermark control table if it does not exist yet.
+    """
+    spark.sql(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            source_table STRING NOT NULL,
+            target_table STRING,
+            watermark_column STRING,
+            key_column STRING,
+            hwm_value TIMESTAMP,
+            hwm_key BIGINT,
+            rows_extracted BIGINT,
+            updated_at TIMESTAMP
+        )
+    """)
+
+
+def get_watermark(source_table):
+    """
+    Get the high-water mark of a source table.
+
+    Args:
+        source_table (str): Source table, e.g. "SalesLT.Address".
+
+    Returns:
+        tuple: (hwm_value, hwm_key), (None, None) if the table was never loaded.
+    """
+    rows = (
+        spark.table(WATERMARK_TABLE)
+        .filter(col("source_table") == source_table)
+        .select("hwm_value", "hwm_key")
+        .collect()
+    )
+    if not rows:
+        return None, None
+    return rows[0]["hwm_value"], rows[0]["hwm_key"]
+
+
+def compute_watermark(source_table, target_table, watermark_column, key_column, rows_extracted, df,
+                      hwm_value=None, hwm_key=None):
+    """
+    Compute the new high-water mark of a source table from the rows extracted by this run.
+
+    Only the extracted DataFrame is aggregated, so the cost follows the number of changed rows and not
+    the size of the bronze table. An empty delta keeps the previous watermark.
+
+    Args:
+        source_table (str): Source table.
+        target_table (str): Bronze table.
+        watermark_column (str): Column holding the last modification date.
+        key_column (str): Integer key used to break ties on the watermark column, or None.
+        rows_extracted (int): Number of rows extracted by this run.
+        df (DataFrame): Rows extracted by this run.
+        hwm_value (datetime): Previous high-water mark, kept when nothing was extracted.
+        hwm_key (int): Previous tie-breaking key, kept when nothing was extracted.
+
+    Returns:
+        dict: Row of the watermark table.
+    """
+    hwm_key_expr = f"CAST(MAX_BY({key_column}, STRUCT({watermark_column}, {key_column})) AS BIGINT)" if key_column else "CAST(NULL AS BIGINT)"
+    row = df.selectExpr(f"MAX({watermark_column}) AS hwm_value", f"{hwm_key_expr} AS hwm_key").first()
+    if row["hwm_value"] is not None:
+        hwm_value, hwm_key = row["hwm_value"], row["hwm_key"]
+    return {
+        "source_table": source_table,
+        "target_table": target_table,
+        "watermark_column": watermark_column,
+        "key_column": key_column,
+        "hwm_value": hwm_value,
+        "hwm_key": hwm_key,
+        "rows_extracted": rows_extracted,
+        "updated_at": datetime.now(),
+    }
+
+
+def save_watermarks(watermarks):
+    """
+    Store new high-water marks in the watermark table, in a single MERGE.
+
+    Args:
+        watermarks (list): Rows returned by compute_watermark().
+    """
+    if not watermarks:
+        return
+    schema = spark.table(WATERMARK_TABLE).schema
+    rows = [tuple(watermark[field] for field in schema.fieldNames()) for watermark in watermarks]
+    spark.createDataFrame(rows, schema).createOrReplaceTempView("_new_watermarks")
+
+    spark.sql(f"""
+        MERGE INTO {WATERMARK_TABLE} AS tgt
+        USING _new_watermarks AS src
+        ON tgt.source_table = src.source_table
+        WHEN MATCHED THEN UPDATE SET *
+        WHEN NOT MATCHED THEN INSERT *
+    """)
+
+
+def watermark_predicate(watermark_column, key_column, hwm_value, hwm_key):
+    """
+    Build the WHERE clause selecting the rows above the high-water mark.
+
+    Without a tie-breaking key the rows equal to the watermark are read again; the MERGE makes this harmless.
+
+    Args:
+        watermark_column (str): Column holding the last modification date.
+        key_column (str): Integer key used to break ties, or None.
+        hwm_value (datetime): Highest modification date already loaded.
+        hwm_key (int): Highest key loaded with that modification date.
+
+    Returns:
+        str: Predicate in the source SQL dialect.
+    """
+    # SQL Server DATETIME has a millisecond precision: truncating can only re-read rows, never skip them
+    hwm_literal = hwm_value.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    if key_column is None or hwm_key is None:
+        return f"{watermark_column} >= '{hwm_literal}'"
+    return (
+        f"({watermark_column} > '{hwm_literal}' "
+        f"OR ({watermark_column} = '{hwm_literal}' AND {key_column} > {hwm_key}))"
+    )
+
+
+def temp_view_name(prefix, table):
+    """
+    Build a temporary view name specific to a table, so that tables loaded concurrently do not overwrite each other's views.
+
+    Args:
+        prefix (str): Purpose of the view.
+        table (str): Table the view belongs to.
+
+    Returns:
+        str: View name, e.g. "_bronze_delta_bronze_Address".
+    """
+    return f"_{prefix}_{table.replace('.', '_')}"
+
+
+def last_operation_metrics(table):
+    """
+    Get the operation metrics of the last commit on a Delta table.
+
+    Args:
+        table (str): Delta table.
+
+    Returns:
+        dict: Operation metrics (numOutputRows, numTargetRowsInserted, ...).
+    """
+    return spark.sql(f"DESCRIBE HISTORY {table} LIMIT 1").first()["operationMetrics"]
+
+
+def enable_change_data_feed(table):
+    """
+    Enable the Change Data Feed of a Delta table if it is not enabled yet.
+
+    The silver notebooks read the changes of the bronze tables from it (see scd2_changes() in 20_SCD2_Lib).
+
+    Args:
+        table (str): Delta table.
+    """
+    properties = {row["key"]: row["value"] for row in spark.sql(f"SHOW TBLPROPERTIES {table}").collect()}
+    if properties.get("delta.enableChangeDataFeed") != "true":
+        spark.sql(f"ALTER TABLE {table} SET TBLPROPERTIES (delta.enableChangeDataFeed = true)")
+
+
+def merge_into_bronze(df, target_table, key_columns):
+    """
+    Upsert a DataFrame into a bronze table on its primary key.
+
+    Args:
+        df (DataFrame): Rows to upsert, with the same columns as the target.
+        target_table (str): Bronze table.
+        key_columns (list): Primary key columns.
+    """
+    view = temp_view_name("bronze_delta", target_table)
+    df.createOrReplaceTempView(view)
+    on_clause = " AND ".join(f"tgt.{key} = src.{key}" for key in key_columns)
+    spark.sql(f"""
+        MERGE INTO {target_table} AS tgt
+        USING {view} AS src
+        ON {on_clause}
+        WHEN MATCHED THEN UPDATE SET *
+        WHEN NOT MATCHED THEN INSERT *
+    """)
+
+# COMMAND ----------
+
+def load_table_incremental(jdbc_url, properties, source_table, target_table, key_columns,
+                           watermark_column="ModifiedDate", watermark_key=None, partition_column=None,
+                           num_partitions=None, fetchsize=DEFAULT_FETCHSIZE, strategy="range", save_watermark=True,
+                           columns=None):
+    """
+    Load a source table into bronze, extracting only the rows changed since the last run.
+
+    The bronze table is created with its Change Data Feed enabled.
+    The first run (no watermark or no bronze table) does a full partitioned extraction, and so does a run
+    whose column list contains columns the bronze table does not have yet. Sources without a modification
+    date (watermark_column=None, e.g. the views) are always loaded in full.
+    With save_watermark=False the new watermark is only returned, so a caller loading several tables
+    at once can store all of them in a single commit.
+
+    Args:
+        jdbc_url (str): JDBC URL of the source database.
+        properties (dict): JDBC connection properties.
+        source_table (str): Source table, e.g. "SalesLT.SalesOrderDetail".
+        target_table (str): Bronze table, e.g. "bronze.SalesOrderDetail".
+        key_columns (list): Primary key columns, used by the MERGE.
+        watermark_column (str): Column holding the last modification date, or None for a full load.
+        watermark_key (str): Unique integer column used to break ties on the watermark column, or None.
+        partition_column (str): Integer column used to split the extraction, or None.
+        num_partitions (int): Number of concurrent reads.
+        fetchsize (int): Number of rows fetched per round trip.
+        strategy (str): Partitioning strategy, see read_jdbc_partitioned().
+        save_watermark (bool): Store the new watermark in the watermark table.
+        columns (list): Source columns to extract, None for all of them (see projected_columns()).
+
+    Returns:
+        dict: Load mode, number of rows extracted and new watermark (None without watermark column).
+    """
+    hwm_value, hwm_key = get_watermark(source_table) if watermark_column else (None, None)
+    options = dict(partition_column=partition_column, num_partitions=num_partitions,
+                   fetchsize=fetchsize, strategy=strategy)
+    select_list = ", ".join(columns) if columns else "*"
+
+    mode = "full"
+    if hwm_value is not None and spark.catalog.tableExists(target_table):
+        predicate = watermark_predicate(watermark_column, watermark_key, hwm_value, hwm_key)
+        df = read_jdbc_partitioned(
+            jdbc_url, properties, f"(SELECT {select_list} FROM {source_table} WHERE {predicate}) AS delta", **options
+        )
+        # Only the schema is resolved here, no row is read yet
+        target_columns = {column.lower() for column in spark.table(target_table).columns}
+        if {column.lower() for column in df.columns} <= target_columns:
+            mode = "incremental"
+
+    if mode == "full":
+        df = read_jdbc_partitioned(
+            jdbc_url, properties, f"(SELECT {select_list} FROM {source_table}) AS src" if columns else source_table,
+            **options
+        )
+        df.write.mode("overwrite").option("overwriteSchema", "true").saveAsTable(target_table)
+        rows_extracted = int(last_operation_metrics(target_table).get("numOutputRows", 0))
+        enable_change_data_feed(target_table)
+        # The whole table was extracted: read it back from bronze rather than from the source again
+        extracted = spark.table(target_table)
+    else:
+        # Cached so that the watermark is computed on the rows that were merged, without a second JDBC read
+        df = df.persist()
+        merge_into_bronze(df, target_table, key_columns)
+        rows_extracted = int(last_operation_metrics(target_table).get("numSourceRows", 0))
+        extracted = df
+
+    watermark = None
+    if watermark_column:
+        watermark = compute_watermark(source_table, target_table, watermark_column, watermark_key, rows_extracted,
+                                      extracted, hwm_value, hwm_key)
+    if mode == "incremental":
+        df.unpersist()
+    if save_watermark and watermark:
+        save_watermarks([watermark])
+    print(f"{source_table} -> {target_table}: {mode} load, {rows_extracted} rows extracted")
+    return {"mode": mode, "rows_extracted": rows_extracted, "watermark": watermark}
+
+
+def reconcile_deletes(jdbc_url, properties, source_table, target_table, key_columns, partition_column=None,
+                      num_partitions=None, fetchsize=DEFAULT_FETCHSIZE, strategy="range"):
+    """
+    Delete from a bronze table the rows whose key no longer exists in the source.
+
+    Only the key columns are read on both sides. The deleted keys are found with an anti-join
+    and removed with a MERGE that only rewrites the files containing them.
+
+    Args:
+        jdbc_url (str): JDBC URL of the source database.
+        properties (dict): JDBC connection properties.
+        source_table (str): Source table.
+        target_table (str): Bronze table.
+        key_columns (list): Primary key columns.
+        partition_column (str): Integer column used to split the extraction, or None.
+        num_partitions (int): Number of concurrent reads.
+        fetchsize (int): Number of rows fetched per round trip.
+        strategy (str): Partitioning strategy, see read_jdbc_partitioned().
+
+    Returns:
+        int: Number of rows deleted.
+    """
+    key_list = ", ".join(key_columns)
+    source_keys = read_jdbc_partitioned(
+        jdbc_url, properties, f"(SELECT {key_list} FROM {source_table}) AS source_keys",
+        partition_column=partition_column, num_partitions=num_partitions, fetchsize=fetchsize, strategy=strategy
+    )
+    deleted_keys = spark.table(target_table).select(*key_columns).join(source_keys, key_columns, "left_anti")
+    view = temp_view_name("deleted_keys", target_table)
+    deleted_keys.createOrReplaceTempView(view)
+
+    on_clause = " AND ".join(f"tgt.{key} = src.{key}" for key in key_columns)
+    spark.sql(f"""
+        MERGE INTO {target_table} AS tgt
+        USING {view} AS src
+        ON {on_clause}
+        WHEN MATCHED THEN DELETE
+    """)
+    rows_deleted = int(last_operation_metrics(target_table).get("numTargetRowsDeleted", 0))
+    print(f"{source_table} -> {target_table}: {rows_deleted} deleted rows removed")
+    return rows_deleted
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Manifest-driven concurrent ingestion
+# MAGIC
+# MAGIC `run_bronze_manifest` loads a list of tables described by a manifest. Every entry is submitted to a bounded thread
+# MAGIC pool and runs in its own FAIR scheduler pool, so the extraction and MERGE jobs of several tables share the cluster
+# MAGIC at the same time: the bronze latency becomes close to the slowest table instead of the sum of all tables.
+# MAGIC
+# MAGIC A manifest entry is a dict with the arguments of `load_table_incremental`:
+# MAGIC
+# MAGIC | Key | Required | Description |
+# MAGIC |-----|----------|-------------|
+# MAGIC | `source_table` | yes | Source table, e.g. `SalesLT.Address` |
+# MAGIC | `target_table` | yes | Bronze table, e.g. `bronze.Address` |
+# MAGIC | `key_columns` | yes | Primary key columns |
+# MAGIC | `watermark_column` | no | Modification date column (default: `ModifiedDate`), `None` to always load in full |
+# MAGIC | `watermark_key` | no | Integer key breaking the ties on `ModifiedDate` |
+# MAGIC | `partition_column` | no | Integer column used to split the extraction |
+# MAGIC | `columns` | no | Source columns to extract, see `projected_columns` in `02_Column_Lineage` (default: all) |
+# MAGIC | `num_partitions`, `fetchsize`, `strategy` | no | Override the defaults given to the driver |
+
+# COMMAND ----------
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of tables loaded at the same time
+DEFAULT_MAX_WORKERS = 4
+
+
+def run_manifest_entry(jdbc_url, properties, entry, defaults, reconcile=False):
+    """
+    Load one manifest entry in its own FAIR scheduler pool and measure it.
+
+    Args:
+        jdbc_url (str): JDBC URL of the source database.
+        properties (dict): JDBC connection properties.
+        entry (dict): Manifest entry.
+        defaults (dict): Default num_partitions, fetchsize and strategy.
+        reconcile (bool): Also remove the rows deleted at the source.
+
+    Returns:
+        dict: Table, status, load mode, rows extracted and deleted, wall time and new watermark.
+    """
+    spark.sparkContext.setLocalProperty("spark.scheduler.pool", f"bronze_{entry['target_table']}")
+    options = {**defaults, **{key: entry[key] for key in ("num_partitions", "fetchsize", "strategy") if key in entry}}
+    result = {"source_table": entry["source_table"], "target_table": entry["target_table"]}
+    start = time.perf_counter()
+    try:
+        load = load_table_incremental(
+            jdbc_url, properties, entry["source_table"], entry["target_table"], entry["key_columns"],
+            watermark_column=entry.get("watermark_column", "ModifiedDate"),
+            watermark_key=entry.get("watermark_key"), partition_column=entry.get("partition_column"),
+            columns=entry.get("columns"), save_watermark=False, **options
+        )
+        rows_deleted = None
+        if reconcile:
+            rows_deleted = reconcile_deletes(
+                jdbc_url, properties, entry["source_table"], entry["target_table"], entry["key_columns"],
+                partition_column=entry.get("partition_column"), **options
+            )
+        result.update(status="succeeded", mode=load["mode"], rows_extracted=load["rows_extracted"],
+                      rows_deleted=rows_deleted, watermark=load["watermark"], error=None)
+    except Exception as e:
+        result.update(status="failed", mode=None, rows_extracted=None, rows_deleted=None, watermark=None, error=str(e))
+    finally:
+        result["duration_s"] = round(time.perf_counter() - start, 3)
+        spark.sparkContext.setLocalProperty("spark.scheduler.pool", None)
+    return result
+
+
+def run_bronze_manifest(jdbc_url, properties, manifest, max_workers=DEFAULT_MAX_WORKERS, reconcile=False,
+                        num_partitions=None, fetchsize=DEFAULT_FETCHSIZE, strategy="range"):
+    """
+    Load all the tables of a manifest concurrently.
+
+    The watermarks of the tables loaded successfully are stored at the end in a single commit.
+    A table that fails does not stop the others; an exception is raised once all of them are done.
+
+    Args:
+        jdbc_url (str): JDBC URL of the source database.
+        properties (dict): JDBC connection properties.
+        manifest (list): Manifest entries, see above. Put the largest tables first.
+        max_workers (int): Number of tables loaded at the same time.
+        reconcile (bool): Also remove the rows deleted at the source.
+        num_partitions (int): Default number of concurrent reads per table.
+        fetchsize (int): Default number of rows fetched per round trip.
+        strategy (str): Default partitioning strategy, see read_jdbc_partitioned().
+
+    Returns:
+        list: One result per table, see run_manifest_entry().
+    """
+    ensure_watermark_table()
+    defaults = dict(num_partitions=num_partitions, fetchsize=fetchsize, strategy=strategy)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(
+            lambda entry: run_manifest_entry(jdbc_url, properties, entry, defaults, reconcile), manifest
+        ))
+    save_watermarks([result.pop("watermark") for result in results if result["watermark"] is not None])
+    for result in results:
+        result.pop("watermark", None)
+    duration = time.perf_counter() - start
+
+    print(f"Bronze ingestion: {len(results)} tables in {duration:.1f} s "
+          f"(sum of the tables: {sum(result['duration_s'] for result in results):.1f} s)")
+    failed = [result for result in results if result["status"] == "failed"]
+    for result in failed:
+        print(f"{result['source_table']} failed: {result['error']}")
+    if failed:
+        raise RuntimeError(f"Bronze ingestion failed for {', '.join(result['source_table'] for result in failed)}")
+    return results
@@ -46,8 +46,9 @@ AS SELECT * FROM jay_adventureworks.saleslt.SalesOrderHeader;
 
 -- COMMAND ----------
 
+-- The thumbnail is used by no downstream table: it stays in the source
 CREATE OR REPLACE TABLE Product
-AS SELECT * FROM jay_adventureworks.saleslt.Product;
+AS SELECT * EXCEPT (ThumbNailPhoto) FROM jay_adventureworks.saleslt.Product;
 
 -- COMMAND ----------
 
@@ -78,5 +79,6 @@ AS SELECT * FROM jay_adventureworks.saleslt.Address;
 
 -- COMMAND ----------
 
+-- The credentials are used by no downstream table: they stay in the source
 CREATE OR REPLACE TABLE Customer 
-AS SELECT * FROM jay_adventureworks.saleslt.Customer;
+AS SELECT * EXCEPT (PasswordHash, PasswordSalt) FROM jay_adventureworks.saleslt.Customer;
@@ -32,75 +32,95 @@ connectionProperties = {
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Ingestion of SalesOrderDetail
-
-# COMMAND ----------
-
-SalesOrderDetail = spark.read.jdbc(url=jdbcUrl, table="SalesLT.SalesOrderDetail", properties=connectionProperties)
-display(SalesOrderDetail)
-
-# COMMAND ----------
-
-SalesOrderDetail.write.mode("overwrite").saveAsTable("bronze.SalesOrderDetail")
-
-# COMMAND ----------
-
-# MAGIC %md
-# MAGIC ## Ingestion of SalesOrderHeader
+# MAGIC ## Parallel extraction settings
+# MAGIC
+# MAGIC Each table is split on its integer primary key and read with several JDBC connections at once (see `10_Bronze_JDBC_Lib`).
 
 # COMMAND ----------
 
-SalesOrderHeader = spark.read.jdbc(url=jdbcUrl, table="SalesLT.SalesOrderHeader", properties=connectionProperties)
-display(SalesOrderHeader)
-
-SalesOrderHeader.write.mode("overwrite").saveAsTable("bronze.SalesOrderHeader")
+# MAGIC %run ./10_Bronze_JDBC_Lib
 
 # COMMAND ----------
 
-# MAGIC %md
-# MAGIC ## Ingestion of Product
+# MAGIC %run ./02_Column_Lineage
 
 # COMMAND ----------
 
-Product = spark.read.jdbc(url=jdbcUrl, table="SalesLT.Product", properties=connectionProperties)
-display(Product)
-
-Product.write.mode("overwrite").saveAsTable("bronze.Product")
+jdbcFetchSize = 10000           # Rows fetched per JDBC round trip
+jdbcNumPartitions = None        # None = derived from the row count and the number of cores
+jdbcPartitionStrategy = "range" # "range" (MIN/MAX) or "histogram" (NTILE on the source, for skewed keys)
+reconcileDeletes = True         # Compare the keys with the source to remove the deleted rows
+bronzeMaxWorkers = 4            # Number of tables loaded at the same time
+bronzeFullFidelity = False      # True = extract every source column (raw archival), False = only the columns used downstream
 
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Ingestion of ProductCategory
-
-# COMMAND ----------
-
-ProductCategory = spark.read.jdbc(url=jdbcUrl, table="SalesLT.ProductCategory", properties=connectionProperties)
-display(ProductCategory)
-
-ProductCategory.write.mode("overwrite").saveAsTable("bronze.ProductCategory")
+# MAGIC ## Bronze manifest
+# MAGIC
+# MAGIC One entry per source table, largest tables first so they start as early as possible. Only the rows modified since
+# MAGIC the last run (`ModifiedDate` above the watermark stored in `bronze.load_watermark`) are extracted and merged; the first
+# MAGIC run of a table is a full load. Deleted source rows are removed by comparing the primary keys only. Only the columns
+# MAGIC used downstream are extracted, unless `bronzeFullFidelity` is set.
+
+# COMMAND ----------
+
+bronzeManifest = [
+    {"source_table": "SalesLT.SalesOrderDetail", "target_table": "bronze.SalesOrderDetail",
+     "key_columns": ["SalesOrderID", "SalesOrderDetailID"], "watermark_key": "SalesOrderDetailID", "partition_column": "SalesOrderDetailID"},
+    {"source_table": "SalesLT.SalesOrderHeader", "target_table": "bronze.SalesOrderHeader",
+     "key_columns": ["SalesOrderID"], "watermark_key": "SalesOrderID", "partition_column": "SalesOrderID"},
+    {"source_table": "SalesLT.Customer", "target_table": "bronze.Customer",
+     "key_columns": ["CustomerID"], "watermark_key": "CustomerID", "partition_column": "CustomerID"},
+    {"source_table": "SalesLT.Address", "target_table": "bronze.Address",
+     "key_columns": ["AddressID"], "watermark_key": "AddressID", "partition_column": "AddressID"},
+    {"source_table": "SalesLT.Product", "target_table": "bronze.Product",
+     "key_columns": ["ProductID"], "watermark_key": "ProductID", "partition_column": "ProductID"},
+    {"source_table": "SalesLT.ProductCategory", "target_table": "bronze.ProductCategory",
+     "key_columns": ["ProductCategoryID"], "watermark_key": "ProductCategoryID", "partition_column": "ProductCategoryID"},
+    {"source_table": "SalesLT.CustomerAddress", "target_table": "bronze.CustomerAddress",
+     "key_columns": ["CustomerID", "AddressID"], "partition_column": "CustomerID"},
+    {"source_table": "SalesLT.ProductDescription", "target_table": "bronze.ProductDescription",
+     "key_columns": ["ProductDescriptionID"], "watermark_key": "ProductDescriptionID", "partition_column": "ProductDescriptionID"},
+    {"source_table": "SalesLT.ProductModel", "target_table": "bronze.ProductModel",
+     "key_columns": ["ProductModelID"], "watermark_key": "ProductModelID", "partition_column": "ProductModelID"},
+    {"source_table": "SalesLT.ProductModelProductDescription", "target_table": "bronze.ProductModelProductDescription",
+     "key_columns": ["ProductModelID", "ProductDescriptionID", "Culture"], "partition_column": "ProductModelID"},
+    {"source_table": "SalesLT.vProductModelCatalogDescription", "target_table": "bronze.vProductModelCatalogDescription",
+     "key_columns": ["ProductModelID"], "watermark_key": "ProductModelID", "partition_column": "ProductModelID"},
+    # Views without modification date: always loaded in full
+    {"source_table": "SalesLT.vProductAndDescription", "target_table": "bronze.vProductAndDescription",
+     "key_columns": ["ProductID", "Culture"], "watermark_column": None, "partition_column": "ProductID"},
+    {"source_table": "SalesLT.vGetAllCategories", "target_table": "bronze.vGetAllCategories",
+     "key_columns": ["ProductCategoryID"], "watermark_column": None, "partition_column": "ProductCategoryID"},
+]
+
+# Only the columns used by silver, gold and the queries are extracted (see 02_Column_Lineage)
+for entry in bronzeManifest:
+    entry["columns"] = projected_columns(
+        entry["source_table"], entry["key_columns"], full_fidelity=bronzeFullFidelity,
+        watermark_column=entry.get("watermark_column", "ModifiedDate")
+    )
 
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Ingestion of Address
-# MAGIC
+# MAGIC ## Ingestion
 # MAGIC
+# MAGIC The tables are loaded concurrently (see `run_bronze_manifest` in `10_Bronze_JDBC_Lib`).
 
 # COMMAND ----------
 
-Address = spark.read.jdbc(url=jdbcUrl, table="SalesLT.Address", properties=connectionProperties)
-display(Address)
-
-Address.write.mode("overwrite").saveAsTable("bronze.Address")
-
-# COMMAND ----------
-
-# MAGIC %md
-# MAGIC ## Ingestion of Customer
+bronzeResults = run_bronze_manifest(
+    jdbcUrl, connectionProperties, bronzeManifest,
+    max_workers=bronzeMaxWorkers, reconcile=reconcileDeletes,
+    num_partitions=jdbcNumPartitions, fetchsize=jdbcFetchSize, strategy=jdbcPartitionStrategy
+)
 
 # COMMAND ----------
 
-Customer = spark.read.jdbc(url=jdbcUrl, table="SalesLT.Customer", properties=connectionProperties)
-display(Customer)
-
-Customer.write.mode("overwrite").saveAsTable("bronze.Customer")
+display(spark.createDataFrame(
+    bronzeResults,
+    "source_table STRING, target_table STRING, status STRING, mode STRING, rows_extracted BIGINT, "
+    "rows_deleted BIGINT, error STRING, duration_s DOUBLE"
+))
@@ -0,0 +1,1124 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # SCD library
+# MAGIC
+# MAGIC Helper functions shared by the silver and gold notebooks. Include them with `%run ./20_SCD2_Lib`.
+# MAGIC The SCD2 engine below also needs `%run ./02_Column_Lineage` for the table specs.
+# MAGIC
+# MAGIC ## Row fingerprint
+# MAGIC
+# MAGIC Instead of comparing every tracked column (`tgt.a != src.a OR tgt.b != src.b ...`), each row gets a 64-bit
+# MAGIC fingerprint of its tracked columns, computed once when the row is loaded and stored in `_tf_row_hash`. The MERGE
+# MAGIC then compares a single `BIGINT`.
+# MAGIC
+# MAGIC `xxhash64` skips NULL arguments, so `(NULL, 'a')` and `('a', NULL)` would get the same hash: every column is
+# MAGIC followed by its `IS NULL` flag, which makes the fingerprint null-safe. `!=` comparisons, on the other hand, are
+# MAGIC NULL as soon as one side is NULL and silently miss the changes to or from NULL.
+
+# COMMAND ----------
+
+from pyspark.sql.functions import expr
+
+ROW_HASH_COLUMN = "_tf_row_hash"
+
+# COMMAND ----------
+
+def row_hash_expr(columns):
+    """
+    Build the SQL expression of the null-safe row fingerprint.
+
+    Args:
+        columns (list): Tracked columns, in a fixed order.
+
+    Returns:
+        str: xxhash64 expression returning a BIGINT.
+    """
+    arguments = ", ".join(f"{column}, {column} IS NULL" for column in columns)
+    return f"xxhash64({arguments})"
+
+
+def with_row_hash(df, columns):
+    """
+    Add the row fingerprint column to a DataFrame.
+
+    Args:
+        df (DataFrame): Rows to fingerprint.
+        columns (list): Tracked columns, in a fixed order.
+
+    Returns:
+        DataFrame: df with the _tf_row_hash column.
+    """
+    return df.withColumn(ROW_HASH_COLUMN, expr(row_hash_expr(columns)))
+
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Surrogate keys
+# MAGIC
+# MAGIC The surrogate keys are not `IDENTITY` columns: Delta hands out identity values one writer at a time, so two
+# MAGIC MERGEs into the same table cannot commit concurrently, and a fact has to join a dimension to learn the key of a
+# MAGIC member. A surrogate key is instead the same null-safe 64-bit hash as the fingerprint, of the columns identifying
+# MAGIC the row:
+# MAGIC
+# MAGIC - silver versions (`_tf_id`): business key and `_tf_valid_from`
+# MAGIC - gold dimensions: natural key, so a fact derives the key of a member from the natural key it holds
+# MAGIC   (`dim_key_expr` in `30_Gold_Key_Map_Lib`)
+# MAGIC - facts: key of the source line
+# MAGIC
+# MAGIC The same row always gets the same key, whatever the load order or the number of writers. The hash depends on the
+# MAGIC column types: a fact must hash a natural key with the type of the dimension column (`INT` for all the ids here).
+# MAGIC
+# MAGIC Two rows may still get the same key: about 3 chances in 100 million for a table of one million rows. After every
+# MAGIC load `check_surrogate_keys` compares the keys of the new rows with the rest of the table; shared keys are recorded
+# MAGIC in `silver.surrogate_key_collision` and fail the load, so that nothing downstream reads an ambiguous key.
+
+# COMMAND ----------
+
+SURROGATE_KEY_COLUMN = "_tf_id"
+SURROGATE_KEY_COLLISION_TABLE = "silver.surrogate_key_collision"
+
+
+def surrogate_key_expr(columns):
+    """
+    Build the SQL expression of the surrogate key of a row.
+
+    Args:
+        columns (list): Columns or SQL expressions identifying the row, in a fixed order.
+
+    Returns:
+        str: xxhash64 expression returning a BIGINT.
+    """
+    return row_hash_expr(columns)
+
+
+def check_surrogate_keys(table, key_column=SURROGATE_KEY_COLUMN, new_rows=None):
+    """
+    Check that no two rows of a table share a surrogate key.
+
+    Collisions are appended to silver.surrogate_key_collision (blind appends, safe with concurrent loads).
+
+    Args:
+        table (str): Table to check.
+        key_column (str): Surrogate key column.
+        new_rows (str): SQL condition selecting the rows written by the last load: only their keys are checked
+            against the table. None checks every key.
+
+    Raises:
+        ValueError: When keys are shared by several rows.
+    """
+    keys = spark.table(table).select(key_column)
+    if new_rows:
+        new_keys = spark.table(table).filter(new_rows).select(key_column).distinct()
+        keys = keys.join(new_keys, key_column, "left_semi")
+    collisions = (
+        keys.groupBy(key_column).count().filter("count > 1")
+        .selectExpr(f"'{table}' AS table_name", f"{key_column} AS surrogate_key", "count AS row_count",
+                    "current_timestamp() AS detected_at")
+        .collect()
+    )
+    if not collisions:
+        return
+    spark.sql(f"""
+        CREATE TABLE IF NOT EXISTS {SURROGATE_KEY_COLLISION_TABLE} (
+            table_name STRING NOT NULL,
+            surrogate_key BIGINT,
+            row_count BIGINT,
+            detected_at TIMESTAMP
+        )
+    """)
+    schema = "table_name STRING, surrogate_key BIGINT, row_count BIGINT, detected_at TIMESTAMP"
+    spark.createDataFrame(collisions, schema).write.mode("append").saveAsTable(SURROGATE_KEY_COLLISION_TABLE)
+    raise ValueError(f"{table}: {len(collisions)} values of {key_column} shared by several rows, "
+                     f"see {SURROGATE_KEY_COLLISION_TABLE}")
+
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## SCD2 engine
+# MAGIC
+# MAGIC `run_scd2` historizes a silver table from a table spec instead of hand-written MERGE statements. A spec is an
+# MAGIC entry of `SILVER_MAPPINGS` (`02_Column_Lineage`):
+# MAGIC
+# MAGIC | Key | Required | Description |
+# MAGIC |-----|----------|-------------|
+# MAGIC | `bronze_table` | yes | Source table in bronze |
+# MAGIC | `business_key` | yes | Silver columns identifying a row |
+# MAGIC | `columns` | yes | `(source column, silver column)` pairs, in the order of the silver table |
+# MAGIC | `tracked_columns` | no | Silver columns whose changes create a new version (default: all but the business key and the `UNEXTRACTED_COLUMNS`) |
+# MAGIC
+# MAGIC The generated MERGE:
+# MAGIC - runs in a single pass: its source is the union of the source rows on their business key (they close the changed
+# MAGIC   current versions and insert the new keys) and of a second copy of the changed rows with a NULL merge key (they
+# MAGIC   never match and insert the new versions), so the target is scanned and rewritten once
+# MAGIC - compares the stored fingerprints (`_tf_row_hash`) instead of every column
+# MAGIC - with a full snapshot of the source, closes the current versions of the keys missing from it. They are found by
+# MAGIC   `scd2_tombstones`, an anti-join of the business key columns only (current target keys against source keys), and
+# MAGIC   added to the MERGE source as `_tf_deleted` rows. `WHEN NOT MATCHED BY SOURCE` would instead make the MERGE outer
+# MAGIC   join the whole source with the whole current target, every column included (still available with
+# MAGIC   `delete_detection="not_matched_by_source"`)
+# MAGIC - with a partial source (e.g. the Change Data Feed of the bronze table, see `scd2_changes`), only touches the keys
+# MAGIC   it contains: rows flagged `_tf_deleted` close their current version, and the target is restricted to the key
+# MAGIC   range of the source so Delta skips the files outside of it (data skipping on the min/max statistics)
+# MAGIC - only reads the current versions through the generated flag `_tf_is_current`, the first clustering column of the
+# MAGIC   silver tables: after `optimize_scd2_tables` the files holding only closed versions are skipped
+# MAGIC - computes the surrogate key `_tf_id` of the inserted versions from their business key and `_tf_valid_from`
+# MAGIC   instead of an identity column, so the tables can be loaded concurrently (see `run_scd2_tables`)
+
+# COMMAND ----------
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pyspark.sql import Window
+from pyspark.sql.functions import broadcast, col, lit, max as max_, min as min_, row_number
+
+# Flag of the source rows deleted at the source (partial sources and tombstones)
+DELETED_COLUMN = "_tf_deleted"
+
+# Technical columns filled by the engine, after the mapped columns
+SCD2_TECHNICAL_COLUMNS = [ROW_HASH_COLUMN, "_tf_valid_from", "_tf_valid_to", "_tf_create_date", "_tf_update_date"]
+ROW_HASH_COLUMNS_PROPERTY = "tf.row_hash_columns"
+
+# COMMAND ----------
+
+def scd2_tracked_columns(spec):
+    """
+    Get the silver columns whose changes create a new version.
+
+    The columns mapped from UNEXTRACTED_COLUMNS (02_Column_Lineage) are always NULL and are not tracked.
+
+    Args:
+        spec (dict): Table spec.
+
+    Returns:
+        list: Silver columns, in mapping order.
+    """
+    if spec.get("tracked_columns"):
+        return spec["tracked_columns"]
+    unextracted = UNEXTRACTED_COLUMNS.get(spec.get("source_table"), [])
+    return [
+        target for source, target in spec["columns"]
+        if target not in spec["business_key"] and source not in unextracted
+    ]
+
+
+def refresh_row_hashes(target_table, spec):
+    """
+    Recompute the fingerprints of the current versions once the tracked columns of a spec changed.
+
+    The tracked columns the stored fingerprints were computed from are kept in the table property
+    ROW_HASH_COLUMNS_PROPERTY. When the spec tracks other columns, the current versions get the fingerprint of the new
+    list, instead of all being seen as changed by the next MERGE. Closed versions are never compared and keep theirs.
+
+    Args:
+        target_table (str): Silver table.
+        spec (dict): Table spec.
+    """
+    columns = scd2_tracked_columns(spec)
+    tracked = ",".join(columns)
+    properties = {row["key"]: row["value"] for row in spark.sql(f"SHOW TBLPROPERTIES {target_table}").collect()}
+    if properties.get(ROW_HASH_COLUMNS_PROPERTY) == tracked:
+        return
+
+    hash_expr = row_hash_expr(columns)
+    spark.sql(f"""
+        UPDATE {target_table}
+        SET {ROW_HASH_COLUMN} = {hash_expr}
+        WHERE _tf_is_current AND NOT ({ROW_HASH_COLUMN} <=> {hash_expr})
+    """)
+    spark.sql(f"ALTER TABLE {target_table} SET TBLPROPERTIES ('{ROW_HASH_COLUMNS_PROPERTY}' = '{tracked}')")
+    print(f"{target_table}: fingerprints of the current versions recomputed on {len(columns)} tracked columns")
+
+
+def scd2_select_exprs(target_table, spec, source_columns):
+    """
+    Build the selectExpr list renaming the source columns to the silver columns.
+
+    Silver columns whose source column is missing (not extracted to bronze, see projected_columns()) are loaded
+    as NULL, cast to the type of the silver column.
+
+    Args:
+        target_table (str): Silver table, e.g. "silver.customer".
+        spec (dict): Table spec.
+        source_columns (list): Columns of the source DataFrame.
+
+    Returns:
+        list: Expressions for DataFrame.selectExpr().
+    """
+    available = {column.lower() for column in source_columns}
+    target_schema = spark.table(target_table).schema
+
+    exprs = []
+    for source, target in spec["columns"]:
+        if source.lower() in available:
+            exprs.append(f"{source} AS {target}")
+        else:
+            exprs.append(f"CAST(NULL AS {target_schema[target].dataType.simpleString()}) AS {target}")
+    return exprs
+
+
+def scd2_source(target_table, spec, source_df=None):
+    """
+    Prepare the source rows of a silver table: renamed, fingerprinted and flagged when deleted.
+
+    Args:
+        target_table (str): Silver table.
+        spec (dict): Table spec.
+        source_df (DataFrame): Source rows with the source column names, None for the whole bronze table.
+            An optional boolean _tf_deleted column flags the keys deleted at the source.
+
+    Returns:
+        DataFrame: Silver columns, _tf_deleted and _tf_row_hash.
+    """
+    if source_df is None:
+        source_df = spark.table(spec["bronze_table"])
+    exprs = scd2_select_exprs(target_table, spec, source_df.columns)
+    exprs.append(DELETED_COLUMN if DELETED_COLUMN in source_df.columns else f"FALSE AS {DELETED_COLUMN}")
+    return with_row_hash(source_df.selectExpr(*exprs), scd2_tracked_columns(spec))
+
+
+def scd2_changes(spec, starting_version, ending_version=None):
+    """
+    Read the rows changed in the bronze table of a spec from its Change Data Feed.
+
+    Only the last change of each key is kept. Within a commit an insert wins over a delete, so a bronze table
+    overwritten by a full load (every row deleted then inserted again) only yields its new rows.
+
+    Args:
+        spec (dict): Table spec.
+        starting_version (int): First bronze table version to read.
+        ending_version (int): Last bronze table version to read, None for the latest.
+
+    Returns:
+        DataFrame: Changed rows with the source column names and the _tf_deleted flag, for run_scd2().
+    """
+    reader = spark.read.format("delta").option("readChangeFeed", "true").option("startingVersion", starting_version)
+    if ending_version is not None:
+        reader = reader.option("endingVersion", ending_version)
+    changes = reader.table(spec["bronze_table"]).filter("_change_type != 'update_preimage'")
+
+    source_keys = [source for source, target in spec["columns"] if target in spec["business_key"]]
+    last_change = Window.partitionBy(*source_keys).orderBy(
+        col("_commit_version").desc(), (col("_change_type") == "delete").asc()
+    )
+    return (
+        changes
+        .withColumn("_change_rank", row_number().over(last_change))
+        .filter("_change_rank = 1")
+        .withColumn(DELETED_COLUMN, col("_change_type") == "delete")
+        .drop("_change_rank", "_change_type", "_commit_version", "_commit_timestamp")
+    )
+
+# COMMAND ----------
+
+def scd2_merge_sql(target_table, spec, source_view, close_missing=True, target_predicate=None):
+    """
+    Generate the single-pass SCD2 MERGE of a silver table.
+
+    Args:
+        target_table (str): Silver table.
+        spec (dict): Table spec.
+        source_view (str): Temporary view holding the output of scd2_source().
+        close_missing (bool): The source is a full snapshot: close the current versions of the missing keys.
+        target_predicate (str): Condition on the target rows (alias tgt) restricting the MERGE, or None.
+            Only valid with close_missing=False.
+
+    Returns:
+        str: MERGE statement.
+    """
+    if close_missing and target_predicate:
+        raise ValueError("A target predicate would close the current versions outside of it")
+
+    keys = spec["business_key"]
+    columns = [target for _, target in spec["columns"]]
+    current = "tgt._tf_is_current" + (f" AND {target_predicate}" if target_predicate else "")
+    changed = f"NOT (tgt.{ROW_HASH_COLUMN} <=> src.{ROW_HASH_COLUMN})"
+    close = "UPDATE SET tgt._tf_valid_to = current_timestamp(), tgt._tf_update_date = current_timestamp()"
+
+    merge_keys = ", ".join(f"src.{key} AS _merge_{key}" for key in keys)
+    null_keys = ", ".join(f"NULL AS _merge_{key}" for key in keys)
+    join_on = " AND ".join(f"tgt.{key} = src.{key}" for key in keys)
+    merge_on = " AND ".join(f"tgt.{key} = src._merge_{key}" for key in keys)
+    insert_columns = ", ".join([SURROGATE_KEY_COLUMN] + columns + SCD2_TECHNICAL_COLUMNS)
+    insert_values = ", ".join(
+        [surrogate_key_expr([f"src.{key}" for key in keys] + ["current_timestamp()"])]
+        + [f"src.{column}" for column in columns]
+        + [f"src.{ROW_HASH_COLUMN}", "current_timestamp()", "NULL", "current_timestamp()", "current_timestamp()"]
+    )
+
+    sql = f"""
+        MERGE INTO {target_table} AS tgt
+        USING (
+          SELECT {merge_keys}, src.* FROM {source_view} AS src
+          UNION ALL
+          SELECT {null_keys}, src.* FROM {source_view} AS src
+          JOIN {target_table} AS tgt ON {join_on} AND {current}
+          WHERE NOT src.{DELETED_COLUMN} AND {changed}
+        ) AS src
+        ON {merge_on} AND {current}
+        WHEN MATCHED AND (src.{DELETED_COLUMN} OR {changed}) THEN {close}
+        WHEN NOT MATCHED AND NOT src.{DELETED_COLUMN} THEN INSERT ({insert_columns}) VALUES ({insert_values})
+    """
+    if close_missing:
+        sql += f"WHEN NOT MATCHED BY SOURCE AND tgt._tf_is_current THEN {close}\n"
+    return sql
+
+
+def scd2_tombstones(target_table, spec, source, broadcast_keys=False):
+    """
+    Find the current keys of a silver table missing from a full snapshot of its source.
+
+    Only the business key columns are read and shuffled on both sides. Broadcasting the source keys, when they
+    fit in memory, removes the shuffle altogether.
+
+    Args:
+        target_table (str): Silver table.
+        spec (dict): Table spec.
+        source (DataFrame): Output of scd2_source() for the full snapshot.
+        broadcast_keys (bool): Broadcast the source keys instead of shuffling both sides.
+
+    Returns:
+        DataFrame: Business key columns and _tf_deleted = TRUE, one row per deleted key.
+    """
+    keys = spec["business_key"]
+    source_keys = source.select(*keys)
+    if broadcast_keys:
+        source_keys = broadcast(source_keys)
+    return (
+        spark.table(target_table).filter("_tf_is_current").select(*keys)
+        .join(source_keys, keys, "left_anti")
+        .withColumn(DELETED_COLUMN, lit(True))
+    )
+
+
+def scd2_key_range(df, key):
+    """
+    Get the range of the first business key column in the source rows.
+
+    Args:
+        df (DataFrame): Output of scd2_source().
+        key (str): Silver key column.
+
+    Returns:
+        tuple: (lower, upper) bounds, (None, None) for an empty source.
+    """
+    bounds = df.agg(min_(key), max_(key)).first()
+    return bounds[0], bounds[1]
+
+# COMMAND ----------
+
+def run_scd2(target_table, spec, source_df=None, close_missing=None, prune=True, delete_detection="anti_join",
+             broadcast_keys=False):
+    """
+    Historize a silver table from its table spec with a single MERGE and measure it.
+
+    Args:
+        target_table (str): Silver table, e.g. "silver.customer".
+        spec (dict): Table spec.
+        source_df (DataFrame): Partial source (e.g. scd2_changes()), None for a full snapshot of the bronze table.
+        close_missing (bool): Close the current versions of the keys missing from the source.
+            Defaults to True for a full snapshot, False for a partial source.
+        prune (bool): With a partial source, restrict the target to the key range of the source.
+        delete_detection (str): How the missing keys are found with close_missing: "anti_join" (key-only
+            tombstones, see scd2_tombstones()) or "not_matched_by_source" (clause of the MERGE).
+        broadcast_keys (bool): Broadcast the source keys in the anti-join, see scd2_tombstones().
+
+    Returns:
+        dict: Table, mode, MERGE metrics and wall time.
+    """
+    if close_missing is None:
+        close_missing = source_df is None
+    start = time.perf_counter()
+    result = {"target_table": target_table, "mode": "snapshot" if source_df is None else "changes"}
+
+    source = scd2_source(target_table, spec, source_df)
+    partial = not close_missing
+    if close_missing and delete_detection == "anti_join":
+        tombstones = scd2_tombstones(target_table, spec, source, broadcast_keys)
+        source = source.unionByName(tombstones, allowMissingColumns=True)
+        close_missing = False
+    view = f"_scd2_src_{target_table.replace('.', '_')}"
+    source.createOrReplaceTempView(view)
+
+    target_predicate = None
+    if prune and partial:
+        key = spec["business_key"][0]
+        lower, upper = scd2_key_range(source, key)
+        if lower is None:
+            print(f"{target_table}: no change")
+            result.update(source_rows=0, rows_inserted=0, rows_closed=0, files_added=0, files_removed=0,
+                          duration_s=round(time.perf_counter() - start, 3))
+            return result
+        if isinstance(lower, int):
+            target_predicate = f"tgt.{key} BETWEEN {lower} AND {upper}"
+
+    load_start = spark.sql("SELECT current_timestamp()").first()[0]
+    spark.sql(scd2_merge_sql(target_table, spec, view, close_missing, target_predicate))
+    metrics = spark.sql(f"DESCRIBE HISTORY {target_table} LIMIT 1").first()["operationMetrics"]
+    if int(metrics.get("numTargetRowsInserted", 0)):
+        check_surrogate_keys(target_table, new_rows=f"_tf_is_current AND _tf_create_date >= TIMESTAMP '{load_start}'")
+    result.update(
+        source_rows=int(metrics.get("numSourceRows", 0)),
+        rows_inserted=int(metrics.get("numTargetRowsInserted", 0)),
+        rows_closed=int(metrics.get("numTargetRowsUpdated", 0)),
+        files_added=int(metrics.get("numTargetFilesAdded", 0)),
+        files_removed=int(metrics.get("numTargetFilesRemoved", 0)),
+        duration_s=round(time.perf_counter() - start, 3),
+    )
+    print(f"{target_table}: {result['rows_inserted']} versions inserted, {result['rows_closed']} closed "
+          f"in {result['duration_s']} s")
+    return result
+
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Change Data Feed checkpoints
+# MAGIC
+# MAGIC In incremental mode a silver table only reads the bronze rows changed since the last bronze version it processed,
+# MAGIC kept per consumer and source table in `silver.cdf_checkpoint`. Inserts and `update_postimage` rows become new
+# MAGIC versions when their fingerprint changed, `delete` rows close the current version: no `WHEN NOT MATCHED BY SOURCE`,
+# MAGIC and the cost follows the number of changed rows instead of the size of the tables.
+# MAGIC
+# MAGIC A table without checkpoint, or whose changes cannot be read any more (Change Data Feed enabled later, history
+# MAGIC vacuumed, schema changed by a full reload), falls back to a snapshot of the bronze version it just read. Reprocessing
+# MAGIC changes is harmless: an unchanged fingerprint creates no version and a key already closed is not closed again.
+
+# COMMAND ----------
+
+CDF_CHECKPOINT_TABLE = "silver.cdf_checkpoint"
+
+# Error classes of a Change Data Feed read that a snapshot recovers from: change data not recorded (feed enabled
+# later), log or change files removed by VACUUM, incompatible schema change
+CDF_UNREADABLE_ERRORS = (
+    "DELTA_MISSING_CHANGE_DATA",
+    "DELTA_CHANGE_DATA_FILE_NOT_FOUND",
+    "DELTA_FILE_NOT_FOUND_DETAILED",
+    "DELTA_VERSIONS_NOT_CONTIGUOUS",
+    "DELTA_CHANGE_DATA_FEED_INCOMPATIBLE_DATA_SCHEMA",
+    "DELTA_CHANGE_DATA_FEED_INCOMPATIBLE_SCHEMA_CHANGE",
+    "FileNotFoundException",
+)
+
+
+def ensure_cdf_checkpoint_table():
+    """
+    Create the Change Data Feed checkpoint table if it does not exist yet.
+    """
+    spark.sql(f"""
+        CREATE TABLE IF NOT EXISTS {CDF_CHECKPOINT_TABLE} (
+            consumer STRING NOT NULL,
+            source_table STRING NOT NULL,
+            last_version BIGINT,
+            updated_at TIMESTAMP
+        )
+    """)
+
+
+def get_cdf_checkpoint(consumer, source_table):
+    """
+    Get the last version of a source table processed by a consumer.
+
+    Args:
+        consumer (str): Table reading the changes, e.g. "silver.address".
+        source_table (str): Table whose changes are read, e.g. "bronze.address".
+
+    Returns:
+        int: Last processed version, None if the consumer never read the table.
+    """
+    rows = (
+        spark.table(CDF_CHECKPOINT_TABLE)
+        .filter((col("consumer") == consumer) & (col("source_table") == source_table))
+        .select("last_version")
+        .collect()
+    )
+    return rows[0]["last_version"] if rows else None
+
+
+def save_cdf_checkpoints(checkpoints):
+    """
+    Store the last processed versions, in a single MERGE.
+
+    Args:
+        checkpoints (list): Dicts with the consumer, source_table and last_version keys.
+    """
+    if not checkpoints:
+        return
+    rows = [(checkpoint["consumer"], checkpoint["source_table"], checkpoint["last_version"]) for checkpoint in checkpoints]
+    spark.createDataFrame(rows, "consumer STRING, source_table STRING, last_version BIGINT") \
+        .createOrReplaceTempView("_new_cdf_checkpoints")
+
+    spark.sql(f"""
+        MERGE INTO {CDF_CHECKPOINT_TABLE} AS tgt
+        USING _new_cdf_checkpoints AS src
+        ON tgt.consumer = src.consumer AND tgt.source_table = src.source_table
+        WHEN MATCHED THEN UPDATE SET tgt.last_version = src.last_version, tgt.updated_at = current_timestamp()
+        WHEN NOT MATCHED THEN INSERT (consumer, source_table, last_version, updated_at)
+            VALUES (src.consumer, src.source_table, src.last_version, current_timestamp())
+    """)
+
+
+def latest_version(table):
+    """
+    Get the current version of a Delta table.
+
+    Args:
+        table (str): Delta table.
+
+    Returns:
+        int: Version of the last commit.
+    """
+    return spark.sql(f"DESCRIBE HISTORY {table} LIMIT 1").first()["version"]
+
+
+def cdf_unreadable(error):
+    """
+    Tell whether an error comes from a Change Data Feed that can no longer be read.
+
+    Args:
+        error (Exception): Error raised while reading the changes.
+
+    Returns:
+        bool: True when the caller can fall back to a snapshot, False when the error must be raised.
+    """
+    message = str(error)
+    return any(error_class in message for error_class in CDF_UNREADABLE_ERRORS)
+
+
+def run_scd2_incremental(target_table, spec):
+    """
+    Historize a silver table from the bronze changes since its checkpoint.
+
+    The checkpoint is not stored here: the result holds it, for save_cdf_checkpoints().
+
+    Args:
+        target_table (str): Silver table.
+        spec (dict): Table spec.
+
+    Returns:
+        dict: Result of run_scd2(), with the bronze versions read and the new checkpoint.
+    """
+    bronze_table = spec["bronze_table"]
+    last_version = get_cdf_checkpoint(target_table, bronze_table)
+    current_version = latest_version(bronze_table)
+    checkpoint = {"consumer": target_table, "source_table": bronze_table, "last_version": current_version}
+
+    result = None
+    if last_version is not None and last_version >= current_version:
+        print(f"{target_table}: bronze unchanged since version {last_version}")
+        result = {"target_table": target_table, "mode": "changes", "source_rows": 0, "rows_inserted": 0,
+                  "rows_closed": 0, "files_added": 0, "files_removed": 0, "duration_s": 0.0}
+    elif last_version is not None:
+        # Only the read of the changes falls back to a snapshot: a failure of the MERGE or of the surrogate key
+        # check fails the load
+        changes = None
+        try:
+            changes = scd2_changes(spec, last_version + 1, current_version).localCheckpoint()
+        except Exception as e:
+            if not cdf_unreadable(e):
+                raise
+            print(f"{target_table}: changes of {bronze_table} since version {last_version + 1} unreadable ({e}), "
+                  f"falling back to a snapshot")
+        if changes is not None:
+            result = run_scd2(target_table, spec, changes)
+    if result is None:
+        snapshot = spark.read.option("versionAsOf", current_version).table(bronze_table)
+        result = run_scd2(target_table, spec, snapshot, close_missing=True)
+        result["mode"] = "snapshot"
+
+    result.update(from_version=None if last_version is None else last_version + 1, to_version=current_version,
+                  checkpoint=checkpoint)
+    return result
+
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Current snapshot tables
+# MAGIC
+# MAGIC A spec with a `current_table` (e.g. `silver.address_current`) also maintains a companion table holding only the
+# MAGIC current version of every key, clustered on the join keys of the gold notebooks: they join these compact tables
+# MAGIC instead of filtering the growing history.
+# MAGIC
+# MAGIC Delta has no multi-table transaction, so the companion table cannot be written by the SCD2 MERGE itself. It is
+# MAGIC synchronized right after, from the Change Data Feed of the history table since the last version it applied
+# MAGIC (checkpoint in `silver.cdf_checkpoint`, consumer = the companion table). Readers may see it one history commit
+# MAGIC behind; a failed synchronization is caught up by the next run, as the last state of each changed key is applied.
+
+# COMMAND ----------
+
+def sync_current_table(target_table, spec, save_checkpoint=True):
+    """
+    Bring the current snapshot table of a silver table up to date with its history.
+
+    Without checkpoint the snapshot is rebuilt from the current versions. Otherwise the last change of every key
+    since the checkpoint is applied: a current version is upserted, a closed one removes the key.
+
+    Args:
+        target_table (str): Silver history table.
+        spec (dict): Table spec, with a current_table.
+        save_checkpoint (bool): Store the checkpoint, False when the caller stores it with others.
+
+    Returns:
+        int: History version the snapshot reflects.
+    """
+    current_table = spec["current_table"]
+    last_version = get_cdf_checkpoint(current_table, target_table)
+    current_version = latest_version(target_table)
+    columns = spark.table(current_table).columns
+    column_list = ", ".join(columns)
+
+    if last_version is None:
+        spark.sql(f"""
+            INSERT OVERWRITE {current_table}
+            SELECT {column_list} FROM {target_table} VERSION AS OF {current_version} WHERE _tf_is_current
+        """)
+        print(f"{current_table}: rebuilt from {target_table} version {current_version}")
+    elif last_version < current_version:
+        keys = spec["business_key"]
+        view = f"_current_changes_{current_table.replace('.', '_')}"
+        last_change = Window.partitionBy(*keys).orderBy(col("_commit_version").desc(), col("_tf_is_current").desc())
+        (
+            spark.read.format("delta").option("readChangeFeed", "true")
+            .option("startingVersion", last_version + 1).option("endingVersion", current_version)
+            .table(target_table)
+            # Closed versions deleted by the archival (see archive_closed_versions()) do not affect the snapshot
+            .filter("_change_type IN ('insert', 'update_postimage') OR (_change_type = 'delete' AND _tf_is_current)")
+            .withColumn("_change_rank", row_number().over(last_change))
+            .filter("_change_rank = 1")
+            .selectExpr(*columns, "_change_type != 'delete' AND _tf_is_current AS _tf_is_current")
+            .createOrReplaceTempView(view)
+        )
+        on_clause = " AND ".join(f"tgt.{key} = src.{key}" for key in keys)
+        update_set = ", ".join(f"tgt.{column} = src.{column}" for column in columns)
+        insert_values = ", ".join(f"src.{column}" for column in columns)
+        spark.sql(f"""
+            MERGE INTO {current_table} AS tgt
+            USING {view} AS src
+            ON {on_clause}
+            WHEN MATCHED AND NOT src._tf_is_current THEN DELETE
+            WHEN MATCHED THEN UPDATE SET {update_set}
+            WHEN NOT MATCHED AND src._tf_is_current THEN INSERT ({column_list}) VALUES ({insert_values})
+        """)
+        metrics = spark.sql(f"DESCRIBE HISTORY {current_table} LIMIT 1").first()["operationMetrics"]
+        print(f"{current_table}: {metrics.get('numTargetRowsInserted', 0)} keys added, "
+              f"{metrics.get('numTargetRowsUpdated', 0)} updated, {metrics.get('numTargetRowsDeleted', 0)} removed")
+
+    if save_checkpoint:
+        save_cdf_checkpoints([{"consumer": current_table, "source_table": target_table, "last_version": current_version}])
+    return current_version
+
+
+def run_scd2_table(target_table, spec, incremental=False):
+    """
+    Historize a silver table in its own FAIR scheduler pool and synchronize its current snapshot table.
+
+    The checkpoints are not stored here: the result holds them, for save_cdf_checkpoints().
+
+    Args:
+        target_table (str): Silver table.
+        spec (dict): Table spec.
+        incremental (bool): Read the bronze Change Data Feed since the checkpoint instead of a full snapshot.
+
+    Returns:
+        dict: Result of run_scd2() or run_scd2_incremental(), with the checkpoints to store.
+    """
+    spark.sparkContext.setLocalProperty("spark.scheduler.pool", f"silver_{target_table}")
+    try:
+        refresh_row_hashes(target_table, spec)
+        result = run_scd2_incremental(target_table, spec) if incremental else run_scd2(target_table, spec)
+        result["checkpoints"] = [result.pop("checkpoint")] if incremental else []
+        if spec.get("current_table"):
+            version = sync_current_table(target_table, spec, save_checkpoint=False)
+            result["checkpoints"].append(
+                {"consumer": spec["current_table"], "source_table": target_table, "last_version": version}
+            )
+    finally:
+        spark.sparkContext.setLocalProperty("spark.scheduler.pool", None)
+    return result
+
+
+def run_scd2_tables(specs, incremental=False, max_workers=1):
+    """
+    Historize several silver tables and synchronize their current snapshot tables.
+
+    The surrogate keys being computed (see surrogate_key_expr()), nothing orders the loads: with max_workers > 1 the
+    tables are loaded concurrently, as the bronze tables are (see run_bronze_manifest in 10_Bronze_JDBC_Lib).
+    The checkpoints of the tables are stored at the end, in a single commit.
+
+    Args:
+        specs (dict): Table specs by silver table, e.g. SILVER_MAPPINGS.
+        incremental (bool): Read the bronze Change Data Feed since the checkpoints instead of full snapshots.
+        max_workers (int): Number of tables loaded at the same time.
+
+    Returns:
+        list: One result per table, see run_scd2().
+    """
+    ensure_cdf_checkpoint_table()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(lambda item: run_scd2_table(*item, incremental=incremental), specs.items()))
+
+    save_cdf_checkpoints([checkpoint for result in results for checkpoint in result.pop("checkpoints")])
+    return results
+
+
+def optimize_scd2_tables(specs):
+    """
+    Recluster silver tables after their MERGE.
+
+    The MERGE writes the new and the closed versions in the same files: OPTIMIZE moves them apart again according to
+    the clustering keys (_tf_is_current, business key). Liquid clustering only rewrites the files not clustered yet.
+
+    The current snapshot tables are optimized as well.
+
+    Args:
+        specs (dict): Table specs by silver table, e.g. SILVER_MAPPINGS.
+    """
+    for target_table, spec in specs.items():
+        for table in [target_table] + ([spec["current_table"]] if spec.get("current_table") else []):
+            start = time.perf_counter()
+            spark.sql(f"OPTIMIZE {table}")
+            print(f"{table}: optimized in {time.perf_counter() - start:.1f} s")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## History tiering
+# MAGIC
+# MAGIC `archive_closed_versions` moves the versions closed more than `retention_days` ago from a silver table to
+# MAGIC `<table>_history`, so the table rewritten by every MERGE only grows with the number of keys and the recent changes.
+# MAGIC The archive uses a colder layout: zstd compression, large files, clustered on the validity period and the key, no
+# MAGIC Change Data Feed. The view `<table>_all` is the union of both and keeps the full history queryable.
+# MAGIC
+# MAGIC The move is an insert into the archive (skipping the versions already there) followed by a delete from the table,
+# MAGIC with the same cutoff: two commits, but rerunning after a failure between them completes the move without duplicates.
+# MAGIC The duplicate check only reads the archive files closed since the oldest version to move, and zstd is a table
+# MAGIC property of the archive (`delta.parquet.compression.codec`), kept by OPTIMIZE and auto-compaction.
+
+# COMMAND ----------
+
+ARCHIVE_SUFFIX = "_history"
+ALL_VERSIONS_SUFFIX = "_all"
+
+
+def all_versions_table(target_table):
+    """
+    Get the relation holding every version of a silver table: the <table>_all view when it has an archive.
+
+    Args:
+        target_table (str): Silver SCD2 table.
+
+    Returns:
+        str: Table or view name.
+    """
+    view = f"{target_table}{ALL_VERSIONS_SUFFIX}"
+    return view if spark.catalog.tableExists(view) else target_table
+
+
+def archive_closed_versions(target_table, spec, retention_days, archive_table=None):
+    """
+    Move the versions of a silver table closed more than retention_days ago to its archive table.
+
+    The archive table and the <table>_all view are created on the first run.
+
+    Args:
+        target_table (str): Silver SCD2 table, with the _tf_id surrogate key.
+        spec (dict): Table spec.
+        retention_days (int): Closed versions stay in the table that many days.
+        archive_table (str): Archive table, default <table>_history.
+
+    Returns:
+        int: Number of versions moved.
+    """
+    archive_table = archive_table or f"{target_table}{ARCHIVE_SUFFIX}"
+    cluster_keys = ", ".join(["_tf_valid_from_month"] + spec["business_key"][:2])
+    spark.sql(f"""
+        CREATE TABLE IF NOT EXISTS {archive_table}
+        CLUSTER BY ({cluster_keys})
+        TBLPROPERTIES ('delta.targetFileSize' = '256mb', 'delta.parquet.compression.codec' = 'zstd')
+        AS SELECT * FROM {target_table} WHERE FALSE
+    """)
+    # The codec is a table property, so that OPTIMIZE and auto-compaction keep writing zstd (older archives lack it)
+    spark.sql(f"ALTER TABLE {archive_table} SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd')")
+    spark.sql(f"""
+        CREATE VIEW IF NOT EXISTS {target_table}{ALL_VERSIONS_SUFFIX} AS
+        SELECT * FROM {target_table}
+        UNION ALL
+        SELECT * FROM {archive_table}
+    """)
+
+    cutoff = spark.sql(f"SELECT current_timestamp() - INTERVAL {int(retention_days)} DAYS").first()[0]
+    archived = f"NOT _tf_is_current AND _tf_valid_to < TIMESTAMP '{cutoff}'"
+    window = (
+        spark.table(target_table).filter(archived)
+        .selectExpr("COUNT(*) AS rows_moved", "MIN(_tf_valid_to) AS valid_to")
+        .first()
+    )
+    rows_moved = window["rows_moved"]
+    if rows_moved:
+        # Only a run that failed before its DELETE leaves duplicates, closed no earlier than the oldest version to move:
+        # the older archive files are skipped on the _tf_valid_to statistics
+        spark.sql(f"""
+            MERGE INTO {archive_table} AS tgt
+            USING (SELECT * FROM {target_table} WHERE {archived}) AS src
+            ON tgt._tf_id = src._tf_id
+              AND tgt._tf_valid_to >= TIMESTAMP '{window["valid_to"]}'
+            WHEN NOT MATCHED THEN INSERT *
+        """)
+        spark.sql(f"DELETE FROM {target_table} WHERE {archived}")
+    print(f"{target_table}: {rows_moved} versions closed before {cutoff} moved to {archive_table}")
+    return rows_moved
+
+
+def archive_scd2_tables(specs, retention_days):
+    """
+    Archive the closed versions of every silver table.
+
+    The point-in-time SQL functions are recreated to read the <table>_all views.
+
+    Args:
+        specs (dict): Table specs by target table.
+        retention_days (int): Closed versions stay in the tables that many days.
+
+    Returns:
+        dict: Number of versions moved by target table.
+    """
+    rows_moved = {target_table: archive_closed_versions(target_table, spec, retention_days)
+                  for target_table, spec in specs.items()}
+    create_point_in_time_functions(specs)
+    return rows_moved
+
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Point-in-time queries
+# MAGIC
+# MAGIC `as_of(table, ts)` returns the versions valid at a timestamp (one per key), `history(table, key, from_ts, to_ts)`
+# MAGIC the versions of a key overlapping a period. Both filter on the interval index of the silver tables: the month of
+# MAGIC `_tf_valid_from` and the business key are clustering columns, so the min/max statistics of `_tf_valid_from_month`,
+# MAGIC `_tf_valid_from` and `_tf_valid_to` (and of the key for `history`) skip the files of the other periods instead of
+# MAGIC scanning every version.
+# MAGIC
+# MAGIC Both read the archived versions too, through the `<table>_all` view when the table has an archive (see above).
+# MAGIC
+# MAGIC The same queries are available in SQL through the table functions created by `create_point_in_time_functions`:
+# MAGIC `SELECT * FROM silver.address_as_of(TIMESTAMP '2024-06-30')`, `SELECT * FROM silver.address_versions(from, to)`.
+
+# COMMAND ----------
+
+def as_of_predicate(ts):
+    """
+    Build the condition selecting the versions valid at a timestamp.
+
+    Args:
+        ts (str): Timestamp, as a SQL expression (e.g. "TIMESTAMP '2024-06-30'" or a function parameter).
+
+    Returns:
+        str: SQL condition on the SCD2 columns.
+    """
+    return (
+        f"_tf_valid_from_month <= CAST(date_trunc('MONTH', {ts}) AS DATE) AND _tf_valid_from <= {ts} "
+        f"AND (_tf_valid_to IS NULL OR _tf_valid_to > {ts})"
+    )
+
+
+def overlap_predicate(from_ts, to_ts):
+    """
+    Build the condition selecting the versions valid at some point of a period.
+
+    Args:
+        from_ts (str): Start of the period as a SQL expression, None for no start.
+        to_ts (str): End of the period as a SQL expression, None for no end.
+
+    Returns:
+        str: SQL condition on the SCD2 columns.
+    """
+    conditions = ["TRUE"]
+    if to_ts is not None:
+        conditions.append(f"_tf_valid_from_month <= CAST(date_trunc('MONTH', {to_ts}) AS DATE) AND _tf_valid_from <= {to_ts}")
+    if from_ts is not None:
+        conditions.append(f"(_tf_valid_to IS NULL OR _tf_valid_to > {from_ts})")
+    return " AND ".join(conditions)
+
+
+def timestamp_literal(ts):
+    """
+    Turn a Python timestamp into a SQL timestamp literal.
+
+    Args:
+        ts (str or datetime): Timestamp, None stays None.
+
+    Returns:
+        str: SQL literal, e.g. "TIMESTAMP '2024-06-30 00:00:00'".
+    """
+    return None if ts is None else f"TIMESTAMP '{ts}'"
+
+
+def as_of(target_table, ts):
+    """
+    Get the state of a silver table at a point in time.
+
+    Args:
+        target_table (str): Silver SCD2 table, e.g. "silver.customer".
+        ts (str or datetime): Point in time.
+
+    Returns:
+        DataFrame: The version of every key valid at ts.
+    """
+    return spark.table(all_versions_table(target_table)).filter(as_of_predicate(timestamp_literal(ts)))
+
+
+def history(target_table, key, from_ts=None, to_ts=None):
+    """
+    Get the versions of a business key over a period.
+
+    Args:
+        target_table (str): Silver SCD2 table, e.g. "silver.customer".
+        key (dict): Business key values by column, e.g. {"customer_id": 29485}.
+        from_ts (str or datetime): Start of the period, None for the first version.
+        to_ts (str or datetime): End of the period, None for the current version.
+
+    Returns:
+        DataFrame: Versions valid at some point of the period, oldest first.
+    """
+    key_condition = " AND ".join(f"{column} = {value!r}" for column, value in key.items())
+    return (
+        spark.table(all_versions_table(target_table))
+        .filter(key_condition)
+        .filter(overlap_predicate(timestamp_literal(from_ts), timestamp_literal(to_ts)))
+        .orderBy("_tf_valid_from")
+    )
+
+
+def create_point_in_time_functions(specs):
+    """
+    Create the SQL table functions <table>_as_of(ts) and <table>_versions(from_ts, to_ts) of silver tables.
+
+    Args:
+        specs (dict): Table specs by silver table, e.g. SILVER_MAPPINGS.
+    """
+    for target_table in specs:
+        spark.sql(f"""
+            CREATE OR REPLACE FUNCTION {target_table}_as_of(ts TIMESTAMP)
+            RETURNS TABLE
+            RETURN SELECT * FROM {all_versions_table(target_table)} WHERE {as_of_predicate("ts")}
+        """)
+        spark.sql(f"""
+            CREATE OR REPLACE FUNCTION {target_table}_versions(from_ts TIMESTAMP, to_ts TIMESTAMP)
+            RETURNS TABLE
+            RETURN SELECT * FROM {all_versions_table(target_table)}
+            WHERE (to_ts IS NULL OR {overlap_predicate(None, "to_ts")})
+              AND (from_ts IS NULL OR {overlap_predicate("from_ts", None)})
+        """)
+        print(f"{target_table}: {target_table}_as_of and {target_table}_versions created")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Migrating identity keys
+# MAGIC
+# MAGIC Tables created before the hash surrogate keys hold `IDENTITY` values. `migrate_surrogate_key` moves such a table
+# MAGIC to the hash keys, once (`03_Migrate_Surrogate_Keys`):
+# MAGIC
+# MAGIC 1. the map of old to new keys is stored in `silver.surrogate_key_migration`, which stays available to remap the
+# MAGIC    copies of the keys kept outside of the lakehouse
+# MAGIC 2. the table is recreated from its own DDL (`SHOW CREATE TABLE`) without the `IDENTITY` clause, and reloaded with
+# MAGIC    the new keys from the version read before (time travel)
+# MAGIC 3. the columns of other tables referencing the keys are remapped through the map
+# MAGIC 4. the Change Data Feed checkpoints on the table are removed: the table restarts its history, its consumers rebuild
+# MAGIC    from a snapshot on their next run
+# MAGIC
+# MAGIC If the reload fails, `RESTORE TABLE <table> TO VERSION AS OF <version>` (version printed at the start) brings the
+# MAGIC identity table back before a new attempt.
+
+# COMMAND ----------
+
+import re
+
+SURROGATE_KEY_MIGRATION_TABLE = "silver.surrogate_key_migration"
+IDENTITY_CLAUSE = re.compile(r"\s+GENERATED\s+(ALWAYS|BY\s+DEFAULT)\s+AS\s+IDENTITY(\s*\([^)]*\))?", re.IGNORECASE)
+
+
+def migrate_surrogate_key(table, key_column, key_expr, references=None, keep_keys=()):
+    """
+    Replace the IDENTITY surrogate keys of a table by hash keys and remap the columns referencing them.
+
+    Args:
+        table (str): Table whose key column is an IDENTITY column.
+        key_column (str): Surrogate key column.
+        key_expr (str): SQL expression of the new key over the columns of the table, see surrogate_key_expr().
+        references (dict): Column holding the key in other tables, by table, e.g. {"gold.fact_sales": "_tf_dim_customer_id"}.
+        keep_keys (tuple): Keys kept as they are, e.g. the unknown member -9 of the dimensions.
+
+    Returns:
+        int: Version of the table before the migration, None when the table has no IDENTITY column.
+    """
+    ddl = spark.sql(f"SHOW CREATE TABLE {table}").first()[0]
+    if not IDENTITY_CLAUSE.search(ddl):
+        print(f"{table}: no IDENTITY column, nothing to migrate")
+        return None
+    version = latest_version(table)
+    print(f"{table}: migrating the keys of version {version}")
+
+    new_key = key_expr
+    if keep_keys:
+        kept = ", ".join(str(key) for key in keep_keys)
+        new_key = f"CASE WHEN {key_column} IN ({kept}) THEN {key_column} ELSE {key_expr} END"
+    spark.sql(f"""
+        CREATE TABLE IF NOT EXISTS {SURROGATE_KEY_MIGRATION_TABLE} (
+            table_name STRING NOT NULL,
+            old_key BIGINT,
+            new_key BIGINT,
+            migrated_at TIMESTAMP
+        )
+    """)
+    spark.sql(f"DELETE FROM {SURROGATE_KEY_MIGRATION_TABLE} WHERE table_name = '{table}'")
+    spark.sql(f"""
+        INSERT INTO {SURROGATE_KEY_MIGRATION_TABLE}
+        SELECT '{table}', {key_column}, {new_key}, current_timestamp() FROM {table} VERSION AS OF {version}
+    """)
+
+    spark.sql(re.sub(r"^CREATE TABLE", "CREATE OR REPLACE TABLE", IDENTITY_CLAUSE.sub("", ddl)))
+    spark.sql(f"""
+        INSERT INTO {table} BY NAME
+        SELECT * EXCEPT ({key_column}), {new_key} AS {key_column} FROM {table} VERSION AS OF {version}
+    """)
+    check_surrogate_keys(table, key_column)
+
+    for reference_table, reference_column in (references or {}).items():
+        if not spark.catalog.tableExists(reference_table):
+            continue
+        spark.sql(f"""
+            MERGE INTO {reference_table} AS tgt
+            USING (SELECT old_key, new_key FROM {SURROGATE_KEY_MIGRATION_TABLE} WHERE table_name = '{table}') AS src
+            ON tgt.{reference_column} = src.old_key
+            WHEN MATCHED THEN UPDATE SET tgt.{reference_column} = src.new_key
+        """)
+        print(f"{reference_table}.{reference_column}: remapped")
+
+    if spark.catalog.tableExists(CDF_CHECKPOINT_TABLE):
+        spark.sql(f"DELETE FROM {CDF_CHECKPOINT_TABLE} WHERE source_table = '{table}'")
+    print(f"{table}: {key_column} migrated to hash keys")
+    return version
+
+
+def migrate_scd2_keys(specs):
+    """
+    Migrate the _tf_id keys of silver tables, with their current snapshot and archive tables.
+
+    The archived versions are not in the table any more: their keys are recomputed in place.
+
+    Args:
+        specs (dict): Table specs by silver table, e.g. SILVER_MAPPINGS.
+    """
+    for target_table, spec in specs.items():
+        key_expr = surrogate_key_expr(spec["business_key"] + ["_tf_valid_from"])
+        references = {spec["current_table"]: SURROGATE_KEY_COLUMN} if spec.get("current_table") else {}
+        if migrate_surrogate_key(target_table, SURROGATE_KEY_COLUMN, key_expr, references) is None:
+            continue
+        archive_table = f"{target_table}{ARCHIVE_SUFFIX}"
+        if spark.catalog.tableExists(archive_table):
+            spark.sql(f"UPDATE {archive_table} SET {SURROGATE_KEY_COLUMN} = {key_expr}")
+            print(f"{archive_table}: keys recomputed")
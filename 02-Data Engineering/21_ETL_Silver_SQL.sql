@@ -16,13 +16,41 @@ VALUES load_date;
 
 -- COMMAND ----------
 
+-- MAGIC %md
+-- MAGIC Each table is historized with a single MERGE, whose source is the union of:
+-- MAGIC - the source rows keyed on their business key: they match the current version and close it when it changed (new keys are inserted)
+-- MAGIC - a second copy of the changed rows with a NULL merge key: they never match and insert the new version
+-- MAGIC
+-- MAGIC The target is scanned and rewritten once per run, and closing the old version and inserting the new one are
+-- MAGIC committed together: a key never lacks its current row.
+-- MAGIC
+-- MAGIC The surrogate key `_tf_id` of a new version is the hash of its business key and `_tf_valid_from`, the same as
+-- MAGIC `surrogate_key_expr` of `20_SCD2_Lib`. Changes are detected on the stored fingerprint `_tf_row_hash`, computed
+-- MAGIC like `row_hash_expr` and compared with `<=>`: the versions written here and by `22_ETL_Silver_PySpark` are
+-- MAGIC interchangeable, and changes to or from NULL are not missed.
+
+-- COMMAND ----------
+
 -- MAGIC %md
 -- MAGIC ## Incremental load of address
 
 -- COMMAND ----------
 
-MERGE INTO silver.address AS tgt
-USING (
+CREATE OR REPLACE TEMP VIEW _src_address AS
+SELECT
+    src.*,
+    -- Same null-safe fingerprint as row_hash_expr of 20_SCD2_Lib, in the order of the tracked columns
+    xxhash64(
+        address_line1, address_line1 IS NULL,
+        address_line2, address_line2 IS NULL,
+        city, city IS NULL,
+        state_province, state_province IS NULL,
+        country_region, country_region IS NULL,
+        postal_code, postal_code IS NULL,
+        rowguid, rowguid IS NULL,
+        modified_date, modified_date IS NULL
+    ) AS _tf_row_hash
+FROM (
     SELECT
         AddressID       AS address_id,
         AddressLine1    AS address_line1,
@@ -34,55 +62,55 @@ USING (
         rowguid         AS rowguid,
         ModifiedDate    AS modified_date
     FROM bronze.address
-) AS src
-ON tgt.address_id = src.address_id
-  AND tgt._tf_valid_to IS NULL   -- Only match against 'active' records in silver
-  
-WHEN MATCHED AND (
-       tgt.address_line1    != src.address_line1
-    OR tgt.address_line2    != src.address_line2
-    OR tgt.city             != src.city
-    OR tgt.state_province   != src.state_province
-    OR tgt.country_region   != src.country_region
-    OR tgt.postal_code      != src.postal_code
-    OR tgt.rowguid          != src.rowguid
-    OR tgt.modified_date    != src.modified_date
-    -- etc. for any columns you want to track changes on
-) AND tgt._tf_valid_to IS NULL THEN
-  -- 1) Close the old record by setting _tf_valid_to
-  UPDATE SET 
-    tgt._tf_valid_to    = load_date,
-    tgt._tf_update_date = load_date
-  
-WHEN NOT MATCHED BY SOURCE AND tgt._tf_valid_to IS NULL THEN
-  -- 2) Close the deleted record by setting _tf_valid_to
-  UPDATE SET 
-    tgt._tf_valid_to    = load_date,
-    tgt._tf_update_date = load_date
-;
+) AS src;
+
+-- COMMAND ----------
+
+-- Rows written before the fingerprint was stored have a NULL _tf_row_hash: fill it once, so that neither
+-- this MERGE nor 22_ETL_Silver_PySpark sees them as changed
+UPDATE silver.address
+SET _tf_row_hash = xxhash64(
+    address_line1, address_line1 IS NULL,
+    address_line2, address_line2 IS NULL,
+    city, city IS NULL,
+    state_province, state_province IS NULL,
+    country_region, country_region IS NULL,
+    postal_code, postal_code IS NULL,
+    rowguid, rowguid IS NULL,
+    modified_date, modified_date IS NULL
+)
+WHERE _tf_row_hash IS NULL
+  AND _tf_is_current;
 
 -- COMMAND ----------
 
 MERGE INTO silver.address AS tgt
 USING (
-    SELECT
-        AddressID       AS address_id,
-        AddressLine1    AS address_line1,
-        AddressLine2    AS address_line2,
-        City            AS city,
-        StateProvince   AS state_province,
-        CountryRegion   AS country_region,
-        PostalCode      AS postal_code,
-        rowguid         AS rowguid,
-        ModifiedDate    AS modified_date
-    FROM bronze.address
+    -- Every source row on its business key: closes the current version if changed, inserts the new keys
+    SELECT src.address_id AS _merge_address_id, src.*
+    FROM _src_address AS src
+    UNION ALL
+    -- New version of the changed rows: NULL merge key, never matched, always inserted
+    SELECT NULL AS _merge_address_id, src.*
+    FROM _src_address AS src
+    JOIN silver.address AS tgt
+      ON tgt.address_id = src.address_id
+     AND tgt._tf_is_current
+    WHERE NOT (tgt._tf_row_hash <=> src._tf_row_hash)
 ) AS src
-ON tgt.address_id = src.address_id
-  AND tgt._tf_valid_to IS NULL   -- Only match against 'active' records in silver
-  
+ON tgt.address_id = src._merge_address_id
+  AND tgt._tf_is_current   -- Only match against 'active' records in silver
+
+WHEN MATCHED AND NOT (tgt._tf_row_hash <=> src._tf_row_hash) AND tgt._tf_is_current THEN
+  -- 1) Close the old record by setting _tf_valid_to
+  UPDATE SET 
+    tgt._tf_valid_to    = load_date,
+    tgt._tf_update_date = load_date
+
 WHEN NOT MATCHED THEN
-  -- 3) Insert NEW records (either truly new address_id or a new version if the old one was just closed)
+  -- 2) Insert NEW records (either truly new address_id or a new version if the old one was just closed)
   INSERT (
+    _tf_id,
     address_id,
     address_line1,
     address_line2,
@@ -92,12 +120,14 @@ WHEN NOT MATCHED THEN
     postal_code,
     rowguid,
     modified_date,
+    _tf_row_hash,
     _tf_valid_from,
     _tf_valid_to,
     _tf_create_date,
     _tf_update_date
   )
   VALUES (
+    xxhash64(src.address_id, src.address_id IS NULL, load_date, load_date IS NULL),  -- _tf_id
     src.address_id,
     src.address_line1,
     src.address_line2,
@@ -107,12 +137,20 @@ WHEN NOT MATCHED THEN
     src.postal_code,
     src.rowguid,
     src.modified_date,
+    src._tf_row_hash,
     load_date,        -- _tf_valid_from
     NULL,             -- _tf_valid_to
     load_date,        -- _tf_create_date
     load_date         -- _tf_update_date
   )
 
+WHEN NOT MATCHED BY SOURCE AND tgt._tf_is_current THEN
+  -- 3) Close the deleted record by setting _tf_valid_to
+  UPDATE SET 
+    tgt._tf_valid_to    = load_date,
+    tgt._tf_update_date = load_date
+;
+
 -- COMMAND ----------
 
 -- MAGIC %md
@@ -120,8 +158,26 @@ WHEN NOT MATCHED THEN
 
 -- COMMAND ----------
 
-MERGE INTO silver.customer AS tgt
-USING (
+CREATE OR REPLACE TEMP VIEW _src_customer AS
+SELECT
+    src.*,
+    -- Same null-safe fingerprint as row_hash_expr of 20_SCD2_Lib, in the order of the tracked columns: the
+    -- credentials are not extracted (UNEXTRACTED_COLUMNS of 02_Column_Lineage) and not tracked
+    xxhash64(
+        name_style, name_style IS NULL,
+        title, title IS NULL,
+        first_name, first_name IS NULL,
+        middle_name, middle_name IS NULL,
+        last_name, last_name IS NULL,
+        suffix, suffix IS NULL,
+        company_name, company_name IS NULL,
+        sales_person, sales_person IS NULL,
+        email_address, email_address IS NULL,
+        phone, phone IS NULL,
+        rowguid, rowguid IS NULL,
+        modified_date, modified_date IS NULL
+    ) AS _tf_row_hash
+FROM (
     SELECT
         CustomerID       AS customer_id,
         NameStyle        AS name_style,
@@ -134,71 +190,78 @@ USING (
         SalesPerson      AS sales_person,
         EmailAddress     AS email_address,
         Phone            AS phone,
-        PasswordHash     AS password_hash,
-        PasswordSalt     AS password_salt,
+        CAST(NULL AS STRING) AS password_hash, -- Not extracted to bronze
+        CAST(NULL AS STRING) AS password_salt, -- Not extracted to bronze
         rowguid          AS rowguid,
         ModifiedDate     AS modified_date
     FROM bronze.customer
-) AS src
-ON tgt.customer_id = src.customer_id
-   AND tgt._tf_valid_to IS NULL  -- Only match against 'active' records in silver
-
-WHEN MATCHED AND (
-       tgt.name_style        != src.name_style
-    OR tgt.title             != src.title
-    OR tgt.first_name        != src.first_name
-    OR tgt.middle_name       != src.middle_name
-    OR tgt.last_name         != src.last_name
-    OR tgt.suffix            != src.suffix
-    OR tgt.company_name      != src.company_name
-    OR tgt.sales_person      != src.sales_person
-    OR tgt.email_address     != src.email_address
-    OR tgt.phone             != src.phone
-    OR tgt.password_hash     != src.password_hash
-    OR tgt.password_salt     != src.password_salt
-    OR tgt.rowguid           != src.rowguid
-    OR tgt.modified_date     != src.modified_date
-) AND tgt._tf_valid_to IS NULL THEN
-  -- 1) Close the old record by setting _tf_valid_to
-  UPDATE SET 
-    tgt._tf_valid_to    = load_date,
-    tgt._tf_update_date = load_date
+) AS src;
 
-WHEN NOT MATCHED BY SOURCE AND tgt._tf_valid_to IS NULL THEN
-  -- 2) Close the deleted record by setting _tf_valid_to
-  UPDATE SET 
-    tgt._tf_valid_to    = load_date,
-    tgt._tf_update_date = load_date
-;
+-- COMMAND ----------
+
+-- Rows written before the fingerprint was stored have a NULL _tf_row_hash, rows written while the credentials were
+-- tracked have a fingerprint including them: recompute it once, so that neither this MERGE nor
+-- 22_ETL_Silver_PySpark sees them as changed
+UPDATE silver.customer
+SET _tf_row_hash = xxhash64(
+    name_style, name_style IS NULL,
+    title, title IS NULL,
+    first_name, first_name IS NULL,
+    middle_name, middle_name IS NULL,
+    last_name, last_name IS NULL,
+    suffix, suffix IS NULL,
+    company_name, company_name IS NULL,
+    sales_person, sales_person IS NULL,
+    email_address, email_address IS NULL,
+    phone, phone IS NULL,
+    rowguid, rowguid IS NULL,
+    modified_date, modified_date IS NULL
+)
+WHERE _tf_is_current
+  AND NOT (_tf_row_hash <=> xxhash64(
+        name_style, name_style IS NULL,
+        title, title IS NULL,
+        first_name, first_name IS NULL,
+        middle_name, middle_name IS NULL,
+        last_name, last_name IS NULL,
+        suffix, suffix IS NULL,
+        company_name, company_name IS NULL,
+        sales_person, sales_person IS NULL,
+        email_address, email_address IS NULL,
+        phone, phone IS NULL,
+        rowguid, rowguid IS NULL,
+        modified_date, modified_date IS NULL
+    ));
 
 -- COMMAND ----------
 
 MERGE INTO silver.customer AS tgt
 USING (
-    SELECT
-        CustomerID       AS customer_id,
-        NameStyle        AS name_style,
-        Title            AS title,
-        FirstName        AS first_name,
-        MiddleName       AS middle_name,
-        LastName         AS last_name,
-        Suffix           AS suffix,
-        CompanyName      AS company_name,
-        SalesPerson      AS sales_person,
-        EmailAddress     AS email_address,
-        Phone            AS phone,
-        PasswordHash     AS password_hash,
-        PasswordSalt     AS password_salt,
-        rowguid          AS rowguid,
-        ModifiedDate     AS modified_date
-    FROM bronze.customer
+    -- Every source row on its business key: closes the current version if changed, inserts the new keys
+    SELECT src.customer_id AS _merge_customer_id, src.*
+    FROM _src_customer AS src
+    UNION ALL
+    -- New version of the changed rows: NULL merge key, never matched, always inserted
+    SELECT NULL AS _merge_customer_id, src.*
+    FROM _src_customer AS src
+    JOIN silver.customer AS tgt
+      ON tgt.customer_id = src.customer_id
+     AND tgt._tf_is_current
+    WHERE NOT (tgt._tf_row_hash <=> src._tf_row_hash)
 ) AS src
-ON tgt.customer_id = src.customer_id
-   AND tgt._tf_valid_to IS NULL  -- Only match against 'active' records in silver
+ON tgt.customer_id = src._merge_customer_id
+   AND tgt._tf_is_current  -- Only match against 'active' records in silver
+
+WHEN MATCHED AND NOT (tgt._tf_row_hash <=> src._tf_row_hash) AND tgt._tf_is_current THEN
+  -- 1) Close the old record by setting _tf_valid_to
+  UPDATE SET 
+    tgt._tf_valid_to    = load_date,
+    tgt._tf_update_date = load_date
 
 WHEN NOT MATCHED THEN
-  -- 3) Insert NEW records (new customer_id or new version of existing record)
+  -- 2) Insert NEW records (new customer_id or new version of existing record)
   INSERT (
+    _tf_id,
     customer_id,
     name_style,
     title,
@@ -214,12 +277,14 @@ WHEN NOT MATCHED THEN
     password_salt,
     rowguid,
     modified_date,
+    _tf_row_hash,
     _tf_valid_from,
     _tf_valid_to,
     _tf_create_date,
     _tf_update_date
   )
   VALUES (
+    xxhash64(src.customer_id, src.customer_id IS NULL, load_date, load_date IS NULL),  -- _tf_id
     src.customer_id,
     src.name_style,
     src.title,
@@ -235,12 +300,20 @@ WHEN NOT MATCHED THEN
     src.password_salt,
     src.rowguid,
     src.modified_date,
+    src._tf_row_hash,
     load_date,        -- _tf_valid_from
     NULL,             -- _tf_valid_to
     load_date,        -- _tf_create_date
     load_date         -- _tf_update_date
   )
 
+WHEN NOT MATCHED BY SOURCE AND tgt._tf_is_current THEN
+  -- 3) Close the deleted record by setting _tf_valid_to
+  UPDATE SET 
+    tgt._tf_valid_to    = load_date,
+    tgt._tf_update_date = load_date
+;
+
 -- COMMAND ----------
 
 -- MAGIC %md
@@ -248,8 +321,20 @@ WHEN NOT MATCHED THEN
 
 -- COMMAND ----------
 
-MERGE INTO silver.sales_order_detail AS tgt
-USING (
+CREATE OR REPLACE TEMP VIEW _src_sales_order_detail AS
+SELECT
+    src.*,
+    -- Same null-safe fingerprint as row_hash_expr of 20_SCD2_Lib, in the order of the tracked columns
+    xxhash64(
+        order_qty, order_qty IS NULL,
+        product_id, product_id IS NULL,
+        unit_price, unit_price IS NULL,
+        unit_price_discount, unit_price_discount IS NULL,
+        line_total, line_total IS NULL,
+        rowguid, rowguid IS NULL,
+        modified_date, modified_date IS NULL
+    ) AS _tf_row_hash
+FROM (
     SELECT
         SalesOrderID          AS sales_order_id,
         SalesOrderDetailID    AS sales_order_detail_id,
@@ -261,56 +346,56 @@ USING (
         rowguid               AS rowguid,
         ModifiedDate          AS modified_date
     FROM bronze.salesorderdetail
-) AS src
-ON tgt.sales_order_id = src.sales_order_id
-   AND tgt.sales_order_detail_id = src.sales_order_detail_id
-   AND tgt._tf_valid_to IS NULL  -- Only match against 'active' records in silver
-
-WHEN MATCHED AND (
-       tgt.order_qty           != src.order_qty
-    OR tgt.product_id          != src.product_id
-    OR tgt.unit_price          != src.unit_price
-    OR tgt.unit_price_discount != src.unit_price_discount
-    OR tgt.line_total          != src.line_total
-    OR tgt.rowguid             != src.rowguid
-    OR tgt.modified_date       != src.modified_date
-    -- etc. for any additional columns to track changes
-) AND tgt._tf_valid_to IS NULL THEN
-  -- 1) Close the old record by setting _tf_valid_to
-  UPDATE SET 
-    tgt._tf_valid_to    = load_date,
-    tgt._tf_update_date = load_date
+) AS src;
 
-WHEN NOT MATCHED BY SOURCE AND tgt._tf_valid_to IS NULL THEN
-  -- 2) Close the deleted record by setting _tf_valid_to
-  UPDATE SET 
-    tgt._tf_valid_to    = load_date,
-    tgt._tf_update_date = load_date
-;
+-- COMMAND ----------
+
+-- Rows written before the fingerprint was stored have a NULL _tf_row_hash: fill it once, so that neither
+-- this MERGE nor 22_ETL_Silver_PySpark sees them as changed
+UPDATE silver.sales_order_detail
+SET _tf_row_hash = xxhash64(
+    order_qty, order_qty IS NULL,
+    product_id, product_id IS NULL,
+    unit_price, unit_price IS NULL,
+    unit_price_discount, unit_price_discount IS NULL,
+    line_total, line_total IS NULL,
+    rowguid, rowguid IS NULL,
+    modified_date, modified_date IS NULL
+)
+WHERE _tf_row_hash IS NULL
+  AND _tf_is_current;
 
 -- COMMAND ----------
 
 MERGE INTO silver.sales_order_detail AS tgt
 USING (
-    SELECT
-        SalesOrderID          AS sales_order_id,
-        SalesOrderDetailID    AS sales_order_detail_id,
-        OrderQty              AS order_qty,
-        ProductID             AS product_id,
-        UnitPrice             AS unit_price,
-        UnitPriceDiscount     AS unit_price_discount,
-        LineTotal             AS line_total,
-        rowguid               AS rowguid,
-        ModifiedDate          AS modified_date
-    FROM bronze.salesorderdetail
+    -- Every source row on its business key: closes the current version if changed, inserts the new keys
+    SELECT src.sales_order_id AS _merge_sales_order_id, src.sales_order_detail_id AS _merge_sales_order_detail_id, src.*
+    FROM _src_sales_order_detail AS src
+    UNION ALL
+    -- New version of the changed rows: NULL merge key, never matched, always inserted
+    SELECT NULL AS _merge_sales_order_id, NULL AS _merge_sales_order_detail_id, src.*
+    FROM _src_sales_order_detail AS src
+    JOIN silver.sales_order_detail AS tgt
+      ON tgt.sales_order_id = src.sales_order_id
+     AND tgt.sales_order_detail_id = src.sales_order_detail_id
+     AND tgt._tf_is_current
+    WHERE NOT (tgt._tf_row_hash <=> src._tf_row_hash)
 ) AS src
-ON tgt.sales_order_id = src.sales_order_id
-   AND tgt.sales_order_detail_id = src.sales_order_detail_id
-   AND tgt._tf_valid_to IS NULL  -- Only match against 'active' records in silver
+ON tgt.sales_order_id = src._merge_sales_order_id
+   AND tgt.sales_order_detail_id = src._merge_sales_order_detail_id
+   AND tgt._tf_is_current  -- Only match against 'active' records in silver
+
+WHEN MATCHED AND NOT (tgt._tf_row_hash <=> src._tf_row_hash) AND tgt._tf_is_current THEN
+  -- 1) Close the old record by setting _tf_valid_to
+  UPDATE SET 
+    tgt._tf_valid_to    = load_date,
+    tgt._tf_update_date = load_date
 
 WHEN NOT MATCHED THEN
-  -- 3) Insert NEW records (new sales_order_id or new version of existing record)
+  -- 2) Insert NEW records (new sales_order_id or new version of existing record)
   INSERT (
+    _tf_id,
     sales_order_id,
     sales_order_detail_id,
     order_qty,
@@ -320,12 +405,16 @@ WHEN NOT MATCHED THEN
     line_total,
     rowguid,
     modified_date,
+    _tf_row_hash,
     _tf_valid_from,
     _tf_valid_to,
     _tf_create_date,
     _tf_update_date
   )
   VALUES (
+    xxhash64(src.sales_order_id, src.sales_order_id IS NULL,
+             src.sales_order_detail_id, src.sales_order_detail_id IS NULL,
+             load_date, load_date IS NULL),  -- _tf_id
     src.sales_order_id,
     src.sales_order_detail_id,
     src.order_qty,
@@ -335,12 +424,20 @@ WHEN NOT MATCHED THEN
     src.line_total,
     src.rowguid,
     src.modified_date,
+    src._tf_row_hash,
     load_date,        -- _tf_valid_from
     NULL,             -- _tf_valid_to
     load_date,        -- _tf_create_date
     load_date         -- _tf_update_date
   )
 
+WHEN NOT MATCHED BY SOURCE AND tgt._tf_is_current THEN
+  -- 3) Close the deleted record by setting _tf_valid_to
+  UPDATE SET 
+    tgt._tf_valid_to    = load_date,
+    tgt._tf_update_date = load_date
+;
+
 -- COMMAND ----------
 
 -- MAGIC %md
@@ -348,8 +445,34 @@ WHEN NOT MATCHED THEN
 
 -- COMMAND ----------
 
-MERGE INTO silver.sales_order_header AS tgt
-USING (
+CREATE OR REPLACE TEMP VIEW _src_sales_order_header AS
+SELECT
+    src.*,
+    -- Same null-safe fingerprint as row_hash_expr of 20_SCD2_Lib, in the order of the tracked columns
+    xxhash64(
+        revision_number, revision_number IS NULL,
+        order_date, order_date IS NULL,
+        due_date, due_date IS NULL,
+        ship_date, ship_date IS NULL,
+        status, status IS NULL,
+        online_order_flag, online_order_flag IS NULL,
+        sales_order_number, sales_order_number IS NULL,
+        purchase_order_number, purchase_order_number IS NULL,
+        account_number, account_number IS NULL,
+        customer_id, customer_id IS NULL,
+        ship_to_address_id, ship_to_address_id IS NULL,
+        bill_to_address_id, bill_to_address_id IS NULL,
+        ship_method, ship_method IS NULL,
+        credit_card_approval_code, credit_card_approval_code IS NULL,
+        sub_total, sub_total IS NULL,
+        tax_amt, tax_amt IS NULL,
+        freight, freight IS NULL,
+        total_due, total_due IS NULL,
+        comment, comment IS NULL,
+        rowguid, rowguid IS NULL,
+        modified_date, modified_date IS NULL
+    ) AS _tf_row_hash
+FROM (
     SELECT
         SalesOrderID          AS sales_order_id,
         RevisionNumber        AS revision_number,
@@ -374,80 +497,68 @@ USING (
         rowguid               AS rowguid,
         ModifiedDate          AS modified_date
     FROM bronze.salesorderheader
-) AS src
-ON tgt.sales_order_id = src.sales_order_id
-   AND tgt._tf_valid_to IS NULL  -- Only match against 'active' records in silver
-
-WHEN MATCHED AND (
-       tgt.revision_number        != src.revision_number
-    OR tgt.order_date             != src.order_date
-    OR tgt.due_date               != src.due_date
-    OR tgt.ship_date              != src.ship_date
-    OR tgt.status                 != src.status
-    OR tgt.online_order_flag      != src.online_order_flag
-    OR tgt.sales_order_number     != src.sales_order_number
-    OR tgt.purchase_order_number  != src.purchase_order_number
-    OR tgt.account_number         != src.account_number
-    OR tgt.customer_id            != src.customer_id
-    OR tgt.ship_to_address_id     != src.ship_to_address_id
-    OR tgt.bill_to_address_id     != src.bill_to_address_id
-    OR tgt.ship_method            != src.ship_method
-    OR tgt.credit_card_approval_code != src.credit_card_approval_code
-    OR tgt.sub_total              != src.sub_total
-    OR tgt.tax_amt                != src.tax_amt
-    OR tgt.freight                != src.freight
-    OR tgt.total_due              != src.total_due
-    OR tgt.comment                != src.comment
-    OR tgt.rowguid                != src.rowguid
-    OR tgt.modified_date          != src.modified_date
-) AND tgt._tf_valid_to IS NULL THEN
-  -- 1) Close the old record by setting _tf_valid_to
-  UPDATE SET 
-    tgt._tf_valid_to    = load_date,
-    tgt._tf_update_date = load_date
+) AS src;
 
-WHEN NOT MATCHED BY SOURCE AND tgt._tf_valid_to IS NULL THEN
-  -- 2) Close the deleted record by setting _tf_valid_to
-  UPDATE SET 
-    tgt._tf_valid_to    = load_date,
-    tgt._tf_update_date = load_date
-;
+-- COMMAND ----------
+
+-- Rows written before the fingerprint was stored have a NULL _tf_row_hash: fill it once, so that neither
+-- this MERGE nor 22_ETL_Silver_PySpark sees them as changed
+UPDATE silver.sales_order_header
+SET _tf_row_hash = xxhash64(
+    revision_number, revision_number IS NULL,
+    order_date, order_date IS NULL,
+    due_date, due_date IS NULL,
+    ship_date, ship_date IS NULL,
+    status, status IS NULL,
+    online_order_flag, online_order_flag IS NULL,
+    sales_order_number, sales_order_number IS NULL,
+    purchase_order_number, purchase_order_number IS NULL,
+    account_number, account_number IS NULL,
+    customer_id, customer_id IS NULL,
+    ship_to_address_id, ship_to_address_id IS NULL,
+    bill_to_address_id, bill_to_address_id IS NULL,
+    ship_method, ship_method IS NULL,
+    credit_card_approval_code, credit_card_approval_code IS NULL,
+    sub_total, sub_total IS NULL,
+    tax_amt, tax_amt IS NULL,
+    freight, freight IS NULL,
+    total_due, total_due IS NULL,
+    comment, comment IS NULL,
+    rowguid, rowguid IS NULL,
+    modified_date, modified_date IS NULL
+)
+WHERE _tf_row_hash IS NULL
+  AND _tf_is_current;
 
 -- COMMAND ----------
 
 MERGE INTO silver.sales_order_header AS tgt
 USING (
-    SELECT
-        SalesOrderID          AS sales_order_id,
-        RevisionNumber        AS revision_number,
-        OrderDate             AS order_date,
-        DueDate               AS due_date,
-        ShipDate              AS ship_date,
-        Status                AS status,
-        OnlineOrderFlag       AS online_order_flag,
-        SalesOrderNumber      AS sales_order_number,
-        PurchaseOrderNumber   AS purchase_order_number,
-        AccountNumber         AS account_number,
-        CustomerID            AS customer_id,
-        ShipToAddressID       AS ship_to_address_id,
-        BillToAddressID       AS bill_to_address_id,
-        ShipMethod            AS ship_method,
-        CreditCardApprovalCode AS credit_card_approval_code,
-        SubTotal              AS sub_total,
-        TaxAmt                AS tax_amt,
-        Freight               AS freight,
-        TotalDue              AS total_due,
-        Comment               AS comment,
-        rowguid               AS rowguid,
-        ModifiedDate          AS modified_date
-    FROM bronze.salesorderheader
+    -- Every source row on its business key: closes the current version if changed, inserts the new keys
+    SELECT src.sales_order_id AS _merge_sales_order_id, src.*
+    FROM _src_sales_order_header AS src
+    UNION ALL
+    -- New version of the changed rows: NULL merge key, never matched, always inserted
+    SELECT NULL AS _merge_sales_order_id, src.*
+    FROM _src_sales_order_header AS src
+    JOIN silver.sales_order_header AS tgt
+      ON tgt.sales_order_id = src.sales_order_id
+     AND tgt._tf_is_current
+    WHERE NOT (tgt._tf_row_hash <=> src._tf_row_hash)
 ) AS src
-ON tgt.sales_order_id = src.sales_order_id
-   AND tgt._tf_valid_to IS NULL  -- Only match against 'active' records in silver
+ON tgt.sales_order_id = src._merge_sales_order_id
+   AND tgt._tf_is_current  -- Only match against 'active' records in silver
+
+WHEN MATCHED AND NOT (tgt._tf_row_hash <=> src._tf_row_hash) AND tgt._tf_is_current THEN
+  -- 1) Close the old record by setting _tf_valid_to
+  UPDATE SET 
+    tgt._tf_valid_to    = load_date,
+    tgt._tf_update_date = load_date
 
 WHEN NOT MATCHED THEN
-  -- 3) Insert NEW records (new sales_order_id or new version of existing record)
+  -- 2) Insert NEW records (new sales_order_id or new version of existing record)
   INSERT (
+    _tf_id,
     sales_order_id,
     revision_number,
     order_date,
@@ -470,12 +581,14 @@ WHEN NOT MATCHED THEN
     comment,
     rowguid,
     modified_date,
+    _tf_row_hash,
     _tf_valid_from,
     _tf_valid_to,
     _tf_create_date,
     _tf_update_date
   )
   VALUES (
+    xxhash64(src.sales_order_id, src.sales_order_id IS NULL, load_date, load_date IS NULL),  -- _tf_id
     src.sales_order_id,
     src.revision_number,
     src.order_date,
@@ -498,8 +611,16 @@ WHEN NOT MATCHED THEN
     src.comment,
     src.rowguid,
     src.modified_date,
+    src._tf_row_hash,
     load_date,        -- _tf_valid_from
     NULL,             -- _tf_valid_to
     load_date,        -- _tf_create_date
     load_date         -- _tf_update_date
   )
+
+WHEN NOT MATCHED BY SOURCE AND tgt._tf_is_current THEN
+  -- 3) Close the deleted record by setting _tf_valid_to
+  UPDATE SET 
+    tgt._tf_valid_to    = load_date,
+    tgt._tf_update_date = load_date
+;
@@ -0,0 +1,122 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Dimension key maps
+# MAGIC
+# MAGIC Helper functions shared by the gold notebooks. Include them with `%run ./30_Gold_Key_Map_Lib`, after
+# MAGIC `%run ./20_SCD2_Lib`.
+# MAGIC
+# MAGIC A fact only needs the surrogate key of each dimension member it references. The surrogate key of a dimension is
+# MAGIC the hash of its natural key (`surrogate_key_expr` in `20_SCD2_Lib`), so `dim_key_expr` computes it from the
+# MAGIC natural key held by the fact rows, without reading the dimension: no join, and the fact can be loaded at the same
+# MAGIC time as the dimensions. A NULL natural key gets the unknown member `-9`, inserted in every dimension by `01_Init`.
+# MAGIC A natural key missing from the dimension (an order referencing a customer or an address absent from silver) would
+# MAGIC get a hash without member: the facts call `with_dim_key(..., known_only=True)`, which also resolves those keys to
+# MAGIC `-9` with a key-only semi-join on the natural keys of the dimension, so no fact key dangles.
+# MAGIC
+# MAGIC The key map of a dimension is its `(natural key, surrogate key)` pairs: two integer columns, a few bytes per
+# MAGIC member, read straight from the dimension. `lookup_keys` broadcasts it and probes it from the fact rows where they
+# MAGIC are, for dimensions whose key cannot be derived from the fact; keys missing from the dimension resolve to `-9`.
+
+# COMMAND ----------
+
+from pyspark.sql.functions import broadcast, coalesce, col, expr, lit, when
+
+UNKNOWN_MEMBER_ID = -9
+
+# Natural and surrogate key of the dimensions referenced by the facts
+DIM_KEY_MAPS = {
+    "gold.dim_customer": {"natural_key": "cust_customer_id", "surrogate_key": "_tf_dim_customer_id"},
+    "gold.dim_geography": {"natural_key": "geo_address_id", "surrogate_key": "_tf_dim_geography_id"},
+}
+
+# COMMAND ----------
+
+def dim_key_expr(key_column):
+    """
+    Build the SQL expression of the surrogate key of a dimension member from its natural key.
+
+    Args:
+        key_column (str): Column or SQL expression holding the natural key, of the type of the dimension column.
+
+    Returns:
+        str: BIGINT expression, the unknown member for a NULL key.
+    """
+    return f"CASE WHEN {key_column} IS NULL THEN {UNKNOWN_MEMBER_ID} ELSE {surrogate_key_expr([key_column])} END"
+
+
+def with_dim_key(df, key_column, dim_table, known_only=False):
+    """
+    Add the surrogate key of a dimension to the rows of a fact, computed from the natural key.
+
+    Args:
+        df (DataFrame): Fact rows.
+        key_column (str): Column of df holding the natural key of the dimension.
+        dim_table (str): Dimension table, in DIM_KEY_MAPS.
+        known_only (bool): Resolve the natural keys missing from the dimension to the unknown member. Only the natural
+            key column of the dimension is read, and broadcast.
+
+    Returns:
+        DataFrame: df with the surrogate key column of the dimension.
+    """
+    spec = DIM_KEY_MAPS[dim_table]
+    df = df.withColumn(spec["surrogate_key"], expr(dim_key_expr(key_column)))
+    if not known_only:
+        return df
+    members = (
+        key_map(dim_table, spec)
+        .select(col(spec["natural_key"]).alias("_dim_member_key"))
+        .distinct()
+        .withColumn("_dim_member", lit(True))
+    )
+    return (
+        df.join(broadcast(members), col(key_column) == col("_dim_member_key"), "left_outer")
+        .withColumn(
+            spec["surrogate_key"],
+            when(col("_dim_member").isNull(), lit(UNKNOWN_MEMBER_ID)).otherwise(col(spec["surrogate_key"]))
+        )
+        .drop("_dim_member_key", "_dim_member")
+    )
+
+
+def key_map(dim_table, spec=None):
+    """
+    Get the key map of a dimension, without its unknown member.
+
+    Args:
+        dim_table (str): Dimension table.
+        spec (dict): natural_key and surrogate_key columns, default DIM_KEY_MAPS[dim_table].
+
+    Returns:
+        DataFrame: natural_key and surrogate_key columns, one row per member.
+    """
+    spec = spec or DIM_KEY_MAPS[dim_table]
+    return (
+        spark.table(dim_table)
+        .filter(col(spec["surrogate_key"]) != UNKNOWN_MEMBER_ID)
+        .select(spec["natural_key"], spec["surrogate_key"])
+    )
+
+
+def lookup_keys(df, key_column, dim_table, spec=None, broadcast_map=True):
+    """
+    Add the surrogate key of a dimension to the rows of a fact, the unknown member when the key is not found.
+
+    Args:
+        df (DataFrame): Fact rows.
+        key_column (str): Column of df holding the natural key of the dimension.
+        dim_table (str): Dimension table.
+        spec (dict): natural_key and surrogate_key columns, default DIM_KEY_MAPS[dim_table].
+        broadcast_map (bool): Broadcast the key map instead of letting the optimizer choose the join.
+
+    Returns:
+        DataFrame: df with the surrogate key column of the dimension.
+    """
+    spec = spec or DIM_KEY_MAPS[dim_table]
+    dim_map = key_map(dim_table, spec).withColumnRenamed(spec["natural_key"], "_key_map_key")
+    if broadcast_map:
+        dim_map = broadcast(dim_map)
+    return (
+        df.join(dim_map, col(key_column) == col("_key_map_key"), "left_outer")
+        .drop("_key_map_key")
+        .withColumn(spec["surrogate_key"], coalesce(col(spec["surrogate_key"]), lit(UNKNOWN_MEMBER_ID)))
+    )
@@ -1,6 +1,9 @@
 -- Databricks notebook source
 -- MAGIC %md
 -- MAGIC # Loading the Dim tables in the Gold layer 
+-- MAGIC
+-- MAGIC The surrogate key of a member is the hash of its natural key (`dim_key_expr` in `30_Gold_Key_Map_Lib`): the facts
+-- MAGIC compute it from the natural keys they hold, without joining the dims.
 -- MAGIC ## Connecting to the Gold layer (Target)
 
 -- COMMAND ----------
@@ -16,27 +19,33 @@ VALUES load_date;
 MERGE INTO gold.dim_geography AS tgt
 USING (
     SELECT
-        CAST(address_id AS INT) AS geo_address_id,
-        COALESCE(TRY_CAST(address_line1 AS STRING), 'N/A') AS geo_address_line_1,
-        COALESCE(TRY_CAST(address_line2 AS STRING), 'N/A') AS geo_address_line_2,
-        COALESCE(TRY_CAST(city AS STRING), 'N/A') AS geo_city,
-        COALESCE(TRY_CAST(state_province AS STRING), 'N/A') AS geo_state_province,
-        COALESCE(TRY_CAST(country_region AS STRING), 'N/A') AS geo_country_region,
-        COALESCE(TRY_CAST(postal_code AS STRING), 'N/A') AS geo_postal_code
-    FROM silver.address
-    WHERE _tf_valid_to IS NULL
+        src.*,
+        -- Same null-safe fingerprint as with_row_hash in 33_ETL_Gold_Dim_PySpark
+        xxhash64(
+            geo_address_line_1, geo_address_line_1 IS NULL,
+            geo_address_line_2, geo_address_line_2 IS NULL,
+            geo_city, geo_city IS NULL,
+            geo_state_province, geo_state_province IS NULL,
+            geo_country_region, geo_country_region IS NULL,
+            geo_postal_code, geo_postal_code IS NULL
+        ) AS _tf_row_hash
+    FROM (
+        SELECT
+            CAST(address_id AS INT) AS geo_address_id,
+            COALESCE(TRY_CAST(address_line1 AS STRING), 'N/A') AS geo_address_line_1,
+            COALESCE(TRY_CAST(address_line2 AS STRING), 'N/A') AS geo_address_line_2,
+            COALESCE(TRY_CAST(city AS STRING), 'N/A') AS geo_city,
+            COALESCE(TRY_CAST(state_province AS STRING), 'N/A') AS geo_state_province,
+            COALESCE(TRY_CAST(country_region AS STRING), 'N/A') AS geo_country_region,
+            COALESCE(TRY_CAST(postal_code AS STRING), 'N/A') AS geo_postal_code
+        FROM silver.address
+        WHERE _tf_is_current
+    ) AS src
 ) AS src
 ON tgt.geo_address_id = src.geo_address_id
 
 -- 1) Update existing records when a difference is detected
-WHEN MATCHED AND (
-    tgt.geo_address_line_1 != src.geo_address_line_1 OR 
-    tgt.geo_address_line_2 != src.geo_address_line_2 OR 
-    tgt.geo_city != src.geo_city OR
-    tgt.geo_state_province != src.geo_state_province OR
-    tgt.geo_country_region != src.geo_country_region OR
-    tgt.geo_postal_code != src.geo_postal_code
-) THEN 
+WHEN MATCHED AND NOT (tgt._tf_row_hash <=> src._tf_row_hash) THEN 
   
   UPDATE SET 
     tgt.geo_address_line_1 = src.geo_address_line_1,
@@ -45,12 +54,14 @@ WHEN MATCHED AND (
     tgt.geo_state_province = src.geo_state_province,
     tgt.geo_country_region = src.geo_country_region,
     tgt.geo_postal_code = src.geo_postal_code,
+    tgt._tf_row_hash = src._tf_row_hash,
     tgt._tf_update_date = load_date
 
 -- 2) Insert new records
 WHEN NOT MATCHED THEN
   
   INSERT (
+    _tf_dim_geography_id,
     geo_address_id,
     geo_address_line_1,
     geo_address_line_2,
@@ -58,10 +69,12 @@ WHEN NOT MATCHED THEN
     geo_state_province,
     geo_country_region,
     geo_postal_code,
+    _tf_row_hash,
     _tf_create_date,
     _tf_update_date
   )
   VALUES (
+    xxhash64(src.geo_address_id, src.geo_address_id IS NULL),  -- _tf_dim_geography_id
     src.geo_address_id,
     src.geo_address_line_1,
     src.geo_address_line_2,
@@ -69,6 +82,7 @@ WHEN NOT MATCHED THEN
     src.geo_state_province,
     src.geo_country_region,
     src.geo_postal_code,
+    src._tf_row_hash,
     load_date,        -- _tf_create_date
     load_date         -- _tf_update_date
   )
@@ -78,33 +92,39 @@ WHEN NOT MATCHED THEN
 MERGE INTO gold.dim_customer AS tgt
 USING (
     SELECT
-        CAST(customer_id AS INT) AS cust_customer_id,
-        COALESCE(TRY_CAST(title AS STRING), 'N/A') AS cust_title,
-        COALESCE(TRY_CAST(first_name AS STRING), 'N/A') AS cust_first_name,
-        COALESCE(TRY_CAST(middle_name AS STRING), 'N/A') AS cust_middle_name,
-        COALESCE(TRY_CAST(last_name AS STRING), 'N/A') AS cust_last_name,
-        COALESCE(TRY_CAST(suffix AS STRING), 'N/A') AS cust_suffix,
-        COALESCE(TRY_CAST(company_name AS STRING), 'N/A') AS cust_company_name,
-        COALESCE(TRY_CAST(sales_person AS STRING), 'N/A') AS cust_sales_person,
-        COALESCE(TRY_CAST(email_address AS STRING), 'N/A') AS cust_email_address,
-        COALESCE(TRY_CAST(phone AS STRING), 'N/A') AS cust_phone
-    FROM silver.customer
-    WHERE _tf_valid_to IS NULL
+        src.*,
+        -- Same null-safe fingerprint as with_row_hash in 33_ETL_Gold_Dim_PySpark
+        xxhash64(
+            cust_title, cust_title IS NULL,
+            cust_first_name, cust_first_name IS NULL,
+            cust_middle_name, cust_middle_name IS NULL,
+            cust_last_name, cust_last_name IS NULL,
+            cust_suffix, cust_suffix IS NULL,
+            cust_company_name, cust_company_name IS NULL,
+            cust_sales_person, cust_sales_person IS NULL,
+            cust_email_address, cust_email_address IS NULL,
+            cust_phone, cust_phone IS NULL
+        ) AS _tf_row_hash
+    FROM (
+        SELECT
+            CAST(customer_id AS INT) AS cust_customer_id,
+            COALESCE(TRY_CAST(title AS STRING), 'N/A') AS cust_title,
+            COALESCE(TRY_CAST(first_name AS STRING), 'N/A') AS cust_first_name,
+            COALESCE(TRY_CAST(middle_name AS STRING), 'N/A') AS cust_middle_name,
+            COALESCE(TRY_CAST(last_name AS STRING), 'N/A') AS cust_last_name,
+            COALESCE(TRY_CAST(suffix AS STRING), 'N/A') AS cust_suffix,
+            COALESCE(TRY_CAST(company_name AS STRING), 'N/A') AS cust_company_name,
+            COALESCE(TRY_CAST(sales_person AS STRING), 'N/A') AS cust_sales_person,
+            COALESCE(TRY_CAST(email_address AS STRING), 'N/A') AS cust_email_address,
+            COALESCE(TRY_CAST(phone AS STRING), 'N/A') AS cust_phone
+        FROM silver.customer
+        WHERE _tf_is_current
+    ) AS src
 ) AS src
 ON tgt.cust_customer_id = src.cust_customer_id
 
 -- 1) Update existing records when a difference is detected
-WHEN MATCHED AND (
-    tgt.cust_title != src.cust_title OR
-    tgt.cust_first_name != src.cust_first_name OR
-    tgt.cust_middle_name != src.cust_middle_name OR
-    tgt.cust_last_name != src.cust_last_name OR
-    tgt.cust_suffix != src.cust_suffix OR
-    tgt.cust_company_name != src.cust_company_name OR
-    tgt.cust_sales_person != src.cust_sales_person OR
-    tgt.cust_email_address != src.cust_email_address OR
-    tgt.cust_phone != src.cust_phone
-) THEN 
+WHEN MATCHED AND NOT (tgt._tf_row_hash <=> src._tf_row_hash) THEN 
   
   UPDATE SET 
     tgt.cust_title = src.cust_title,
@@ -116,12 +136,14 @@ WHEN MATCHED AND (
     tgt.cust_sales_person = src.cust_sales_person,
     tgt.cust_email_address = src.cust_email_address,
     tgt.cust_phone = src.cust_phone,
+    tgt._tf_row_hash = src._tf_row_hash,
     tgt._tf_update_date = load_date
 
 -- 2) Insert new records
 WHEN NOT MATCHED THEN
   
   INSERT (
+    _tf_dim_customer_id,
     cust_customer_id,
     cust_title,
     cust_first_name,
@@ -132,10 +154,12 @@ WHEN NOT MATCHED THEN
     cust_sales_person,
     cust_email_address,
     cust_phone,
+    _tf_row_hash,
     _tf_create_date,
     _tf_update_date
   )
   VALUES (
+    xxhash64(src.cust_customer_id, src.cust_customer_id IS NULL),  -- _tf_dim_customer_id
     src.cust_customer_id,
     src.cust_title,
     src.cust_first_name,
@@ -146,6 +170,7 @@ WHEN NOT MATCHED THEN
     src.cust_sales_person,
     src.cust_email_address,
     src.cust_phone,
+    src._tf_row_hash,
     load_date,        -- _tf_create_date
     load_date         -- _tf_update_date
   )
@@ -13,15 +13,21 @@ VALUES load_date;
 
 -- COMMAND ----------
 
+-- Surrogate keys of the dims: hashes of the natural keys of the order (see dim_key_expr in 30_Gold_Key_Map_Lib),
+-- -9 when the key is NULL or missing from the dim (only the natural keys of the dims are read)
 CREATE OR REPLACE TEMP VIEW _tmp_fact_sales AS
 SELECT
+    xxhash64(soh.sales_order_id, soh.sales_order_id IS NULL,
+             sod.sales_order_detail_id, sod.sales_order_detail_id IS NULL) AS _tf_fact_sales_id,
     CAST(soh.sales_order_id AS INT) AS sales_order_id,
     CAST(sod.sales_order_detail_id AS INT) AS sales_order_detail_id,
 
     --
     10000 * YEAR(soh.order_date) + 100 * MONTH(soh.order_date) + DAY(soh.order_date) AS _tf_dim_calendar_id,
-    COALESCE(cust._tf_dim_customer_id, -9) AS _tf_dim_customer_id,
-    COALESCE(geo._tf_dim_geography_id, -9) AS _tf_dim_geography_id,
+    CASE WHEN dc.cust_customer_id IS NULL THEN -9
+         ELSE xxhash64(soh.customer_id, soh.customer_id IS NULL) END AS _tf_dim_customer_id,
+    CASE WHEN dg.geo_address_id IS NULL THEN -9
+         ELSE xxhash64(soh.bill_to_address_id, soh.bill_to_address_id IS NULL) END AS _tf_dim_geography_id,
 
     --
     COALESCE(TRY_CAST(sod.order_qty AS SMALLINT), 0) AS sales_order_qty,
@@ -31,16 +37,12 @@ SELECT
 
   FROM silver.sales_order_detail sod
     LEFT OUTER JOIN silver.sales_order_header soh 
-      ON sod.sales_order_id = soh.sales_order_id AND soh._tf_valid_to IS NULL
-      LEFT OUTER JOIN silver.customer c 
-        ON soh.customer_id = c.customer_id AND c._tf_valid_to IS NULL
-        LEFT OUTER JOIN gold.dim_customer cust
-          ON c.customer_id = cust.cust_customer_id
-      LEFT OUTER JOIN silver.address a 
-        ON soh.bill_to_address_id = a.address_id AND a._tf_valid_to IS NULL
-        LEFT OUTER JOIN gold.dim_geography geo 
-          ON a.address_id = geo.geo_address_id
-  WHERE sod._tf_valid_to IS NULL;
+      ON sod.sales_order_id = soh.sales_order_id AND soh._tf_is_current
+    LEFT OUTER JOIN (SELECT DISTINCT cust_customer_id FROM gold.dim_customer WHERE _tf_dim_customer_id != -9) dc
+      ON dc.cust_customer_id = soh.customer_id
+    LEFT OUTER JOIN (SELECT DISTINCT geo_address_id FROM gold.dim_geography WHERE _tf_dim_geography_id != -9) dg
+      ON dg.geo_address_id = soh.bill_to_address_id
+  WHERE sod._tf_is_current;
 
 SELECT * FROM _tmp_fact_sales;
 
@@ -76,6 +78,7 @@ WHEN MATCHED AND (
 WHEN NOT MATCHED THEN
   
   INSERT (
+    tgt._tf_fact_sales_id,
     tgt.sales_order_id,
     tgt.sales_order_detail_id,
     tgt._tf_dim_calendar_id,
@@ -89,6 +92,7 @@ WHEN NOT MATCHED THEN
     tgt._tf_update_date
   )
   VALUES (
+    src._tf_fact_sales_id,
     src.sales_order_id,
     src.sales_order_detail_id,
     src._tf_dim_calendar_id,
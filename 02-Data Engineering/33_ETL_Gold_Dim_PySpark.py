@@ -19,10 +19,17 @@ load_date = current_timestamp()
 
 # COMMAND ----------
 
-# Load dim_geography
-src_geo = (
-    spark.table("silver.address")
-    .filter(col("_tf_valid_to").isNull())
+# MAGIC %run ./20_SCD2_Lib
+
+# COMMAND ----------
+
+# MAGIC %run ./30_Gold_Key_Map_Lib
+
+# COMMAND ----------
+
+# Load dim_geography, keyed on the hash of the natural key (dim_key_expr in 30_Gold_Key_Map_Lib)
+src_geo = with_row_hash(
+    spark.table("silver.address_current")
     .selectExpr(
         "CAST(address_id AS INT) AS geo_address_id",
         "COALESCE(TRY_CAST(address_line1 AS STRING), 'N/A') AS geo_address_line_1",
@@ -31,8 +38,10 @@ src_geo = (
         "COALESCE(TRY_CAST(state_province AS STRING), 'N/A') AS geo_state_province",
         "COALESCE(TRY_CAST(country_region AS STRING), 'N/A') AS geo_country_region",
         "COALESCE(TRY_CAST(postal_code AS STRING), 'N/A') AS geo_postal_code"
-    )
+    ),
+    ["geo_address_line_1", "geo_address_line_2", "geo_city", "geo_state_province", "geo_country_region", "geo_postal_code"]
 )
+src_geo = with_dim_key(src_geo, "geo_address_id", "gold.dim_geography")
 src_geo.createOrReplaceTempView("src_geo")
 
 # COMMAND ----------
@@ -41,14 +50,7 @@ spark.sql("""
 MERGE INTO gold.dim_geography AS tgt
 USING src_geo AS src
 ON tgt.geo_address_id = src.geo_address_id
-WHEN MATCHED AND (
-    tgt.geo_address_line_1 != src.geo_address_line_1 OR
-    tgt.geo_address_line_2 != src.geo_address_line_2 OR
-    tgt.geo_city != src.geo_city OR
-    tgt.geo_state_province != src.geo_state_province OR
-    tgt.geo_country_region != src.geo_country_region OR
-    tgt.geo_postal_code != src.geo_postal_code
-) THEN
+WHEN MATCHED AND NOT (tgt._tf_row_hash <=> src._tf_row_hash) THEN
   UPDATE SET
     tgt.geo_address_line_1 = src.geo_address_line_1,
     tgt.geo_address_line_2 = src.geo_address_line_2,
@@ -56,9 +58,11 @@ WHEN MATCHED AND (
     tgt.geo_state_province = src.geo_state_province,
     tgt.geo_country_region = src.geo_country_region,
     tgt.geo_postal_code = src.geo_postal_code,
+    tgt._tf_row_hash = src._tf_row_hash,
     tgt._tf_update_date = current_timestamp()
 WHEN NOT MATCHED THEN
   INSERT (
+    _tf_dim_geography_id,
     geo_address_id,
     geo_address_line_1,
     geo_address_line_2,
@@ -66,10 +70,12 @@ WHEN NOT MATCHED THEN
     geo_state_province,
     geo_country_region,
     geo_postal_code,
+    _tf_row_hash,
     _tf_create_date,
     _tf_update_date
   )
   VALUES (
+    src._tf_dim_geography_id,
     src.geo_address_id,
     src.geo_address_line_1,
     src.geo_address_line_2,
@@ -77,17 +83,18 @@ WHEN NOT MATCHED THEN
     src.geo_state_province,
     src.geo_country_region,
     src.geo_postal_code,
+    src._tf_row_hash,
     current_timestamp(),
     current_timestamp()
   )
 """)
+check_surrogate_keys("gold.dim_geography", "_tf_dim_geography_id")
 
 # COMMAND ----------
 
-# Load dim_customer
-src_cust = (
-    spark.table("silver.customer")
-    .filter(col("_tf_valid_to").isNull())
+# Load dim_customer, keyed on the hash of the natural key
+src_cust = with_row_hash(
+    spark.table("silver.customer_current")
     .selectExpr(
         "CAST(customer_id AS INT) AS cust_customer_id",
         "COALESCE(TRY_CAST(title AS STRING), 'N/A') AS cust_title",
@@ -99,8 +106,10 @@ src_cust = (
         "COALESCE(TRY_CAST(sales_person AS STRING), 'N/A') AS cust_sales_person",
         "COALESCE(TRY_CAST(email_address AS STRING), 'N/A') AS cust_email_address",
         "COALESCE(TRY_CAST(phone AS STRING), 'N/A') AS cust_phone"
-    )
+    ),
+    ["cust_title", "cust_first_name", "cust_middle_name", "cust_last_name", "cust_suffix", "cust_company_name", "cust_sales_person", "cust_email_address", "cust_phone"]
 )
+src_cust = with_dim_key(src_cust, "cust_customer_id", "gold.dim_customer")
 src_cust.createOrReplaceTempView("src_cust")
 
 # COMMAND ----------
@@ -109,17 +118,7 @@ spark.sql("""
 MERGE INTO gold.dim_customer AS tgt
 USING src_cust AS src
 ON tgt.cust_customer_id = src.cust_customer_id
-WHEN MATCHED AND (
-    tgt.cust_title != src.cust_title OR
-    tgt.cust_first_name != src.cust_first_name OR
-    tgt.cust_middle_name != src.cust_middle_name OR
-    tgt.cust_last_name != src.cust_last_name OR
-    tgt.cust_suffix != src.cust_suffix OR
-    tgt.cust_company_name != src.cust_company_name OR
-    tgt.cust_sales_person != src.cust_sales_person OR
-    tgt.cust_email_address != src.cust_email_address OR
-    tgt.cust_phone != src.cust_phone
-) THEN
+WHEN MATCHED AND NOT (tgt._tf_row_hash <=> src._tf_row_hash) THEN
   UPDATE SET
     tgt.cust_title = src.cust_title,
     tgt.cust_first_name = src.cust_first_name,
@@ -130,9 +129,11 @@ WHEN MATCHED AND (
     tgt.cust_sales_person = src.cust_sales_person,
     tgt.cust_email_address = src.cust_email_address,
     tgt.cust_phone = src.cust_phone,
+    tgt._tf_row_hash = src._tf_row_hash,
     tgt._tf_update_date = current_timestamp()
 WHEN NOT MATCHED THEN
   INSERT (
+    _tf_dim_customer_id,
     cust_customer_id,
     cust_title,
     cust_first_name,
@@ -143,10 +144,12 @@ WHEN NOT MATCHED THEN
     cust_sales_person,
     cust_email_address,
     cust_phone,
+    _tf_row_hash,
     _tf_create_date,
     _tf_update_date
   )
   VALUES (
+    src._tf_dim_customer_id,
     src.cust_customer_id,
     src.cust_title,
     src.cust_first_name,
@@ -157,7 +160,9 @@ WHEN NOT MATCHED THEN
     src.cust_sales_person,
     src.cust_email_address,
     src.cust_phone,
+    src._tf_row_hash,
     current_timestamp(),
     current_timestamp()
   )
 """)
+check_surrogate_keys("gold.dim_customer", "_tf_dim_customer_id")
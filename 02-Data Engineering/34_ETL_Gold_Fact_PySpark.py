@@ -1,10 +1,34 @@
 # Databricks notebook source
 # MAGIC %md
 # MAGIC # Loading the Fact tables in the Gold layer
+# MAGIC
+# MAGIC With `factIncremental`, only the orders touched since the last run are recomputed and merged: orders whose header
+# MAGIC or lines changed. They are read from the Change Data Feed of the silver snapshot tables, since the versions stored
+# MAGIC in `silver.cdf_checkpoint` (consumer `gold.fact_sales`). The first run, or a run whose changes can no longer be
+# MAGIC read, processes every order. The orders with a line on the unknown customer or geography (`-9`) are recomputed
+# MAGIC too, so that they get their key once the member reaches the dimension.
+# MAGIC
+# MAGIC The dimension keys are hashes of the natural keys of the order (`dim_key_expr` in `30_Gold_Key_Map_Lib`): a change
+# MAGIC of a customer or an address does not change them. Only the natural keys of the dimensions are read, so that a
+# MAGIC customer or an address missing from them gets the unknown member `-9` instead of a dangling key.
+# MAGIC
+# MAGIC `gold.fact_sales` is clustered by month (`_tf_calendar_month`), then customer and geography. When the orders to
+# MAGIC recompute fall in at most `factReplaceMaxMonths` months, those months are rebuilt from silver and overwritten with
+# MAGIC `replaceWhere`: only their files are rewritten, without the row-level join of a MERGE against the whole table.
+# MAGIC Otherwise the rows are merged. Either way the lines deleted in silver disappear from the recomputed orders: the
+# MAGIC month rewrite drops them, the MERGE deletes them through key-only tombstones restricted to those orders.
 
 # COMMAND ----------
 
-from pyspark.sql.functions import current_timestamp, year, month, dayofmonth, coalesce, expr, col
+# MAGIC %run ./20_SCD2_Lib
+
+# COMMAND ----------
+
+# MAGIC %run ./30_Gold_Key_Map_Lib
+
+# COMMAND ----------
+
+from pyspark.sql.functions import current_timestamp, year, month, dayofmonth, coalesce, expr, col, broadcast
 
 # COMMAND ----------
 
@@ -16,68 +40,272 @@ spark.sql("USE SCHEMA gold")
 
 # Define load_date
 load_date = current_timestamp()
+factLoadStart = spark.sql("SELECT current_timestamp()").first()[0]
+
+factIncremental = True    # True = only the orders touched by the silver changes since the last run, False = every order
+factReplaceMaxMonths = 3  # Overwrite the changed months instead of merging when at most that many changed, 0 = always MERGE
 
 # COMMAND ----------
 
-# Create _tmp_fact_sales temp view
-tmp_fact_sales = (
-    spark.table("silver.sales_order_detail").alias("sod")
-    .join(
-        spark.table("silver.sales_order_header").alias("soh"),
-        (col("sod.sales_order_id") == col("soh.sales_order_id")) & col("soh._tf_valid_to").isNull(),
-        how="left_outer"
-    )
-    .join(
-        spark.table("silver.customer").alias("c"),
-        (col("soh.customer_id") == col("c.customer_id")) & col("c._tf_valid_to").isNull(),
-        how="left_outer"
+# Silver snapshot tables read by the fact, with the column leading to the orders to recompute
+FACT_CONSUMER = "gold.fact_sales"
+FACT_SOURCES = {
+    "silver.sales_order_detail_current": "sales_order_id",
+    "silver.sales_order_header_current": "sales_order_id",
+}
+
+factVersions = {source_table: latest_version(source_table) for source_table in FACT_SOURCES}
+factCheckpoints = [
+    {"consumer": FACT_CONSUMER, "source_table": source_table, "last_version": version}
+    for source_table, version in factVersions.items()
+]
+
+
+def changed_keys(source_table, column, last_version):
+    """
+    Get the keys changed in a silver snapshot table since a version, deleted keys included.
+
+    Args:
+        source_table (str): Silver snapshot table, with Change Data Feed.
+        column (str): Key column.
+        last_version (int): Last version already processed.
+
+    Returns:
+        DataFrame: Distinct key values.
+    """
+    return (
+        spark.read.format("delta").option("readChangeFeed", "true")
+        .option("startingVersion", last_version + 1).option("endingVersion", factVersions[source_table])
+        .table(source_table)
+        .select(column)
+        .distinct()
     )
-    .join(
-        spark.table("gold.dim_customer").alias("cust"),
-        col("c.customer_id") == col("cust.cust_customer_id"),
-        how="left_outer"
+
+
+def affected_orders():
+    """
+    Get the orders to recompute from the changes of the silver snapshot tables since the fact checkpoints.
+
+    Returns:
+        DataFrame: Distinct sales_order_id, None when every order has to be processed.
+    """
+    last_versions = {source_table: get_cdf_checkpoint(FACT_CONSUMER, source_table) for source_table in FACT_SOURCES}
+    if any(version is None for version in last_versions.values()):
+        print(f"{FACT_CONSUMER}: no checkpoint, processing every order")
+        return None
+
+    changed = {
+        source_table: changed_keys(source_table, column, last_versions[source_table])
+        for source_table, column in FACT_SOURCES.items()
+        if last_versions[source_table] < factVersions[source_table]
+    }
+    # Lines whose customer or address was missing from the dims: recomputed until the member arrives
+    orders = (
+        spark.table("gold.fact_sales")
+        .filter("_tf_dim_customer_id = -9 OR _tf_dim_geography_id = -9")
+        .select("sales_order_id")
     )
-    .join(
-        spark.table("silver.address").alias("a"),
-        (col("soh.bill_to_address_id") == col("a.address_id")) & col("a._tf_valid_to").isNull(),
-        how="left_outer"
+    for keys in changed.values():
+        orders = orders.unionByName(keys)
+    return orders.distinct()
+
+
+orders = None
+if factIncremental:
+    try:
+        orders = affected_orders()
+        if orders is not None:
+            orders = orders.localCheckpoint()
+            print(f"{FACT_CONSUMER}: {orders.count()} orders to recompute")
+    except Exception as e:
+        if not cdf_unreadable(e):
+            raise
+        print(f"{FACT_CONSUMER}: silver changes unreadable ({e}), processing every order")
+        orders = None
+
+# COMMAND ----------
+
+def month_predicate(months):
+    """
+    Build the predicate selecting the fact rows of some months.
+
+    Args:
+        months (list): Months as yyyymm integers.
+
+    Returns:
+        str: SQL predicate on _tf_dim_calendar_id.
+    """
+    return " OR ".join(f"_tf_dim_calendar_id BETWEEN {month * 100} AND {month * 100 + 99}" for month in months)
+
+
+def order_date_predicate(months):
+    """
+    Build the predicate selecting the orders of some months on the silver header, before any join.
+
+    Args:
+        months (list): Months as yyyymm integers.
+
+    Returns:
+        str: SQL predicate on order_date.
+    """
+    return " OR ".join(
+        f"(order_date >= make_date({month // 100}, {month % 100}, 1)"
+        f" AND order_date < add_months(make_date({month // 100}, {month % 100}, 1), 1))"
+        for month in months
     )
-    .join(
-        spark.table("gold.dim_geography").alias("geo"),
-        col("a.address_id") == col("geo.geo_address_id"),
-        how="left_outer"
+
+
+def fact_sales_rows(orders=None, months=None):
+    """
+    Build the fact_sales rows from the current silver versions (silver.<table>_current, see 01_Init).
+
+    Args:
+        orders (DataFrame): sales_order_id of the orders to build, default every order.
+        months (list): Only build the orders of these months (yyyymm), default every month.
+
+    Returns:
+        DataFrame: One row per order line, with the columns of gold.fact_sales.
+    """
+    sales_order_detail = spark.table("silver.sales_order_detail_current")
+    sales_order_header = spark.table("silver.sales_order_header_current")
+    if orders is not None:
+        sales_order_detail = sales_order_detail.join(broadcast(orders), "sales_order_id", "left_semi")
+    if months:
+        # Filter the headers on their order date first, and keep only the lines of those orders: the silver scans
+        # skip the files of the other months instead of building every order and filtering on the derived date key
+        sales_order_header = sales_order_header.filter(order_date_predicate(months))
+        sales_order_detail = sales_order_detail.join(
+            sales_order_header.select("sales_order_id"), "sales_order_id", "left_semi"
+        )
+
+    fact_lines = (
+        sales_order_detail.alias("sod")
+        .join(
+            sales_order_header.alias("soh"),
+            col("sod.sales_order_id") == col("soh.sales_order_id"),
+            how="left_outer"
+        )
+        .select(
+            "soh.sales_order_id", "sod.sales_order_detail_id", "soh.order_date", "soh.customer_id", "soh.bill_to_address_id",
+            "sod.order_qty", "sod.unit_price", "sod.unit_price_discount", "sod.line_total"
+        )
     )
-    .filter(col("sod._tf_valid_to").isNull())
-    .select(
-        col("soh.sales_order_id").cast("int").alias("sales_order_id"),
-        col("sod.sales_order_detail_id").cast("int").alias("sales_order_detail_id"),
-        (10000 * year("soh.order_date") + 100 * month("soh.order_date") + dayofmonth("soh.order_date")).alias("_tf_dim_calendar_id"),
-        coalesce(col("cust._tf_dim_customer_id"), expr("-9")).alias("_tf_dim_customer_id"),
-        coalesce(col("geo._tf_dim_geography_id"), expr("-9")).alias("_tf_dim_geography_id"),
-        coalesce(col("sod.order_qty").cast("smallint"), expr("0")).alias("sales_order_qty"),
-        coalesce(col("sod.unit_price").cast("decimal(19,4)"), expr("0")).alias("sales_unit_price"),
-        coalesce(col("sod.unit_price_discount").cast("decimal(19,4)"), expr("0")).alias("sales_unit_price_discount"),
-        coalesce(col("sod.line_total").cast("decimal(38,6)"), expr("0")).alias("sales_line_total")
+
+    # Surrogate keys of the dims: hashes of the natural keys, -9 for the keys the dims do not have (30_Gold_Key_Map_Lib)
+    fact_lines = with_dim_key(fact_lines, "customer_id", "gold.dim_customer", known_only=True)
+    fact_lines = with_dim_key(fact_lines, "bill_to_address_id", "gold.dim_geography", known_only=True)
+
+    rows = fact_lines.select(
+        expr(surrogate_key_expr(["sales_order_id", "sales_order_detail_id"])).alias("_tf_fact_sales_id"),
+        col("sales_order_id").cast("int").alias("sales_order_id"),
+        col("sales_order_detail_id").cast("int").alias("sales_order_detail_id"),
+        (10000 * year("order_date") + 100 * month("order_date") + dayofmonth("order_date")).alias("_tf_dim_calendar_id"),
+        col("_tf_dim_customer_id"),
+        col("_tf_dim_geography_id"),
+        coalesce(col("order_qty").cast("smallint"), expr("0")).alias("sales_order_qty"),
+        coalesce(col("unit_price").cast("decimal(19,4)"), expr("0")).alias("sales_unit_price"),
+        coalesce(col("unit_price_discount").cast("decimal(19,4)"), expr("0")).alias("sales_unit_price_discount"),
+        coalesce(col("line_total").cast("decimal(38,6)"), expr("0")).alias("sales_line_total")
     )
-)
+    return rows.filter(month_predicate(months)) if months else rows
+
 
+tmp_fact_sales = fact_sales_rows(orders)
 tmp_fact_sales.createOrReplaceTempView("_tmp_fact_sales")
 
+
+def fact_tombstones(new_rows, orders=None):
+    """
+    Find the stored fact lines of the recomputed orders that no longer exist in silver.
+
+    Only the key columns are read on both sides, and only for the recomputed orders: the MERGE deletes them, like the
+    month rewrite drops them, whatever the number of months touched.
+
+    Args:
+        new_rows (DataFrame): Rows built by fact_sales_rows().
+        orders (DataFrame): sales_order_id of the recomputed orders, default every order.
+
+    Returns:
+        DataFrame: sales_order_id, sales_order_detail_id and _tf_deleted = TRUE, one row per deleted line.
+    """
+    keys = ["sales_order_id", "sales_order_detail_id"]
+    stored = spark.table("gold.fact_sales").select(*keys)
+    if orders is not None:
+        stored = stored.join(broadcast(orders), "sales_order_id", "left_semi")
+    return stored.join(new_rows.select(*keys), keys, "left_anti").withColumn(DELETED_COLUMN, expr("TRUE"))
+
+# COMMAND ----------
+
+# Months touched by the load: months of the new rows and of the rows already stored for the same orders
+replaceMonths = None
+if orders is not None and factReplaceMaxMonths:
+    stored_orders = spark.table("gold.fact_sales").join(broadcast(orders), "sales_order_id", "left_semi")
+    months = [
+        row["month"] for row in
+        tmp_fact_sales.select("_tf_dim_calendar_id")
+        .unionByName(stored_orders.select("_tf_dim_calendar_id"))
+        .selectExpr("_tf_dim_calendar_id DIV 100 AS month")
+        .distinct()
+        .collect()
+    ]
+    # Lines without order date cannot be located by month: they go through the MERGE
+    if months and None not in months and len(months) <= factReplaceMaxMonths:
+        replaceMonths = sorted(months)
+        print(f"{FACT_CONSUMER}: rewriting months {replaceMonths}")
+
 # COMMAND ----------
 
-# Merge into fact_sales
-spark.sql("""
+# Overwrite the changed months, keeping the creation date of the existing lines and the update date of the unchanged ones
+if replaceMonths:
+    predicate = month_predicate(replaceMonths)
+    fact_columns = ["_tf_dim_calendar_id", "_tf_dim_customer_id", "_tf_dim_geography_id", "sales_order_qty",
+                    "sales_unit_price", "sales_unit_price_discount", "sales_line_total"]
+    unchanged = " AND ".join(f"new.{column} <=> old.{column}" for column in fact_columns)
+    month_rows = (
+        fact_sales_rows(months=replaceMonths).alias("new")
+        .join(
+            spark.table("gold.fact_sales").filter(predicate).alias("old"),
+            ["sales_order_id", "sales_order_detail_id"],
+            how="left_outer"
+        )
+        .select(
+            "sales_order_id",
+            "sales_order_detail_id",
+            col("new._tf_fact_sales_id").alias("_tf_fact_sales_id"),
+            *[col(f"new.{column}").alias(column) for column in fact_columns],
+            coalesce(col("old._tf_create_date"), load_date).alias("_tf_create_date"),
+            expr(f"CASE WHEN {unchanged} THEN old._tf_update_date ELSE current_timestamp() END").alias("_tf_update_date")
+        )
+    )
+    (
+        month_rows.write.format("delta")
+        .mode("overwrite")
+        .option("replaceWhere", predicate)
+        .saveAsTable("gold.fact_sales")
+    )
+
+# COMMAND ----------
+
+# Merge into fact_sales, deleting the lines of the recomputed orders that were deleted in silver
+if not replaceMonths:
+    (
+        tmp_fact_sales.withColumn(DELETED_COLUMN, expr("FALSE"))
+        .unionByName(fact_tombstones(tmp_fact_sales, orders), allowMissingColumns=True)
+        .createOrReplaceTempView("_tmp_fact_sales_merge")
+    )
+    spark.sql(f"""
 MERGE INTO gold.fact_sales AS tgt
-USING _tmp_fact_sales AS src
+USING _tmp_fact_sales_merge AS src
 ON tgt.sales_order_detail_id = src.sales_order_detail_id AND tgt.sales_order_id = src.sales_order_id
-WHEN MATCHED AND (
-    tgt._tf_dim_calendar_id != src._tf_dim_calendar_id OR
-    tgt._tf_dim_customer_id != src._tf_dim_customer_id OR
-    tgt._tf_dim_geography_id != src._tf_dim_geography_id OR
-    tgt.sales_order_qty != src.sales_order_qty OR
-    tgt.sales_unit_price != src.sales_unit_price OR
-    tgt.sales_unit_price_discount != src.sales_unit_price_discount OR
-    tgt.sales_line_total != src.sales_line_total
+WHEN MATCHED AND src.{DELETED_COLUMN} THEN DELETE
+WHEN MATCHED AND NOT (
+    tgt._tf_dim_calendar_id <=> src._tf_dim_calendar_id AND
+    tgt._tf_dim_customer_id <=> src._tf_dim_customer_id AND
+    tgt._tf_dim_geography_id <=> src._tf_dim_geography_id AND
+    tgt.sales_order_qty <=> src.sales_order_qty AND
+    tgt.sales_unit_price <=> src.sales_unit_price AND
+    tgt.sales_unit_price_discount <=> src.sales_unit_price_discount AND
+    tgt.sales_line_total <=> src.sales_line_total
 ) THEN
   UPDATE SET
     _tf_dim_calendar_id = src._tf_dim_calendar_id,
@@ -88,8 +316,9 @@ WHEN MATCHED AND (
     tgt.sales_unit_price_discount = src.sales_unit_price_discount,
     tgt.sales_line_total = src.sales_line_total,
     tgt._tf_update_date = current_timestamp()
-WHEN NOT MATCHED THEN
+WHEN NOT MATCHED AND NOT src.{DELETED_COLUMN} THEN
   INSERT (
+    _tf_fact_sales_id,
     sales_order_id,
     sales_order_detail_id,
     _tf_dim_calendar_id,
@@ -103,6 +332,7 @@ WHEN NOT MATCHED THEN
     _tf_update_date
   )
   VALUES (
+    src._tf_fact_sales_id,
     src.sales_order_id,
     src.sales_order_detail_id,
     src._tf_dim_calendar_id,
@@ -116,3 +346,8 @@ WHEN NOT MATCHED THEN
     current_timestamp()
   )
 """)
+
+# COMMAND ----------
+
+check_surrogate_keys("gold.fact_sales", "_tf_fact_sales_id", new_rows=f"_tf_create_date >= TIMESTAMP '{factLoadStart}'")
+save_cdf_checkpoints(factCheckpoints)
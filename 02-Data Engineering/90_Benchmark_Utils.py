@@ -0,0 +1,189 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Benchmark utilities
+# MAGIC
+# MAGIC Small helpers shared by the `9x_Benchmark_*` notebooks. Include them with `%run ./90_Benchmark_Utils`.
+
+# COMMAND ----------
+
+import json
+import re
+import time
+import uuid
+from urllib.request import urlopen
+
+# COMMAND ----------
+
+def run_action(df):
+    """
+    Fully evaluate a DataFrame without collecting it on the driver.
+
+    Args:
+        df (DataFrame): DataFrame to evaluate.
+    """
+    df.write.format("noop").mode("overwrite").save()
+
+
+def timed(label, fn, repeat=3):
+    """
+    Run a function several times and keep the best wall time.
+
+    Args:
+        label (str): Name of the measured variant.
+        fn (function): Function without argument running the workload.
+        repeat (int): Number of runs.
+
+    Returns:
+        dict: Label, best and worst wall time in seconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    result = {"variant": label, "best_s": round(min(durations), 3), "worst_s": round(max(durations), 3)}
+    print(f"{label}: best {result['best_s']} s, worst {result['worst_s']} s")
+    return result
+
+
+def show_results(results):
+    """
+    Display a list of benchmark results as a table.
+
+    Args:
+        results (list): List of dicts returned by timed() or by the benchmark itself.
+    """
+    display(spark.createDataFrame(results))
+
+
+def spark_ui_api(path):
+    """
+    Call the REST API of the Spark UI of the current application.
+
+    Args:
+        path (str): Path below the application, e.g. "/jobs".
+
+    Returns:
+        object: Decoded JSON answer.
+    """
+    sc = spark.sparkContext
+    return json.load(urlopen(f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}{path}"))
+
+
+def run_tagged(label, fn):
+    """
+    Run a function once with its Spark jobs tagged by a job group of their own.
+
+    Args:
+        label (str): Name of the measured variant.
+        fn (function): Function without argument running the workload.
+
+    Returns:
+        tuple: (wall time in seconds, list of the jobs of the run as returned by the REST API).
+    """
+    sc = spark.sparkContext
+    group = f"bench-{uuid.uuid4().hex}"
+    sc.setJobGroup(group, label)
+    start = time.perf_counter()
+    try:
+        fn()
+    finally:
+        duration = time.perf_counter() - start
+        sc.setLocalProperty("spark.jobGroup.id", None)
+    # The UI listener is asynchronous: give it time to record the last jobs
+    time.sleep(5)
+    return duration, [job for job in spark_ui_api("/jobs") if job.get("jobGroup") == group]
+
+
+def measured_shuffle(label, fn):
+    """
+    Run a function once and sum the shuffle bytes written by its Spark jobs.
+
+    Args:
+        label (str): Name of the measured variant.
+        fn (function): Function without argument running the workload.
+
+    Returns:
+        dict: Label, wall time in seconds and shuffle written in MB.
+    """
+    duration, jobs = run_tagged(label, fn)
+    stage_ids = {stage_id for job in jobs for stage_id in job["stageIds"]}
+    stages = spark_ui_api("/stages?status=complete")
+    shuffle_bytes = sum(stage["shuffleWriteBytes"] for stage in stages if stage["stageId"] in stage_ids)
+
+    result = {"variant": label, "duration_s": round(duration, 3), "shuffle_mb": round(shuffle_bytes / 1024 ** 2, 1)}
+    print(f"{label}: {result['duration_s']} s, {result['shuffle_mb']} MB shuffled")
+    return result
+
+
+SIZE_UNITS = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3, "TiB": 1024 ** 4}
+
+
+def metric_value(text):
+    """
+    Parse the total of a SQL metric as formatted by the Spark UI ("1,234", "12.5 MiB", "total (min, med, max)...").
+
+    Args:
+        text (str): Metric value.
+
+    Returns:
+        float: Total, in bytes for the size metrics.
+    """
+    # With per-task details the total is the first value of the last line
+    match = re.match(r"\s*([\d.,]+)\s*(B|KiB|MiB|GiB|TiB)?", text.strip().split("\n")[-1])
+    if not match:
+        return 0.0
+    return float(match.group(1).replace(",", "")) * SIZE_UNITS.get(match.group(2), 1)
+
+
+def measured_scan(label, fn):
+    """
+    Run a function once and sum the files and bytes read by the table scans of its queries.
+
+    Args:
+        label (str): Name of the measured variant.
+        fn (function): Function without argument running the workload.
+
+    Returns:
+        dict: Label, wall time in seconds, files read and MB read.
+    """
+    duration, jobs = run_tagged(label, fn)
+    job_ids = {job["jobId"] for job in jobs}
+    files_read, bytes_read = 0, 0.0
+    for execution in spark_ui_api("/sql?details=true&length=1000"):
+        if not job_ids & set(execution.get("successJobIds", []) + execution.get("failedJobIds", [])):
+            continue
+        for node in execution.get("nodes", []):
+            if "Scan" not in node["nodeName"]:
+                continue
+            metrics = {metric["name"]: metric["value"] for metric in node.get("metrics", [])}
+            files_read += int(metric_value(metrics.get("number of files read", "0")))
+            bytes_read += metric_value(metrics.get("size of files read", "0"))
+
+    result = {"variant": label, "duration_s": round(duration, 3), "files_read": files_read,
+              "mb_read": round(bytes_read / 1024 ** 2, 1)}
+    print(f"{label}: {result['duration_s']} s, {files_read} files and {result['mb_read']} MB read")
+    return result
+
+
+def measured_cpu(label, fn):
+    """
+    Run a function once and sum the executor CPU time and the input bytes of the stages of its Spark jobs.
+
+    Args:
+        label (str): Name of the measured variant.
+        fn (function): Function without argument running the workload.
+
+    Returns:
+        dict: Label, wall time in seconds, executor CPU time in seconds and MB read.
+    """
+    duration, jobs = run_tagged(label, fn)
+    stage_ids = {stage_id for job in jobs for stage_id in job["stageIds"]}
+    stages = [stage for stage in spark_ui_api("/stages?status=complete") if stage["stageId"] in stage_ids]
+    cpu_ns = sum(stage["executorCpuTime"] for stage in stages)
+    input_bytes = sum(stage["inputBytes"] for stage in stages)
+
+    result = {"variant": label, "duration_s": round(duration, 3), "cpu_s": round(cpu_ns / 1e9, 3),
+              "mb_read": round(input_bytes / 1024 ** 2, 1)}
+    print(f"{label}: {result['duration_s']} s, {result['cpu_s']} s of CPU, {result['mb_read']} MB read")
+    return result
@@ -0,0 +1,143 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Benchmark of the parallel JDBC extraction
+# MAGIC
+# MAGIC Compares the single-connection read used so far in `12_ETL_Bronze_PySpark` with the range-partitioned reads of
+# MAGIC `10_Bronze_JDBC_Lib`. The source is a local SQLite database standing in for the Azure SQL Database, so the benchmark
+# MAGIC can run without touching the real source.
+# MAGIC
+# MAGIC **Prerequisites:**
+# MAGIC - Single node cluster (the SQLite file lives on the local disk of the driver)
+# MAGIC - Maven library `org.xerial:sqlite-jdbc:3.45.1.0` installed on the cluster
+
+# COMMAND ----------
+
+# MAGIC %run ./10_Bronze_JDBC_Lib
+
+# COMMAND ----------
+
+# MAGIC %run ./90_Benchmark_Utils
+
+# COMMAND ----------
+
+import os
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+benchDbPath = "/local_disk0/tmp/bench_adventureworks.db"
+benchRows = 2000000
+benchUrl = f"jdbc:sqlite:{benchDbPath}"
+benchProperties = {"driver": "org.sqlite.JDBC"}
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Building the stand-in database
+# MAGIC
+# MAGIC Two copies of a `SalesOrderDetail`-like table:
+# MAGIC - `SalesOrderDetail`: dense key, like the real table
+# MAGIC - `SalesOrderDetailSkewed`: 80% of the rows in the first 5% of the key range, to show the difference between the `range` and `histogram` strategies
+
+# COMMAND ----------
+
+def create_bench_table(connection, table, keys):
+    connection.execute(f"DROP TABLE IF EXISTS {table}")
+    connection.execute(f"""
+        CREATE TABLE {table} (
+            SalesOrderID INTEGER,
+            SalesOrderDetailID INTEGER PRIMARY KEY,
+            OrderQty INTEGER,
+            ProductID INTEGER,
+            UnitPrice REAL,
+            UnitPriceDiscount REAL,
+            LineTotal REAL,
+            rowguid TEXT,
+            ModifiedDate TEXT
+        )
+    """)
+    start_date = datetime(2008, 6, 1)
+    rows = (
+        (
+            100000 + key // 4,
+            key,
+            random.randint(1, 20),
+            random.randint(700, 1000),
+            round(random.uniform(1, 3500), 4),
+            random.choice([0.0, 0.0, 0.0, 0.05, 0.1]),
+            round(random.uniform(1, 50000), 6),
+            f"{key:036d}",
+            (start_date + timedelta(minutes=key % 500000)).isoformat(sep=" ")
+        )
+        for key in keys
+    )
+    connection.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    connection.commit()
+
+
+os.makedirs(os.path.dirname(benchDbPath), exist_ok=True)
+random.seed(42)
+with sqlite3.connect(benchDbPath) as connection:
+    create_bench_table(connection, "SalesOrderDetail", range(1, benchRows + 1))
+    dense_part = int(benchRows * 0.8)
+    skewed_keys = list(range(1, dense_part + 1)) + [
+        dense_part + i * 80 for i in range(1, benchRows - dense_part + 1)
+    ]
+    create_bench_table(connection, "SalesOrderDetailSkewed", skewed_keys)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Measurements
+# MAGIC
+# MAGIC Every variant reads the full table and discards it with the `noop` writer, so only the extraction is measured.
+
+# COMMAND ----------
+
+cores = spark.sparkContext.defaultParallelism
+results = []
+
+for table in ["SalesOrderDetail", "SalesOrderDetailSkewed"]:
+    results.append({"table": table, **timed(
+        "single connection",
+        lambda: run_action(spark.read.jdbc(url=benchUrl, table=table, properties=benchProperties))
+    )})
+    for num_partitions in sorted({2, 4, cores}):
+        for strategy in ["range", "histogram"]:
+            for fetchsize in [1000, 10000]:
+                results.append({"table": table, **timed(
+                    f"{strategy}, {num_partitions} partitions, fetchsize {fetchsize}",
+                    lambda: run_action(read_jdbc_partitioned(
+                        benchUrl, benchProperties, table,
+                        partition_column="SalesOrderDetailID",
+                        num_partitions=num_partitions,
+                        fetchsize=fetchsize,
+                        strategy=strategy
+                    ))
+                )})
+
+show_results(results)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Partition balance
+# MAGIC
+# MAGIC Rows per Spark partition for the skewed table: with `range` most of the rows end up in the first partition,
+# MAGIC with `histogram` they are spread evenly.
+
+# COMMAND ----------
+
+from pyspark.sql.functions import spark_partition_id
+
+for strategy in ["range", "histogram"]:
+    df = read_jdbc_partitioned(
+        benchUrl, benchProperties, "SalesOrderDetailSkewed",
+        partition_column="SalesOrderDetailID", num_partitions=cores, strategy=strategy
+    )
+    print(strategy)
+    display(df.groupBy(spark_partition_id().alias("partition")).count().orderBy("partition"))
+
+# COMMAND ----------
+
+os.remove(benchDbPath)
@@ -0,0 +1,121 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Benchmark of the change detection
+# MAGIC
+# MAGIC Compares the ways of finding the changed rows of a wide table between a source and the current silver versions:
+# MAGIC
+# MAGIC - `per-column`: `tgt.a != src.a OR tgt.b != src.b ...`, as the silver and gold MERGEs did so far
+# MAGIC - `sha2`: SHA-256 of the concatenated columns computed on both sides, like the MD5 `_tf_row_hash` of the SQL notebooks
+# MAGIC - `xxhash64`: null-safe 64-bit fingerprint of `20_SCD2_Lib` computed on both sides
+# MAGIC - `xxhash64 stored`: the fingerprint is stored with the rows at load time, only one `BIGINT` per row is read and compared
+# MAGIC
+# MAGIC The source differs from the target on 1% of the rows, a fifth of them being changes from a value to NULL.
+
+# COMMAND ----------
+
+# MAGIC %run ./20_SCD2_Lib
+
+# COMMAND ----------
+
+# MAGIC %run ./90_Benchmark_Utils
+
+# COMMAND ----------
+
+from pyspark.sql.functions import col, expr, when
+
+benchSchema = "jeromeaymon_lakehouse.bench"
+benchRows = 5000000
+benchColumns = 21
+
+spark.sql(f"CREATE SCHEMA IF NOT EXISTS {benchSchema}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Building the tables
+# MAGIC
+# MAGIC Like `sales_order_header`: strings, integers, decimals and timestamps, about 10% of NULLs.
+
+# COMMAND ----------
+
+tracked = [f"c{i:02d}" for i in range(benchColumns)]
+
+
+def column_expr(i):
+    kind = i % 4
+    value = {
+        0: "concat('value-', CAST(id * {i} % 100000 AS STRING))",
+        1: "CAST(id * {i} % 1000 AS INT)",
+        2: "CAST(id * {i} % 100000 / 100 AS DECIMAL(19,4))",
+        3: "timestamp_seconds(1212278400 + id * {i} % 100000000)",
+    }[kind].format(i=i + 1)
+    return f"CASE WHEN (id + {i}) % 10 = 0 THEN NULL ELSE {value} END AS c{i:02d}"
+
+
+base = spark.range(benchRows).selectExpr("id AS key", *[column_expr(i) for i in range(benchColumns)])
+with_row_hash(base, tracked).write.mode("overwrite").saveAsTable(f"{benchSchema}.row_hash_target")
+
+# 1% of changed rows: 0.8% on a value, 0.2% from a value to NULL
+source = base.select(
+    "key",
+    when(col("key") % 100 == 1, expr("concat(c00, '-changed')"))
+    .when((col("key") % 500 == 3) & col("c00").isNotNull(), expr("CAST(NULL AS STRING)"))
+    .otherwise(col("c00")).alias("c00"),
+    *tracked[1:]
+)
+with_row_hash(source, tracked).write.mode("overwrite").saveAsTable(f"{benchSchema}.row_hash_source")
+
+expectedChanges = spark.sql(f"""
+    SELECT COUNT(*) FROM {benchSchema}.row_hash_target tgt
+    JOIN {benchSchema}.row_hash_source src ON tgt.key = src.key
+    WHERE NOT (tgt.c00 <=> src.c00)
+""").first()[0]
+print(f"Rows actually changed: {expectedChanges}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Measurements
+
+# COMMAND ----------
+
+per_column = " OR ".join(f"tgt.{c} != src.{c}" for c in tracked)
+sha2_side = "sha2(concat_ws('|', {}), 256)".format(", ".join(f"COALESCE(CAST({{alias}}.{c} AS STRING), '')" for c in tracked))
+xxhash_side = "xxhash64({})".format(", ".join(f"{{alias}}.{c}, {{alias}}.{c} IS NULL" for c in tracked))
+
+variants = {
+    "per-column": f"({per_column})",
+    "sha2": f"{sha2_side.format(alias='tgt')} != {sha2_side.format(alias='src')}",
+    "xxhash64": f"{xxhash_side.format(alias='tgt')} != {xxhash_side.format(alias='src')}",
+    "xxhash64 stored": "NOT (tgt._tf_row_hash <=> src._tf_row_hash)",
+}
+
+
+def changed_rows(condition):
+    return spark.sql(f"""
+        SELECT tgt.key FROM {benchSchema}.row_hash_target tgt
+        JOIN {benchSchema}.row_hash_source src ON tgt.key = src.key
+        WHERE {condition}
+    """)
+
+
+results = []
+for label, condition in variants.items():
+    result = timed(label, lambda: run_action(changed_rows(condition)))
+    result["changes_found"] = changed_rows(condition).count()
+    result["changes_missed"] = expectedChanges - result["changes_found"]
+    results.append(result)
+
+show_results(results)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC `per-column` misses the changes to NULL (`value != NULL` is NULL, not TRUE). `sha2` only catches them because of the
+# MAGIC `COALESCE`, which in turn confuses NULL with an empty string. The stored fingerprint reads 2 columns instead of 22
+# MAGIC on each side and compares one `BIGINT`.
+
+# COMMAND ----------
+
+spark.sql(f"DROP TABLE IF EXISTS {benchSchema}.row_hash_target")
+spark.sql(f"DROP TABLE IF EXISTS {benchSchema}.row_hash_source")
@@ -0,0 +1,123 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Benchmark of the current-row layout
+# MAGIC
+# MAGIC Every reader of the silver tables only wants the current versions (`_tf_is_current`). Compares, for a growing
+# MAGIC history depth (number of versions per key), the bytes a current-only scan has to read with two layouts:
+# MAGIC
+# MAGIC - `unclustered`: current and closed versions mixed in the same files, as the MERGEs write them
+# MAGIC - `clustered`: `CLUSTER BY (_tf_is_current, key)` then `OPTIMIZE`, the layout of the silver tables (`01_Init`)
+# MAGIC
+# MAGIC A file can only be skipped when it holds no current version (the maximum of `_tf_is_current` is then false), so the
+# MAGIC bytes read are the size of the files holding at least one current row, found with the `_metadata` column.
+
+# COMMAND ----------
+
+# MAGIC %run ./90_Benchmark_Utils
+
+# COMMAND ----------
+
+benchSchema = "jeromeaymon_lakehouse.bench"
+benchKeys = 1000000
+historyDepths = [1, 2, 4, 8, 16]
+benchFiles = 64  # Files written by the unclustered load, like successive MERGEs
+
+spark.sql(f"CREATE SCHEMA IF NOT EXISTS {benchSchema}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Building the tables
+# MAGIC
+# MAGIC `depth` versions per key, the last one current, with a few attribute columns like `silver.customer`.
+
+# COMMAND ----------
+
+def create_bench_table(table, clustered):
+    spark.sql(f"""
+        CREATE OR REPLACE TABLE {table} (
+            key BIGINT,
+            first_name STRING,
+            last_name STRING,
+            email_address STRING,
+            phone STRING,
+            _tf_row_hash BIGINT,
+            _tf_valid_from TIMESTAMP,
+            _tf_valid_to TIMESTAMP,
+            _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL)
+        ) {"CLUSTER BY (_tf_is_current, key)" if clustered else ""}
+    """)
+
+
+def history_rows(depth):
+    return spark.range(benchKeys * depth).selectExpr(
+        f"id % {benchKeys} AS key",
+        f"CAST(id DIV {benchKeys} AS INT) AS version",
+    ).selectExpr(
+        "key",
+        "concat('first-', CAST(key % 5000 AS STRING), '-', CAST(version AS STRING)) AS first_name",
+        "concat('last-', CAST(key % 20000 AS STRING)) AS last_name",
+        "concat('user', CAST(key AS STRING), '-', CAST(version AS STRING), '@adventure-works.com') AS email_address",
+        "concat('555-', lpad(CAST(key % 10000 AS STRING), 4, '0')) AS phone",
+        "xxhash64(key, version) AS _tf_row_hash",
+        "timestamp_seconds(1212278400 + version * 86400) AS _tf_valid_from",
+        f"CASE WHEN version < {depth - 1} THEN timestamp_seconds(1212278400 + (version + 1) * 86400) END AS _tf_valid_to",
+    )
+
+
+def load_bench_table(depth, clustered):
+    table = f"{benchSchema}.current_rows_{'clustered' if clustered else 'unclustered'}"
+    create_bench_table(table, clustered)
+    rows = history_rows(depth)
+    if not clustered:
+        rows = rows.repartition(benchFiles)
+    rows.write.mode("append").saveAsTable(table)
+    if clustered:
+        spark.sql(f"OPTIMIZE {table}")
+    return table
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Measurements
+
+# COMMAND ----------
+
+def scan_stats(table):
+    detail = spark.sql(f"DESCRIBE DETAIL {table}").first()
+    read = spark.sql(f"""
+        SELECT COUNT(*) AS files_read, COALESCE(SUM(file_size), 0) AS bytes_read
+        FROM (SELECT DISTINCT _metadata.file_path, _metadata.file_size FROM {table} WHERE _tf_is_current)
+    """).first()
+    return {
+        "files": detail["numFiles"],
+        "table_mb": round(detail["sizeInBytes"] / 1024 ** 2, 1),
+        "files_read": read["files_read"],
+        "mb_read": round(read["bytes_read"] / 1024 ** 2, 1),
+    }
+
+
+results = []
+for depth in historyDepths:
+    for clustered in [False, True]:
+        layout = "clustered" if clustered else "unclustered"
+        table = load_bench_table(depth, clustered)
+        result = {"depth": depth, "layout": layout, **scan_stats(table)}
+        result.update(timed(
+            f"depth {depth}, {layout}",
+            lambda: run_action(spark.table(table).filter("_tf_is_current").select("key", "_tf_row_hash"))
+        ))
+        results.append(result)
+
+show_results(results)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC Unclustered, every file holds current rows: a current-only scan reads the whole table, which grows linearly with the
+# MAGIC depth. Clustered, the bytes read stay close to the size of the current versions whatever the depth.
+
+# COMMAND ----------
+
+spark.sql(f"DROP TABLE IF EXISTS {benchSchema}.current_rows_unclustered")
+spark.sql(f"DROP TABLE IF EXISTS {benchSchema}.current_rows_clustered")
@@ -0,0 +1,97 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Benchmark of the delete detection
+# MAGIC
+# MAGIC Compares, on a scaled-up copy of `sales_order_detail`, the ways a full-snapshot SCD2 load of `20_SCD2_Lib` closes
+# MAGIC the keys deleted at the source:
+# MAGIC
+# MAGIC - `not_matched_by_source`: `WHEN NOT MATCHED BY SOURCE` clause, the MERGE outer joins the whole source with the
+# MAGIC   whole current target, every column included
+# MAGIC - `anti_join`: key-only tombstones (`scd2_tombstones`) added to the MERGE source
+# MAGIC - `anti_join, broadcast keys`: the same with the source keys broadcast
+# MAGIC
+# MAGIC Each variant starts from the same target version (`RESTORE`) and deletes the same 0.1% of the keys.
+
+# COMMAND ----------
+
+# MAGIC %run ./02_Column_Lineage
+
+# COMMAND ----------
+
+# MAGIC %run ./20_SCD2_Lib
+
+# COMMAND ----------
+
+# MAGIC %run ./90_Benchmark_Utils
+
+# COMMAND ----------
+
+from pyspark.sql.functions import expr
+
+benchSchema = "jeromeaymon_lakehouse.bench"
+benchCopies = 2000  # Copies of bronze.salesorderdetail, about 1.1 million rows
+
+spark.sql(f"CREATE SCHEMA IF NOT EXISTS {benchSchema}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Building the tables
+
+# COMMAND ----------
+
+# Source: copies of the bronze rows with shifted keys
+(
+    spark.range(benchCopies).crossJoin(spark.table("bronze.salesorderdetail"))
+    .withColumn("SalesOrderID", expr("SalesOrderID + id * 100000"))
+    .withColumn("SalesOrderDetailID", expr("SalesOrderDetailID + id * 1000000"))
+    .drop("id")
+    .write.mode("overwrite").saveAsTable(f"{benchSchema}.sod_source")
+)
+
+# Target: empty copy of silver.sales_order_detail, loaded once from the source
+spark.sql(f"CREATE OR REPLACE TABLE {benchSchema}.sod_history SHALLOW CLONE silver.sales_order_detail")
+spark.sql(f"DELETE FROM {benchSchema}.sod_history")
+
+benchSpec = {**SILVER_MAPPINGS["silver.sales_order_detail"], "bronze_table": f"{benchSchema}.sod_source"}
+benchSpec.pop("current_table", None)
+run_scd2(f"{benchSchema}.sod_history", benchSpec)
+initialVersion = latest_version(f"{benchSchema}.sod_history")
+
+# 0.1% of the keys deleted at the source
+spark.sql(f"DELETE FROM {benchSchema}.sod_source WHERE SalesOrderDetailID % 1000 = 7")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Measurements
+
+# COMMAND ----------
+
+variants = {
+    "not_matched_by_source": dict(delete_detection="not_matched_by_source"),
+    "anti_join": dict(delete_detection="anti_join"),
+    "anti_join, broadcast keys": dict(delete_detection="anti_join", broadcast_keys=True),
+}
+
+results = []
+for label, options in variants.items():
+    spark.sql(f"RESTORE TABLE {benchSchema}.sod_history TO VERSION AS OF {initialVersion}")
+    load = {}
+    result = measured_shuffle(label, lambda: load.update(run_scd2(f"{benchSchema}.sod_history", benchSpec, **options)))
+    result["rows_closed"] = load["rows_closed"]
+    results.append(result)
+
+show_results(results)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC All variants close the same keys. The outer join of `not_matched_by_source` shuffles every column of the source
+# MAGIC and of the current target; the tombstones only add the business key columns to the shuffle of the MERGE join, and
+# MAGIC nothing when the source keys are broadcast.
+
+# COMMAND ----------
+
+spark.sql(f"DROP TABLE IF EXISTS {benchSchema}.sod_history")
+spark.sql(f"DROP TABLE IF EXISTS {benchSchema}.sod_source")
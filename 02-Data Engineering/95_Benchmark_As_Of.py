@@ -0,0 +1,116 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Benchmark of the point-in-time queries
+# MAGIC
+# MAGIC Measures the files and bytes read by `as_of` (state of the table at a date in the middle of its history) and
+# MAGIC `history` (versions of one key) of `20_SCD2_Lib`, for a growing history depth (number of versions per key) and two
+# MAGIC layouts:
+# MAGIC
+# MAGIC - `key clustering`: `CLUSTER BY (_tf_is_current, key)`, the current versions apart from the history only
+# MAGIC - `interval index`: `CLUSTER BY (_tf_is_current, _tf_valid_from_month, key)`, the layout of the silver tables (`01_Init`)
+# MAGIC
+# MAGIC The scan metrics are read from the Spark UI (`measured_scan` in `90_Benchmark_Utils`).
+
+# COMMAND ----------
+
+# MAGIC %run ./20_SCD2_Lib
+
+# COMMAND ----------
+
+# MAGIC %run ./90_Benchmark_Utils
+
+# COMMAND ----------
+
+from datetime import datetime, timedelta
+
+benchSchema = "jeromeaymon_lakehouse.bench"
+benchKeys = 1000000
+historyDepths = [1, 4, 16]
+historyStart = datetime(2023, 1, 1)
+
+spark.sql(f"CREATE SCHEMA IF NOT EXISTS {benchSchema}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Building the tables
+# MAGIC
+# MAGIC Version `v` of a key starts about `v` months after the start of the history, the last version is current.
+
+# COMMAND ----------
+
+layouts = {
+    "key clustering": "_tf_is_current, key",
+    "interval index": "_tf_is_current, _tf_valid_from_month, key",
+}
+
+
+def load_bench_table(depth, layout):
+    table = f"{benchSchema}.as_of_{layout.replace(' ', '_')}"
+    spark.sql(f"""
+        CREATE OR REPLACE TABLE {table} (
+            key BIGINT,
+            first_name STRING,
+            last_name STRING,
+            email_address STRING,
+            _tf_row_hash BIGINT,
+            _tf_valid_from TIMESTAMP,
+            _tf_valid_to TIMESTAMP,
+            _tf_is_current BOOLEAN GENERATED ALWAYS AS (_tf_valid_to IS NULL),
+            _tf_valid_from_month DATE GENERATED ALWAYS AS (CAST(date_trunc('MONTH', _tf_valid_from) AS DATE))
+        ) CLUSTER BY ({layouts[layout]})
+    """)
+    start = int(historyStart.timestamp())
+    (
+        spark.range(benchKeys * depth)
+        .selectExpr(f"id % {benchKeys} AS key", f"CAST(id DIV {benchKeys} AS INT) AS version")
+        .selectExpr(
+            "key",
+            "concat('first-', CAST(key % 5000 AS STRING), '-', CAST(version AS STRING)) AS first_name",
+            "concat('last-', CAST(key % 20000 AS STRING)) AS last_name",
+            "concat('user', CAST(key AS STRING), '-', CAST(version AS STRING), '@adventure-works.com') AS email_address",
+            "xxhash64(key, version) AS _tf_row_hash",
+            f"timestamp_seconds({start} + (version * 30 + key % 28) * 86400) AS _tf_valid_from",
+            f"CASE WHEN version < {depth - 1} "
+            f"THEN timestamp_seconds({start} + ((version + 1) * 30 + key % 28) * 86400) END AS _tf_valid_to",
+        )
+        .write.mode("append").saveAsTable(table)
+    )
+    spark.sql(f"OPTIMIZE {table}")
+    return table
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Measurements
+
+# COMMAND ----------
+
+results = []
+for depth in historyDepths:
+    as_of_ts = historyStart + timedelta(days=30 * (depth // 2) + 15)
+    for layout in layouts:
+        table = load_bench_table(depth, layout)
+        detail = spark.sql(f"DESCRIBE DETAIL {table}").first()
+        for query, run in [
+            ("as_of", lambda: run_action(as_of(table, as_of_ts))),
+            ("history", lambda: run_action(history(table, {"key": 424242}))),
+        ]:
+            result = measured_scan(f"depth {depth}, {layout}, {query}", run)
+            result.update(depth=depth, layout=layout, query=query, files=detail["numFiles"],
+                          table_mb=round(detail["sizeInBytes"] / 1024 ** 2, 1))
+            results.append(result)
+
+show_results(results)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC With `key clustering` the history files hold every period, so `as_of` reads all of them once the date is in the
+# MAGIC past. With the interval index only the files of the months up to the date whose versions may still be open are read,
+# MAGIC and `history` reads the files of its key range in every month instead of the whole history.
+
+# COMMAND ----------
+
+for layout in layouts:
+    spark.sql(f"DROP TABLE IF EXISTS {benchSchema}.as_of_{layout.replace(' ', '_')}")
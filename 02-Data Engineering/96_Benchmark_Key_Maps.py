@@ -0,0 +1,182 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Benchmark of the dimension key resolution
+# MAGIC
+# MAGIC Compares, on synthetic order lines, the ways the fact load resolves `_tf_dim_customer_id` and
+# MAGIC `_tf_dim_geography_id`:
+# MAGIC
+# MAGIC - `silver joins`: the lines join the silver customer and address tables, then the dims, every column available to
+# MAGIC   the optimizer, as `34_ETL_Gold_Fact_PySpark` did so far
+# MAGIC - `broadcast key maps`: `lookup_keys` of `30_Gold_Key_Map_Lib`, the `(natural key, surrogate key)` map of each
+# MAGIC   dim broadcast
+# MAGIC - `pandas UDF lookup`: the maps collected into Python dicts, broadcast, and probed with `Series.map` in a pandas
+# MAGIC   UDF
+# MAGIC
+# MAGIC 1% of the lines reference a customer or an address missing from the dims and must get the unknown member `-9`.
+
+# COMMAND ----------
+
+# MAGIC %run ./30_Gold_Key_Map_Lib
+
+# COMMAND ----------
+
+# MAGIC %run ./90_Benchmark_Utils
+
+# COMMAND ----------
+
+import pandas as pd
+from pyspark.sql.functions import pandas_udf
+
+benchSchema = "jeromeaymon_lakehouse.bench"
+benchLines = 20000000
+benchCustomers = 1000000
+benchAddresses = 2000000
+
+spark.sql(f"CREATE SCHEMA IF NOT EXISTS {benchSchema}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Building the tables
+# MAGIC
+# MAGIC Silver and dim tables with the columns of `silver.customer_current`, `silver.address_current` and the dims.
+
+# COMMAND ----------
+
+spark.range(benchCustomers).selectExpr(
+    "CAST(id AS INT) AS customer_id",
+    "concat('first-', CAST(id % 5000 AS STRING)) AS first_name",
+    "concat('last-', CAST(id % 20000 AS STRING)) AS last_name",
+    "concat('Company ', CAST(id % 50000 AS STRING)) AS company_name",
+    "concat('customer', CAST(id AS STRING), '@adventure-works.com') AS email_address",
+    "concat('555-', lpad(CAST(id % 10000 AS STRING), 4, '0')) AS phone",
+).write.mode("overwrite").saveAsTable(f"{benchSchema}.km_customer")
+
+spark.range(benchAddresses).selectExpr(
+    "CAST(id AS INT) AS address_id",
+    "concat(CAST(id % 9000 AS STRING), ' Main Street') AS address_line1",
+    "concat('City ', CAST(id % 3000 AS STRING)) AS city",
+    "concat('State ', CAST(id % 60 AS STRING)) AS state_province",
+    "concat('Country ', CAST(id % 12 AS STRING)) AS country_region",
+    "lpad(CAST(id % 99999 AS STRING), 5, '0') AS postal_code",
+).write.mode("overwrite").saveAsTable(f"{benchSchema}.km_address")
+
+spark.table(f"{benchSchema}.km_customer").selectExpr(
+    "CAST(customer_id + 1 AS BIGINT) AS _tf_dim_customer_id",
+    "customer_id AS cust_customer_id",
+    "first_name AS cust_first_name",
+    "last_name AS cust_last_name",
+    "company_name AS cust_company_name",
+    "email_address AS cust_email_address",
+    "phone AS cust_phone",
+).write.mode("overwrite").saveAsTable(f"{benchSchema}.km_dim_customer")
+
+spark.table(f"{benchSchema}.km_address").selectExpr(
+    "CAST(address_id + 1 AS BIGINT) AS _tf_dim_geography_id",
+    "address_id AS geo_address_id",
+    "address_line1 AS geo_address_line_1",
+    "city AS geo_city",
+    "state_province AS geo_state_province",
+    "country_region AS geo_country_region",
+    "postal_code AS geo_postal_code",
+).write.mode("overwrite").saveAsTable(f"{benchSchema}.km_dim_geography")
+
+# Order lines, 1% referencing keys beyond the dims
+spark.range(benchLines).selectExpr(
+    "CAST(id DIV 4 AS INT) AS sales_order_id",
+    "CAST(id AS INT) AS sales_order_detail_id",
+    f"CAST(CASE WHEN id % 100 = 0 THEN {benchCustomers} + id % 1000 "
+    f"ELSE pmod(xxhash64(id, 1), {benchCustomers}) END AS INT) AS customer_id",
+    f"CAST(CASE WHEN id % 100 = 0 THEN {benchAddresses} + id % 1000 "
+    f"ELSE pmod(xxhash64(id, 2), {benchAddresses}) END AS INT) AS bill_to_address_id",
+    "CAST(id % 10 + 1 AS SMALLINT) AS order_qty",
+    "CAST(id % 100000 / 100 AS DECIMAL(19,4)) AS unit_price",
+).write.mode("overwrite").saveAsTable(f"{benchSchema}.km_lines")
+
+customerSpec = {"natural_key": "cust_customer_id", "surrogate_key": "_tf_dim_customer_id"}
+geographySpec = {"natural_key": "geo_address_id", "surrogate_key": "_tf_dim_geography_id"}
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Measurements
+
+# COMMAND ----------
+
+def silver_joins():
+    lines = spark.table(f"{benchSchema}.km_lines").alias("sod")
+    return (
+        lines
+        .join(spark.table(f"{benchSchema}.km_customer").alias("c"),
+              col("sod.customer_id") == col("c.customer_id"), "left_outer")
+        .join(spark.table(f"{benchSchema}.km_dim_customer").alias("cust"),
+              col("c.customer_id") == col("cust.cust_customer_id"), "left_outer")
+        .join(spark.table(f"{benchSchema}.km_address").alias("a"),
+              col("sod.bill_to_address_id") == col("a.address_id"), "left_outer")
+        .join(spark.table(f"{benchSchema}.km_dim_geography").alias("geo"),
+              col("a.address_id") == col("geo.geo_address_id"), "left_outer")
+        .select(
+            "sod.sales_order_id", "sod.sales_order_detail_id", "sod.order_qty", "sod.unit_price",
+            coalesce(col("cust._tf_dim_customer_id"), lit(UNKNOWN_MEMBER_ID)).alias("_tf_dim_customer_id"),
+            coalesce(col("geo._tf_dim_geography_id"), lit(UNKNOWN_MEMBER_ID)).alias("_tf_dim_geography_id"),
+        )
+    )
+
+
+def broadcast_key_maps():
+    lines = spark.table(f"{benchSchema}.km_lines")
+    lines = lookup_keys(lines, "customer_id", f"{benchSchema}.km_dim_customer", customerSpec)
+    lines = lookup_keys(lines, "bill_to_address_id", f"{benchSchema}.km_dim_geography", geographySpec)
+    return lines.select("sales_order_id", "sales_order_detail_id", "order_qty", "unit_price",
+                        "_tf_dim_customer_id", "_tf_dim_geography_id")
+
+
+def pandas_lookup_udf(dim_table, spec):
+    rows = key_map(dim_table, spec).collect()
+    mapping = spark.sparkContext.broadcast({row[0]: row[1] for row in rows})
+
+    @pandas_udf("bigint")
+    def lookup(keys: pd.Series) -> pd.Series:
+        return keys.map(mapping.value).fillna(UNKNOWN_MEMBER_ID).astype("int64")
+
+    return lookup
+
+
+def pandas_udf_lookup():
+    customer_lookup = pandas_lookup_udf(f"{benchSchema}.km_dim_customer", customerSpec)
+    geography_lookup = pandas_lookup_udf(f"{benchSchema}.km_dim_geography", geographySpec)
+    return spark.table(f"{benchSchema}.km_lines").select(
+        "sales_order_id", "sales_order_detail_id", "order_qty", "unit_price",
+        customer_lookup("customer_id").alias("_tf_dim_customer_id"),
+        geography_lookup("bill_to_address_id").alias("_tf_dim_geography_id"),
+    )
+
+
+variants = {
+    "silver joins": silver_joins,
+    "broadcast key maps": broadcast_key_maps,
+    "pandas UDF lookup": pandas_udf_lookup,
+}
+
+results = []
+for label, build in variants.items():
+    result = measured_shuffle(label, lambda: run_action(build()))
+    result["unknown_members"] = build().filter(
+        (col("_tf_dim_customer_id") == UNKNOWN_MEMBER_ID) | (col("_tf_dim_geography_id") == UNKNOWN_MEMBER_ID)
+    ).count()
+    results.append(result)
+
+show_results(results)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC All variants find the same unknown members. `silver joins` shuffles the 20 million lines once per join, with the
+# MAGIC wide silver and dim rows. The key maps weigh a few MB: broadcast, they are probed where the lines are read and
+# MAGIC nothing is shuffled. The pandas UDF avoids the shuffle as well, but collects the maps on the driver and moves
+# MAGIC every batch of keys between the JVM and Python: the broadcast join is used by the fact load.
+
+# COMMAND ----------
+
+for table in ["km_lines", "km_customer", "km_address", "km_dim_customer", "km_dim_geography"]:
+    spark.sql(f"DROP TABLE IF EXISTS {benchSchema}.{table}")
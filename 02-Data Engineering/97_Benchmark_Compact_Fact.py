@@ -0,0 +1,222 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Benchmark of the compact fact layout
+# MAGIC
+# MAGIC Runs the line level aggregations behind the `Queries` reports on synthetic order lines stored in the two layouts
+# MAGIC of the SQL track (`Data Engineering/00_Init`):
+# MAGIC
+# MAGIC - `decimal`: `gold.fact_sales`, BIGINT dimension keys, `DECIMAL(19,4)` prices and `DECIMAL(38,6)` line totals
+# MAGIC - `compact`: `gold.fact_sales_compact`, INT keys and BIGINT minor-unit measures, summed as integers and
+# MAGIC   converted to DECIMAL once per group
+# MAGIC - `compact view`: the decimal view `gold.v_fact_sales_compact` on top of the compact table, summed as decimals
+# MAGIC
+# MAGIC The executor CPU time and the bytes read come from the Spark UI (`measured_cpu` in `90_Benchmark_Utils`). The
+# MAGIC results of every query are compared across the layouts.
+
+# COMMAND ----------
+
+# MAGIC %run ./90_Benchmark_Utils
+
+# COMMAND ----------
+
+benchSchema = "jeromeaymon_lakehouse.bench"
+benchLines = 50000000
+benchCustomers = 100000
+benchAddresses = 200000
+benchProducts = 5000
+benchCategories = 40
+
+spark.sql(f"CREATE SCHEMA IF NOT EXISTS {benchSchema}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Building the tables
+# MAGIC
+# MAGIC The compact table is converted from the decimal one with the expressions of `05 Data Engineering Gold Fact`,
+# MAGIC both clustered by date and optimized.
+
+# COMMAND ----------
+
+spark.sql(f"""
+    CREATE OR REPLACE TABLE {benchSchema}.cf_decimal (
+        sales_order_id INT,
+        sales_order_detail_id INT,
+        _tf_dim_calendar_sk INT,
+        _tf_dim_customer_sk BIGINT,
+        _tf_dim_geography_sk BIGINT,
+        _tf_dim_product_sk BIGINT,
+        sales_order_qty SMALLINT,
+        sales_unit_price DECIMAL(19, 4),
+        sales_unit_price_discount DECIMAL(19, 4),
+        sales_line_total DECIMAL(38, 6)
+    ) CLUSTER BY (_tf_dim_calendar_sk)
+""")
+
+# Four lines per order, one customer, address and date per order
+(
+    spark.range(benchLines)
+    .selectExpr("id", "id DIV 4 AS order_id")
+    .selectExpr(
+        "CAST(order_id AS INT) AS sales_order_id",
+        "CAST(id AS INT) AS sales_order_detail_id",
+        "CAST(date_format(date_add(DATE'2020-01-01', CAST(order_id % 1826 AS INT)), 'yyyyMMdd') AS INT) "
+        "AS _tf_dim_calendar_sk",
+        f"pmod(xxhash64(order_id, 1), {benchCustomers}) + 1 AS _tf_dim_customer_sk",
+        f"pmod(xxhash64(order_id, 2), {benchAddresses}) + 1 AS _tf_dim_geography_sk",
+        f"pmod(xxhash64(id, 3), {benchProducts}) + 1 AS _tf_dim_product_sk",
+        "CAST(id % 10 + 1 AS SMALLINT) AS sales_order_qty",
+        "CAST(pmod(xxhash64(id, 4), 3000000) / 10000 AS DECIMAL(19, 4)) AS sales_unit_price",
+        "CAST(CASE WHEN id % 7 = 0 THEN 0.05 WHEN id % 11 = 0 THEN 0.1 ELSE 0 END AS DECIMAL(19, 4)) "
+        "AS sales_unit_price_discount",
+    )
+    .selectExpr(
+        "*",
+        "CAST(sales_order_qty * sales_unit_price * (1 - sales_unit_price_discount) AS DECIMAL(38, 6)) "
+        "AS sales_line_total",
+    )
+    .write.mode("append").saveAsTable(f"{benchSchema}.cf_decimal")
+)
+
+spark.sql(f"""
+    CREATE OR REPLACE TABLE {benchSchema}.cf_compact CLUSTER BY (_tf_dim_calendar_sk) AS
+    SELECT
+        sales_order_id,
+        sales_order_detail_id,
+        _tf_dim_calendar_sk,
+        CAST(_tf_dim_customer_sk AS INT) AS _tf_dim_customer_sk,
+        CAST(_tf_dim_geography_sk AS INT) AS _tf_dim_geography_sk,
+        CAST(_tf_dim_product_sk AS INT) AS _tf_dim_product_sk,
+        sales_order_qty,
+        CAST(sales_unit_price * 10000 AS BIGINT) AS sales_unit_price_e4,
+        CAST(sales_unit_price_discount * 10000 AS SMALLINT) AS sales_unit_price_discount_e4,
+        CAST(sales_line_total * 1000000 AS BIGINT) AS sales_line_total_e6
+    FROM {benchSchema}.cf_decimal
+""")
+
+spark.sql(f"""
+    CREATE OR REPLACE VIEW {benchSchema}.cf_compact_view AS
+    SELECT
+        sales_order_id,
+        sales_order_detail_id,
+        _tf_dim_calendar_sk,
+        CAST(_tf_dim_customer_sk AS BIGINT) AS _tf_dim_customer_sk,
+        CAST(_tf_dim_geography_sk AS BIGINT) AS _tf_dim_geography_sk,
+        CAST(_tf_dim_product_sk AS BIGINT) AS _tf_dim_product_sk,
+        sales_order_qty,
+        CAST(sales_unit_price_e4 * 0.0001 AS DECIMAL(19, 4)) AS sales_unit_price,
+        CAST(sales_unit_price_discount_e4 * 0.0001 AS DECIMAL(19, 4)) AS sales_unit_price_discount,
+        CAST(sales_line_total_e6 * 0.000001 AS DECIMAL(38, 6)) AS sales_line_total
+    FROM {benchSchema}.cf_compact
+""")
+
+spark.range(benchProducts).selectExpr(
+    "id + 1 AS _tf_dim_product_sk",
+    f"CAST(id % {benchCategories} AS INT) AS prod_category_id",
+).write.mode("overwrite").saveAsTable(f"{benchSchema}.cf_dim_product")
+
+for table in ["cf_decimal", "cf_compact"]:
+    spark.sql(f"OPTIMIZE {benchSchema}.{table}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Queries
+# MAGIC
+# MAGIC One SQL text per report and layout. `{fact}` is the fact table, the compact queries convert the integer totals
+# MAGIC to the decimal type of the report once per group.
+
+# COMMAND ----------
+
+decimalQueries = {
+    "05_total_revenue": "SELECT SUM(sales_line_total) AS total_revenue FROM {fact}",
+    "02_sales_by_customer": """
+        SELECT _tf_dim_customer_sk, COUNT(DISTINCT sales_order_id) AS nb_orders
+        FROM {fact} GROUP BY _tf_dim_customer_sk
+    """,
+    "06_sell_by_region": """
+        SELECT _tf_dim_geography_sk, COUNT(DISTINCT sales_order_id) AS nb_orders
+        FROM {fact} GROUP BY _tf_dim_geography_sk
+    """,
+    "08_top_3_client": """
+        SELECT _tf_dim_customer_sk, SUM(sales_line_total) AS total
+        FROM {fact} GROUP BY _tf_dim_customer_sk ORDER BY total DESC, _tf_dim_customer_sk LIMIT 3
+    """,
+    "09_revenu_par_categorie": f"""
+        SELECT p.prod_category_id, SUM(f.sales_order_qty * f.sales_unit_price) AS total_revenue
+        FROM {{fact}} f JOIN {benchSchema}.cf_dim_product p ON f._tf_dim_product_sk = p._tf_dim_product_sk
+        GROUP BY p.prod_category_id
+    """,
+    "10_analyse_remise": """
+        SELECT _tf_dim_product_sk, SUM(sales_unit_price_discount) AS total_discount
+        FROM {fact} GROUP BY _tf_dim_product_sk ORDER BY total_discount DESC, _tf_dim_product_sk LIMIT 1
+    """,
+}
+
+compactQueries = {
+    "05_total_revenue": """
+        SELECT CAST(SUM(sales_line_total_e6) * 0.000001 AS DECIMAL(38, 6)) AS total_revenue FROM {fact}
+    """,
+    "02_sales_by_customer": decimalQueries["02_sales_by_customer"],
+    "06_sell_by_region": decimalQueries["06_sell_by_region"],
+    "08_top_3_client": """
+        SELECT _tf_dim_customer_sk, CAST(SUM(sales_line_total_e6) * 0.000001 AS DECIMAL(38, 6)) AS total
+        FROM {fact} GROUP BY _tf_dim_customer_sk ORDER BY total DESC, _tf_dim_customer_sk LIMIT 3
+    """,
+    "09_revenu_par_categorie": f"""
+        SELECT p.prod_category_id,
+               CAST(SUM(f.sales_order_qty * f.sales_unit_price_e4) * 0.0001 AS DECIMAL(38, 4)) AS total_revenue
+        FROM {{fact}} f JOIN {benchSchema}.cf_dim_product p ON f._tf_dim_product_sk = p._tf_dim_product_sk
+        GROUP BY p.prod_category_id
+    """,
+    "10_analyse_remise": """
+        SELECT _tf_dim_product_sk, CAST(SUM(sales_unit_price_discount_e4) * 0.0001 AS DECIMAL(38, 4)) AS total_discount
+        FROM {fact} GROUP BY _tf_dim_product_sk ORDER BY total_discount DESC, _tf_dim_product_sk LIMIT 1
+    """,
+}
+
+variants = {
+    "decimal": (f"{benchSchema}.cf_decimal", decimalQueries),
+    "compact": (f"{benchSchema}.cf_compact", compactQueries),
+    "compact view": (f"{benchSchema}.cf_compact_view", decimalQueries),
+}
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Measurements
+
+# COMMAND ----------
+
+for table in ["cf_decimal", "cf_compact"]:
+    detail = spark.sql(f"DESCRIBE DETAIL {benchSchema}.{table}").first()
+    print(f"{table}: {detail['numFiles']} files, {round(detail['sizeInBytes'] / 1024 ** 2, 1)} MB")
+
+results = []
+for query in decimalQueries:
+    reference = None
+    for layout, (fact, queries) in variants.items():
+        sql = queries[query].format(fact=fact)
+        result = measured_cpu(f"{query}, {layout}", lambda: run_action(spark.sql(sql)))
+        rows = sorted(tuple(float(value) for value in row) for row in spark.sql(sql).collect())
+        reference = reference or rows
+        result.update(query=query, layout=layout, same_result=rows == reference)
+        results.append(result)
+
+show_results(results)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC The compact table is the smaller one: INT keys and BIGINT measures encode in fewer bytes than BIGINT keys and
+# MAGIC decimals, and every query reads less. The sums are where the CPU goes: a `DECIMAL(38, 6)` sum cannot be held in
+# MAGIC a long and is computed on `BigDecimal` objects, while the compact queries add longs and convert one value per
+# MAGIC group. `compact view` reads the small table but converts every row back to a decimal before summing, and loses
+# MAGIC most of the CPU gain: reports reading large volumes should aggregate the integer columns, the view is meant for
+# MAGIC row level consumers. The distinct counts do not use the measures and differ only by the key width.
+
+# COMMAND ----------
+
+spark.sql(f"DROP VIEW IF EXISTS {benchSchema}.cf_compact_view")
+for table in ["cf_decimal", "cf_compact", "cf_dim_product"]:
+    spark.sql(f"DROP TABLE IF EXISTS {benchSchema}.{table}")
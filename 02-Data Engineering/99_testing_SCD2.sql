@@ -70,3 +70,20 @@ SELECT * FROM address WHERE city = 'Surrey' ORDER BY address_id, _tf_valid_from
 -- COMMAND ----------
 
 SELECT * FROM address WHERE address_id IN (11383, 1105);
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Point-in-time queries
+-- MAGIC
+-- MAGIC State of the addresses one hour ago (before the ETL) and every version of the test addresses since yesterday,
+-- MAGIC through the functions created by `01_Init` (see `as_of` and `history` in `20_SCD2_Lib`).
+
+-- COMMAND ----------
+
+SELECT * FROM address_as_of(current_timestamp() - INTERVAL 1 HOUR) WHERE city IN ('Bothell', 'Surrey') ORDER BY address_id
+
+-- COMMAND ----------
+
+SELECT * FROM address_versions(current_timestamp() - INTERVAL 1 DAY, NULL)
+WHERE address_id IN (11383, 1105) ORDER BY address_id, _tf_valid_from
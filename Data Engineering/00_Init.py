@@ -82,6 +82,27 @@
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## Création de la table de watermark
+# MAGIC
+# MAGIC Dernière `ModifiedDate` chargée par table source, utilisée par le chargement incrémental de la couche Bronze.
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE TABLE IF NOT EXISTS jeromeaymon_lakehouse.bronze.load_watermark (
+# MAGIC     source_table STRING NOT NULL, -- Source table, e.g. SalesLT.Address
+# MAGIC     target_table STRING, -- Bronze table
+# MAGIC     watermark_column STRING, -- Column holding the last modification date
+# MAGIC     key_column STRING, -- Integer key breaking the ties on the watermark column
+# MAGIC     hwm_value TIMESTAMP, -- Highest modification date loaded
+# MAGIC     hwm_key BIGINT, -- Highest key loaded with that modification date
+# MAGIC     rows_extracted BIGINT, -- Rows extracted by the last run
+# MAGIC     updated_at TIMESTAMP
+# MAGIC )
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## Creating tables in Silver layer
 # MAGIC
@@ -272,6 +293,23 @@
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC Index Bloom sur les clés de la ligne de commande : les recherches d'une commande ou d'une ligne (support,
+# MAGIC rapprochements) ne lisent que les fichiers dont le filtre peut contenir la clé, au lieu de toute la table. Le
+# MAGIC filtre de chaque fichier est écrit avec le fichier : les fichiers existants ne sont indexés qu'après réécriture
+# MAGIC (`OPTIMIZE`). `numItems` est le nombre de valeurs distinctes attendu par fichier, `fpp` le taux de faux positifs.
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE BLOOMFILTER INDEX ON TABLE jeromeaymon_lakehouse.silver.sales_order_detail
+# MAGIC FOR COLUMNS (
+# MAGIC   sales_order_id OPTIONS (fpp = 0.01, numItems = 250000),
+# MAGIC   sales_order_detail_id OPTIONS (fpp = 0.01, numItems = 1000000)
+# MAGIC );
+
+# COMMAND ----------
+
 # MAGIC %sql
 # MAGIC CREATE OR REPLACE TABLE jeromeaymon_lakehouse.silver.customeraddress (
 # MAGIC   _tf_id BIGINT GENERATED ALWAYS AS IDENTITY (START WITH 1 INCREMENT BY 1) PRIMARY KEY NOT NULL,
@@ -330,7 +368,7 @@
 # MAGIC    sell_start_date TIMESTAMP,
 # MAGIC    sell_end_date TIMESTAMP,
 # MAGIC    discontinued_date TIMESTAMP,
-# MAGIC    thumbnail_photo BINARY,
+# MAGIC    thumbnail_photo_hash STRING, -- SHA-256 of the thumbnail, stored once in silver.product_blob
 # MAGIC    thumbnail_photo_file_name STRING,
 # MAGIC    rowguid CHAR(36),
 # MAGIC    modified_date TIMESTAMP,
@@ -356,6 +394,44 @@
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ### Stockage des images produit
+# MAGIC
+# MAGIC Les vignettes ne sont plus stockées dans `silver.product` : chaque image est stockée une seule fois dans
+# MAGIC `silver.product_blob`, identifiée par son hash SHA-256, et `silver.product` ne garde que ce hash. Les scans, MERGE
+# MAGIC et jointures sur les produits ne transportent ainsi plus les octets des images. La vue `silver.v_product_thumbnail`
+# MAGIC permet de récupérer l'image d'un produit quand elle est nécessaire.
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE TABLE IF NOT EXISTS jeromeaymon_lakehouse.silver.product_blob (
+# MAGIC    content_hash STRING NOT NULL, -- SHA-256 (hex) of the content
+# MAGIC    content BINARY,
+# MAGIC    content_size INT,
+# MAGIC    _tf_create_date TIMESTAMP NOT NULL
+# MAGIC  )
+# MAGIC  TBLPROPERTIES (
+# MAGIC    'delta.autoOptimize.optimizeWrite' = 'true',
+# MAGIC    'description' = 'Content-addressed store of the product images, one row per distinct image'
+# MAGIC  );
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE VIEW jeromeaymon_lakehouse.silver.v_product_thumbnail AS
+# MAGIC SELECT
+# MAGIC    p.product_id,
+# MAGIC    p.thumbnail_photo_file_name,
+# MAGIC    b.content AS thumbnail_photo,
+# MAGIC    b.content_size AS thumbnail_photo_size
+# MAGIC FROM jeromeaymon_lakehouse.silver.product p
+# MAGIC JOIN jeromeaymon_lakehouse.silver.product_blob b
+# MAGIC    ON b.content_hash = p.thumbnail_photo_hash
+# MAGIC WHERE p._tf_is_current = TRUE;
+
+# COMMAND ----------
+
 # MAGIC %sql
 # MAGIC CREATE OR REPLACE TABLE jeromeaymon_lakehouse.silver.productcategory (
 # MAGIC    _tf_id BIGINT GENERATED ALWAYS AS IDENTITY (START WITH 1 INCREMENT BY 1) PRIMARY KEY NOT NULL,
@@ -900,6 +976,32 @@
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ### Table de fermeture (closure) de la hiérarchie des catégories
+# MAGIC Une ligne par couple (ancêtre, descendant) de la hiérarchie courante, y compris chaque catégorie avec elle-même
+# MAGIC (profondeur 0). Maintenue par `04 Data Engineering Gold Dim`.
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE TABLE IF NOT EXISTS gold.dim_product_category_closure (
+# MAGIC   ancestor_cat_id INT NOT NULL, -- prod_cat_id de l'ancêtre
+# MAGIC   descendant_cat_id INT NOT NULL, -- prod_cat_id du descendant
+# MAGIC   depth INT NOT NULL, -- Nombre de niveaux entre les deux (0 = la catégorie elle-même)
+# MAGIC
+# MAGIC   -- Technical columns
+# MAGIC   _tf_create_date TIMESTAMP NOT NULL,
+# MAGIC   _tf_update_date TIMESTAMP NOT NULL,
+# MAGIC
+# MAGIC   CONSTRAINT pk_dim_product_category_closure PRIMARY KEY (ancestor_cat_id, descendant_cat_id)
+# MAGIC )
+# MAGIC CLUSTER BY (descendant_cat_id) -- Les agrégats rejoignent la table par la catégorie du produit
+# MAGIC TBLPROPERTIES (
+# MAGIC   'description' = 'Ancestor / descendant pairs of the current product category hierarchy'
+# MAGIC );
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## Dimension Product avec références au Model et à la Category
 # MAGIC ### Création de la table dim_product
@@ -1029,9 +1131,118 @@
 # MAGIC   _tf_create_date TIMESTAMP NOT NULL,
 # MAGIC   _tf_update_date TIMESTAMP
 # MAGIC )
+# MAGIC CLUSTER BY (_tf_dim_calendar_sk) -- Le rafraîchissement des agrégats ne relit que les jours modifiés
 # MAGIC TBLPROPERTIES (
 # MAGIC   'delta.enableChangeDataFeed' = 'true',
 # MAGIC   'delta.autoOptimize.optimizeWrite' = 'true',
 # MAGIC   'delta.autoOptimize.autoCompact' = 'true',
 # MAGIC   'description' = 'Sales fact table at order detail grain'
 # MAGIC );
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC Index Bloom sur les clés métier : `fact_sales` est clusterisée par date, une recherche par commande ou par ligne
+# MAGIC ne lit que les fichiers dont le filtre peut contenir la clé (voir `silver.sales_order_detail`).
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE BLOOMFILTER INDEX ON TABLE jeromeaymon_lakehouse.gold.fact_sales
+# MAGIC FOR COLUMNS (
+# MAGIC   sales_order_id OPTIONS (fpp = 0.01, numItems = 250000),
+# MAGIC   sales_order_detail_id OPTIONS (fpp = 0.01, numItems = 1000000)
+# MAGIC );
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ### Création table de Fact au niveau commande
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE OR REPLACE TABLE jeromeaymon_lakehouse.gold.fact_sales_order (
+# MAGIC   -- Surrogate key
+# MAGIC   _tf_fact_sales_order_sk BIGINT GENERATED ALWAYS AS IDENTITY (START WITH 1 INCREMENT BY 1) PRIMARY KEY NOT NULL,
+# MAGIC   
+# MAGIC   -- Business keys
+# MAGIC   sales_order_id INT NOT NULL,
+# MAGIC   sales_order_number STRING,
+# MAGIC   
+# MAGIC   -- Foreign keys to dimensions
+# MAGIC   _tf_dim_calendar_sk INT -- Order date
+# MAGIC   REFERENCES jeromeaymon_lakehouse.gold.dim_calendar(_tf_dim_calendar_sk),
+# MAGIC   _tf_dim_due_date_sk INT
+# MAGIC   REFERENCES jeromeaymon_lakehouse.gold.dim_calendar(_tf_dim_calendar_sk),
+# MAGIC   _tf_dim_ship_date_sk INT
+# MAGIC   REFERENCES jeromeaymon_lakehouse.gold.dim_calendar(_tf_dim_calendar_sk),
+# MAGIC   _tf_dim_customer_sk BIGINT
+# MAGIC   REFERENCES jeromeaymon_lakehouse.gold.dim_customer(_tf_dim_customer_sk),
+# MAGIC   _tf_dim_geography_sk BIGINT NOT NULL -- Billing address
+# MAGIC   REFERENCES jeromeaymon_lakehouse.gold.dim_geography(_tf_dim_geography_sk),
+# MAGIC   
+# MAGIC   -- Measures
+# MAGIC   sales_sub_total DECIMAL(19, 4),
+# MAGIC   sales_tax_amt DECIMAL(19, 4),
+# MAGIC   sales_freight DECIMAL(19, 4),
+# MAGIC   sales_total_due DECIMAL(19, 4),
+# MAGIC   
+# MAGIC   -- Technical columns
+# MAGIC   _tf_create_date TIMESTAMP NOT NULL,
+# MAGIC   _tf_update_date TIMESTAMP
+# MAGIC )
+# MAGIC CLUSTER BY (_tf_dim_calendar_sk)
+# MAGIC TBLPROPERTIES (
+# MAGIC   'delta.enableChangeDataFeed' = 'true',
+# MAGIC   'delta.autoOptimize.optimizeWrite' = 'true',
+# MAGIC   'delta.autoOptimize.autoCompact' = 'true',
+# MAGIC   'description' = 'Sales fact table at order header grain'
+# MAGIC );
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ### Création de la représentation compacte de fact_sales
+# MAGIC Mêmes lignes que `fact_sales`, avec des mesures entières en unités mineures et des clés INT : une somme d'entiers
+# MAGIC est bien plus rapide qu'une somme de `DECIMAL(38, 6)`, et la ligne est plus étroite. Les montants exacts sont
+# MAGIC exposés par la vue `gold.v_fact_sales_compact` (`05 Data Engineering Gold Fact`).
+# MAGIC
+# MAGIC | Colonne | Unité | Conversion exacte |
+# MAGIC |---|---|---|
+# MAGIC | `sales_unit_price_e4` | 1/10 000 de devise (échelle de `DECIMAL(19, 4)`) | `sales_unit_price_e4 * 0.0001` |
+# MAGIC | `sales_unit_price_discount_e4` | 1/10 000 (taux de 0 à 1) | `sales_unit_price_discount_e4 * 0.0001` |
+# MAGIC | `sales_line_total_e6` | 1/1 000 000 de devise (échelle de `DECIMAL(38, 6)`) | `sales_line_total_e6 * 0.000001` |
+# MAGIC
+# MAGIC Un BIGINT en millionièmes couvre des montants jusqu'à 9,2 × 10^12, sommes comprises : bien au-delà du chiffre
+# MAGIC d'affaires du lakehouse. Les clés de dimension, générées à partir de 1, restent loin de la limite d'un INT.
+
+# COMMAND ----------
+
+# MAGIC %sql
+# MAGIC CREATE TABLE IF NOT EXISTS jeromeaymon_lakehouse.gold.fact_sales_compact (
+# MAGIC   -- Business keys
+# MAGIC   sales_order_id INT NOT NULL,
+# MAGIC   sales_order_detail_id INT NOT NULL,
+# MAGIC   
+# MAGIC   -- Foreign keys to dimensions
+# MAGIC   _tf_dim_calendar_sk INT,
+# MAGIC   _tf_dim_customer_sk INT,
+# MAGIC   _tf_dim_geography_sk INT,
+# MAGIC   _tf_dim_product_sk INT,
+# MAGIC   
+# MAGIC   -- Measures, en unités mineures
+# MAGIC   sales_order_qty SMALLINT,
+# MAGIC   sales_unit_price_e4 BIGINT,
+# MAGIC   sales_unit_price_discount_e4 SMALLINT,
+# MAGIC   sales_line_total_e6 BIGINT,
+# MAGIC   
+# MAGIC   -- Technical columns
+# MAGIC   _tf_update_date TIMESTAMP NOT NULL -- _tf_update_date de la ligne de fact_sales
+# MAGIC )
+# MAGIC CLUSTER BY (_tf_dim_calendar_sk)
+# MAGIC TBLPROPERTIES (
+# MAGIC   'delta.autoOptimize.optimizeWrite' = 'true',
+# MAGIC   'delta.autoOptimize.autoCompact' = 'true',
+# MAGIC   'description' = 'Sales fact table at order detail grain, integer minor-unit measures'
+# MAGIC );
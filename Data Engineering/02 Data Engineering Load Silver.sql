@@ -128,8 +128,8 @@ SELECT
   SalesPerson AS sales_person,
   EmailAddress AS email_address,
   Phone AS phone,
-  PasswordHash AS password_hash,
-  PasswordSalt AS password_salt,
+  CAST(NULL AS STRING) AS password_hash, -- Non extrait en bronze
+  CAST(NULL AS STRING) AS password_salt, -- Non extrait en bronze
   rowguid AS rowguid,
   ModifiedDate AS modified_date,
   MD5(CONCAT_WS('|',
@@ -551,9 +551,48 @@ WHERE NOT EXISTS (
 
 -- COMMAND ----------
 
+-- Seules les vignettes modifiées depuis le dernier chargement de silver.product sont lues (tant que product_blob est
+-- vide, toutes le sont) : le coût suit le nombre d'images changées et non le volume total des images
+DECLARE OR REPLACE hwm_product_blob TIMESTAMP;
+SET VAR hwm_product_blob = (
+  SELECT
+    CASE
+      WHEN (SELECT COUNT(*) FROM silver.product_blob) = 0 THEN TIMESTAMP'1900-01-01'
+      ELSE COALESCE(MAX(modified_date), TIMESTAMP'1900-01-01')
+    END
+  FROM silver.product
+);
+
+-- COMMAND ----------
+
+-- Stocker une seule fois chaque nouvelle image, identifiée par son hash : les hashes déjà connus sont écartés
+-- avant de lire la colonne binaire
+MERGE INTO silver.product_blob AS tgt
+USING (
+  SELECT
+    t.ThumbNailPhotoHash AS content_hash,
+    ANY_VALUE(t.ThumbNailPhoto) AS content
+  FROM bronze.productthumbnail t
+  WHERE t.ModifiedDate >= hwm_product_blob
+    AND t.ThumbNailPhotoHash IS NOT NULL
+    AND NOT EXISTS (
+      SELECT 1 FROM silver.product_blob b
+      WHERE b.content_hash = t.ThumbNailPhotoHash
+    )
+  GROUP BY t.ThumbNailPhotoHash
+) AS src
+ON tgt.content_hash = src.content_hash
+WHEN NOT MATCHED THEN INSERT (
+  content_hash, content, content_size, _tf_create_date
+) VALUES (
+  src.content_hash, src.content, LENGTH(src.content), load_date
+);
+
+-- COMMAND ----------
+
 CREATE OR REPLACE TEMP VIEW _src_product AS
 SELECT
-  ProductID AS product_id,
+  p.ProductID AS product_id,
   Name AS name,
   ProductNumber AS product_number,
   Color AS color,
@@ -566,10 +605,10 @@ SELECT
   SellStartDate AS sell_start_date,
   SellEndDate AS sell_end_date,
   DiscontinuedDate AS discontinued_date,
-  ThumbNailPhoto AS thumbnail_photo,
+  t.ThumbNailPhotoHash AS thumbnail_photo_hash,
   ThumbnailPhotoFileName AS thumbnail_photo_file_name,
   rowguid AS rowguid,
-  ModifiedDate AS modified_date,
+  p.ModifiedDate AS modified_date,
   MD5(CONCAT_WS('|',
     COALESCE(Name, ''),
     COALESCE(ProductNumber, ''),
@@ -583,9 +622,11 @@ SELECT
     COALESCE(CAST(SellStartDate AS STRING), ''),
     COALESCE(CAST(SellEndDate AS STRING), ''),
     COALESCE(CAST(DiscontinuedDate AS STRING), ''),
-    COALESCE(CAST(ModifiedDate AS STRING), '')
+    COALESCE(CAST(p.ModifiedDate AS STRING), '')
   )) AS row_hash
-FROM bronze.product;
+-- Seul le hash de la vignette est lu, pas l'image
+FROM bronze.product p
+LEFT JOIN bronze.productthumbnail t ON t.ProductID = p.ProductID;
 
 MERGE INTO silver.product AS tgt
 USING _src_product AS src
@@ -618,7 +659,7 @@ INSERT INTO silver.product (
   sell_start_date, 
   sell_end_date, 
   discontinued_date,
-  thumbnail_photo, 
+  thumbnail_photo_hash, 
   thumbnail_photo_file_name, 
   rowguid, 
   modified_date, 
@@ -643,7 +684,7 @@ SELECT
   src.sell_start_date, 
   src.sell_end_date, 
   src.discontinued_date, 
-  src.thumbnail_photo, 
+  src.thumbnail_photo_hash, 
   src.thumbnail_photo_file_name, 
   src.rowguid, 
   src.modified_date, 
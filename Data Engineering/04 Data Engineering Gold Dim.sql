@@ -304,6 +304,117 @@ WHERE NOT EXISTS (
 
 -- COMMAND ----------
 
+-- MAGIC %md
+-- MAGIC ### Maintenance de la table de fermeture dim_product_category_closure
+-- MAGIC
+-- MAGIC `dim_product_category_closure` contient tous les couples (ancêtre, descendant) de la hiérarchie courante : un
+-- MAGIC agrégat par catégorie se cumule à n'importe quel niveau par une seule équi-jointure sur `descendant_cat_id`, sans
+-- MAGIC parcourir les liens parent / enfant à chaque requête.
+-- MAGIC
+-- MAGIC Seuls les descendants touchés sont recalculés : les catégories ayant une version ouverte ou fermée depuis la
+-- MAGIC dernière maintenance, et leurs descendants connus de la table. Une catégorie fermée sans nouvelle version (retirée
+-- MAGIC de la source) n'a plus de version courante : tous ses couples sont supprimés. Un descendant non modifié dont un
+-- MAGIC ancêtre a changé de parent passe forcément par une catégorie modifiée, il est donc dans cet ensemble. Ses ancêtres
+-- MAGIC sont recalculés en remontant la hiérarchie courante, puis la table est mise à jour par un seul MERGE : insertion des
+-- MAGIC nouveaux couples, mise à jour des profondeurs, suppression des couples disparus.
+-- MAGIC
+-- MAGIC La dernière maintenance est le `load_date` enregistré dans `gold.agg_watermark` (`source_table` =
+-- MAGIC `gold.dim_product_category`) : le `_tf_update_date` de la table de fermeture n'avance pas quand aucun couple ne
+-- MAGIC change, les mêmes catégories seraient relues à chaque chargement.
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS gold.agg_watermark (
+  source_table STRING NOT NULL, -- Table dont les changements sont lus
+  hwm_value TIMESTAMP, -- Début du dernier rafraîchissement
+  updated_at TIMESTAMP
+);
+
+DECLARE OR REPLACE hwm_category_closure TIMESTAMP;
+SET VAR hwm_category_closure = (
+  SELECT MAX(hwm_value) FROM gold.agg_watermark WHERE source_table = 'gold.dim_product_category'
+);
+
+CREATE OR REPLACE TEMP VIEW _changed_categories AS
+-- Catégories ayant une version ouverte (nouvelle ou modifiée) ou fermée (modifiée ou retirée)
+SELECT DISTINCT prod_cat_id AS cat_id
+FROM gold.dim_product_category
+WHERE hwm_category_closure IS NULL
+  OR _tf_valid_from >= hwm_category_closure
+  OR _tf_valid_to >= hwm_category_closure;
+
+CREATE OR REPLACE TEMP VIEW _affected_categories AS
+SELECT cat_id
+FROM _changed_categories
+UNION
+-- Leurs descendants dans la hiérarchie précédente
+SELECT cl.descendant_cat_id
+FROM gold.dim_product_category_closure cl
+INNER JOIN _changed_categories cc
+  ON cl.ancestor_cat_id = cc.cat_id;
+
+CREATE OR REPLACE TEMP VIEW _src_category_closure AS
+WITH RECURSIVE ancestors (descendant_cat_id, ancestor_cat_id, depth) AS (
+  -- Chaque catégorie touchée ayant une version courante est son propre ancêtre
+  SELECT ac.cat_id, ac.cat_id, 0
+  FROM _affected_categories ac
+  INNER JOIN gold.dim_product_category pc
+    ON ac.cat_id = pc.prod_cat_id
+    AND pc._tf_is_current = TRUE
+  UNION ALL
+  -- Remonter d'un niveau
+  SELECT a.descendant_cat_id, pc.prod_cat_parent_id, a.depth + 1
+  FROM ancestors a
+  INNER JOIN gold.dim_product_category pc
+    ON a.ancestor_cat_id = pc.prod_cat_id
+    AND pc._tf_is_current = TRUE
+  WHERE pc.prod_cat_parent_id IS NOT NULL
+)
+SELECT ancestor_cat_id, descendant_cat_id, depth, FALSE AS is_deleted
+FROM ancestors
+UNION ALL
+-- Couples existants des descendants touchés qui n'existent plus
+SELECT cl.ancestor_cat_id, cl.descendant_cat_id, cl.depth, TRUE
+FROM gold.dim_product_category_closure cl
+INNER JOIN _affected_categories ac
+  ON cl.descendant_cat_id = ac.cat_id
+WHERE NOT EXISTS (
+  SELECT 1 FROM ancestors a
+  WHERE a.ancestor_cat_id = cl.ancestor_cat_id
+    AND a.descendant_cat_id = cl.descendant_cat_id
+);
+
+SELECT hwm_category_closure, COUNT(*) AS affected_categories FROM _affected_categories;
+
+-- COMMAND ----------
+
+MERGE INTO gold.dim_product_category_closure AS tgt
+USING _src_category_closure AS src
+ON tgt.ancestor_cat_id = src.ancestor_cat_id
+  AND tgt.descendant_cat_id = src.descendant_cat_id
+WHEN MATCHED AND src.is_deleted THEN
+  DELETE
+WHEN MATCHED AND tgt.depth != src.depth THEN
+  UPDATE SET
+    tgt.depth = src.depth,
+    tgt._tf_update_date = load_date
+WHEN NOT MATCHED AND NOT src.is_deleted THEN
+  INSERT (ancestor_cat_id, descendant_cat_id, depth, _tf_create_date, _tf_update_date)
+  VALUES (src.ancestor_cat_id, src.descendant_cat_id, src.depth, load_date, load_date);
+
+-- Début de ce chargement : les versions ouvertes ou fermées ci-dessus le sont à load_date et seront relues une fois,
+-- sans effet
+MERGE INTO gold.agg_watermark AS tgt
+USING (SELECT 'gold.dim_product_category' AS source_table, load_date AS hwm_value) AS src
+ON tgt.source_table = src.source_table
+WHEN MATCHED THEN UPDATE SET
+  tgt.hwm_value = src.hwm_value,
+  tgt.updated_at = current_timestamp()
+WHEN NOT MATCHED THEN INSERT (source_table, hwm_value, updated_at)
+  VALUES (src.source_table, src.hwm_value, current_timestamp());
+
+-- COMMAND ----------
+
 -- MAGIC %md
 -- MAGIC ### Chargement de dim_product
 
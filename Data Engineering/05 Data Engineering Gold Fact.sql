@@ -13,24 +13,19 @@ VALUES load_date;
 
 -- COMMAND ----------
 
-CREATE OR REPLACE TEMP VIEW _tmp_fact_sales AS
+CREATE OR REPLACE TEMP VIEW _tmp_sales_lines AS
 SELECT
-  -- Business keys
-  CAST(soh.sales_order_id AS INT) AS sales_order_id,
-  CAST(sod.sales_order_detail_id AS INT) AS sales_order_detail_id,
-  
-  -- Dimension foreign keys
-  10000 * YEAR(soh.order_date) + 100 * MONTH(soh.order_date) + DAY(soh.order_date) AS _tf_dim_calendar_sk,
-  COALESCE(cust._tf_dim_customer_sk, -9) AS _tf_dim_customer_sk,
-  COALESCE(geo._tf_dim_geography_sk, -9) AS _tf_dim_geography_sk,
-  COALESCE(prod._tf_dim_product_sk, -9) AS _tf_dim_product_sk,
-  
-  -- Measures
-  COALESCE(TRY_CAST(sod.order_qty AS SMALLINT), 0) AS sales_order_qty,
-  COALESCE(TRY_CAST(sod.unit_price AS DECIMAL(19,4)), 0) AS sales_unit_price,
-  COALESCE(TRY_CAST(sod.unit_price_discount AS DECIMAL(19,4)), 0) AS sales_unit_price_discount,
-  COALESCE(TRY_CAST(sod.line_total AS DECIMAL(38, 6)), 0) AS sales_line_total
-
+  sod.sales_order_id,
+  sod.sales_order_detail_id,
+  sod.product_id,
+  sod.order_qty,
+  sod.unit_price,
+  sod.unit_price_discount,
+  sod.line_total,
+  soh.sales_order_id AS header_sales_order_id,
+  soh.order_date,
+  soh.customer_id,
+  soh.bill_to_address_id
 FROM silver.sales_order_detail sod
 
 -- Join avec sales_order_header
@@ -38,37 +33,172 @@ LEFT OUTER JOIN silver.sales_order_header soh
   ON sod.sales_order_id = soh.sales_order_id 
   AND soh._tf_valid_to IS NULL
 
--- Join avec customer
-LEFT OUTER JOIN silver.customer c 
-  ON soh.customer_id = c.customer_id 
-  AND c._tf_valid_to IS NULL
+WHERE sod._tf_valid_to IS NULL;
 
--- Join avec dim_customer
-LEFT OUTER JOIN gold.dim_customer cust
-  ON c.customer_id = cust.cust_customer_id
-  AND cust._tf_is_current = TRUE
+-- COMMAND ----------
 
--- Join avec address
-LEFT OUTER JOIN silver.address a 
-  ON soh.bill_to_address_id = a.address_id 
-  AND a._tf_valid_to IS NULL
+-- MAGIC %md
+-- MAGIC ### Clés de dimension à la date de commande
+-- MAGIC
+-- MAGIC `dim_customer`, `dim_geography` et `dim_product` sont historisées (SCD2) : une commande doit pointer vers la version
+-- MAGIC valide à sa date (`order_date`), pas vers la version courante. Une jointure sur l'intervalle
+-- MAGIC (`order_date >= _tf_valid_from AND order_date < _tf_valid_to`) compare chaque ligne à toutes les versions de son
+-- MAGIC membre, voire à toute la dimension (nested loop join) quand la condition d'égalité manque.
+-- MAGIC
+-- MAGIC Les vues `_asof_*` résolvent la clé par tri : les versions de la dimension (début de validité, clé) et les couples
+-- MAGIC distincts (clé naturelle, date de commande) sont réunis, partitionnés par clé naturelle et triés par date. La clé
+-- MAGIC d'une date de commande est celle de la dernière version qui la précède (`LAST_VALUE ... IGNORE NULLS`), à égalité la
+-- MAGIC version l'emporte. Un seul échange (shuffle) par clé naturelle, puis la table de faits rejoint le résultat par une
+-- MAGIC équi-jointure sur (clé naturelle, date) : le coût reste celui d'une jointure sur la clé courante.
+-- MAGIC
+-- MAGIC Les versions commencent à leur date de chargement en gold : une commande antérieure à la première version d'un
+-- MAGIC membre prend cette première version. Un membre absent de la dimension donne le membre inconnu `-9`.
+-- MAGIC
+-- MAGIC Les versions archivées par `06 Data Engineering Archive History` restent valides pour les commandes de leur
+-- MAGIC période : les événements sont lus dans `gold.dim_<name>_all` (dimension et archive).
 
--- Join avec dim_geography
-LEFT OUTER JOIN gold.dim_geography geo 
-  ON a.address_id = geo.geo_address_id
-  AND geo._tf_is_current = TRUE
+-- COMMAND ----------
 
--- Join avec product
-LEFT OUTER JOIN silver.product p
-  ON sod.product_id = p.product_id
-  AND p._tf_valid_to IS NULL
+-- Tant que 06 n'a pas tourné, il n'y a pas d'archive et la vue se limite à la dimension (06 la remplace par l'union
+-- avec `<name>_history`).
+CREATE VIEW IF NOT EXISTS gold.dim_customer_all AS SELECT * FROM gold.dim_customer;
+CREATE VIEW IF NOT EXISTS gold.dim_geography_all AS SELECT * FROM gold.dim_geography;
+CREATE VIEW IF NOT EXISTS gold.dim_product_all AS SELECT * FROM gold.dim_product;
 
--- Join avec dim_product
-LEFT OUTER JOIN gold.dim_product prod
-  ON p.product_id = prod.prod_product_id
-  AND prod._tf_is_current = TRUE
+-- COMMAND ----------
 
-WHERE sod._tf_valid_to IS NULL;
+CREATE OR REPLACE TEMP VIEW _asof_customer AS
+WITH events AS (
+  -- Versions de la dimension
+  SELECT cust_customer_id AS customer_id, _tf_valid_from AS event_date, 0 AS event_type, _tf_dim_customer_sk AS sk
+  FROM gold.dim_customer_all
+  WHERE _tf_dim_customer_sk != -9
+  UNION ALL
+  -- Dates de commande à résoudre
+  SELECT DISTINCT customer_id, order_date, 1, CAST(NULL AS BIGINT)
+  FROM silver.sales_order_header
+  WHERE _tf_is_current = TRUE
+),
+resolved AS (
+  SELECT
+    customer_id,
+    event_date,
+    event_type,
+    LAST_VALUE(sk, TRUE) OVER (
+      PARTITION BY customer_id ORDER BY event_date, event_type
+      ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+    ) AS sk_as_of,
+    FIRST_VALUE(sk, TRUE) OVER (
+      PARTITION BY customer_id ORDER BY event_date, event_type
+      ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+    ) AS sk_first
+  FROM events
+)
+SELECT customer_id, event_date AS order_date, COALESCE(sk_as_of, sk_first, -9) AS _tf_dim_customer_sk
+FROM resolved
+WHERE event_type = 1;
+
+-- COMMAND ----------
+
+CREATE OR REPLACE TEMP VIEW _asof_geography AS
+WITH events AS (
+  -- Versions de la dimension
+  SELECT geo_address_id AS address_id, _tf_valid_from AS event_date, 0 AS event_type, _tf_dim_geography_sk AS sk
+  FROM gold.dim_geography_all
+  WHERE _tf_dim_geography_sk != -9
+  UNION ALL
+  -- Dates de commande à résoudre (adresse de facturation)
+  SELECT DISTINCT bill_to_address_id, order_date, 1, CAST(NULL AS BIGINT)
+  FROM silver.sales_order_header
+  WHERE _tf_is_current = TRUE
+),
+resolved AS (
+  SELECT
+    address_id,
+    event_date,
+    event_type,
+    LAST_VALUE(sk, TRUE) OVER (
+      PARTITION BY address_id ORDER BY event_date, event_type
+      ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+    ) AS sk_as_of,
+    FIRST_VALUE(sk, TRUE) OVER (
+      PARTITION BY address_id ORDER BY event_date, event_type
+      ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+    ) AS sk_first
+  FROM events
+)
+SELECT address_id, event_date AS order_date, COALESCE(sk_as_of, sk_first, -9) AS _tf_dim_geography_sk
+FROM resolved
+WHERE event_type = 1;
+
+-- COMMAND ----------
+
+CREATE OR REPLACE TEMP VIEW _asof_product AS
+WITH events AS (
+  -- Versions de la dimension
+  SELECT prod_product_id AS product_id, _tf_valid_from AS event_date, 0 AS event_type, _tf_dim_product_sk AS sk
+  FROM gold.dim_product_all
+  WHERE _tf_dim_product_sk != -9
+  UNION ALL
+  -- Dates de commande à résoudre
+  SELECT DISTINCT product_id, order_date, 1, CAST(NULL AS BIGINT)
+  FROM _tmp_sales_lines
+),
+resolved AS (
+  SELECT
+    product_id,
+    event_date,
+    event_type,
+    LAST_VALUE(sk, TRUE) OVER (
+      PARTITION BY product_id ORDER BY event_date, event_type
+      ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+    ) AS sk_as_of,
+    FIRST_VALUE(sk, TRUE) OVER (
+      PARTITION BY product_id ORDER BY event_date, event_type
+      ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+    ) AS sk_first
+  FROM events
+)
+SELECT product_id, event_date AS order_date, COALESCE(sk_as_of, sk_first, -9) AS _tf_dim_product_sk
+FROM resolved
+WHERE event_type = 1;
+
+-- COMMAND ----------
+
+CREATE OR REPLACE TEMP VIEW _tmp_fact_sales AS
+SELECT
+  -- Business keys
+  CAST(l.header_sales_order_id AS INT) AS sales_order_id,
+  CAST(l.sales_order_detail_id AS INT) AS sales_order_detail_id,
+  
+  -- Dimension foreign keys, versions valides à la date de commande
+  10000 * YEAR(l.order_date) + 100 * MONTH(l.order_date) + DAY(l.order_date) AS _tf_dim_calendar_sk,
+  COALESCE(cust._tf_dim_customer_sk, -9) AS _tf_dim_customer_sk,
+  COALESCE(geo._tf_dim_geography_sk, -9) AS _tf_dim_geography_sk,
+  COALESCE(prod._tf_dim_product_sk, -9) AS _tf_dim_product_sk,
+  
+  -- Measures
+  COALESCE(TRY_CAST(l.order_qty AS SMALLINT), 0) AS sales_order_qty,
+  COALESCE(TRY_CAST(l.unit_price AS DECIMAL(19,4)), 0) AS sales_unit_price,
+  COALESCE(TRY_CAST(l.unit_price_discount AS DECIMAL(19,4)), 0) AS sales_unit_price_discount,
+  COALESCE(TRY_CAST(l.line_total AS DECIMAL(38, 6)), 0) AS sales_line_total
+
+FROM _tmp_sales_lines l
+
+-- Clé client à la date de commande
+LEFT OUTER JOIN _asof_customer cust
+  ON l.customer_id = cust.customer_id
+  AND l.order_date = cust.order_date
+
+-- Clé géographie (adresse de facturation) à la date de commande
+LEFT OUTER JOIN _asof_geography geo
+  ON l.bill_to_address_id = geo.address_id
+  AND l.order_date = geo.order_date
+
+-- Clé produit à la date de commande
+LEFT OUTER JOIN _asof_product prod
+  ON l.product_id = prod.product_id
+  AND l.order_date = prod.order_date;
 
 -- Vérifier la vue temporaire
 SELECT * FROM _tmp_fact_sales LIMIT 10;
@@ -148,6 +278,209 @@ WHEN NOT MATCHED THEN
 
 -- COMMAND ----------
 
+-- MAGIC %md
+-- MAGIC ## Chargement de fact_sales_compact
+-- MAGIC
+-- MAGIC Représentation compacte de `fact_sales` (voir `00_Init`) : montants entiers en unités mineures, clés INT. Seules
+-- MAGIC les lignes de `fact_sales` insérées ou modifiées depuis le dernier chargement (`_tf_update_date` le plus récent de
+-- MAGIC la table) sont converties. La conversion est exacte : l'échelle de chaque unité mineure est celle de la colonne
+-- MAGIC décimale d'origine.
+
+-- COMMAND ----------
+
+DECLARE OR REPLACE hwm_fact_sales_compact TIMESTAMP;
+SET VAR hwm_fact_sales_compact = (SELECT MAX(_tf_update_date) FROM gold.fact_sales_compact);
+
+MERGE INTO gold.fact_sales_compact AS tgt
+USING (
+  SELECT
+    sales_order_id,
+    sales_order_detail_id,
+    _tf_dim_calendar_sk,
+    CAST(_tf_dim_customer_sk AS INT) AS _tf_dim_customer_sk,
+    CAST(_tf_dim_geography_sk AS INT) AS _tf_dim_geography_sk,
+    CAST(_tf_dim_product_sk AS INT) AS _tf_dim_product_sk,
+    sales_order_qty,
+    CAST(sales_unit_price * 10000 AS BIGINT) AS sales_unit_price_e4,
+    CAST(sales_unit_price_discount * 10000 AS SMALLINT) AS sales_unit_price_discount_e4,
+    CAST(sales_line_total * 1000000 AS BIGINT) AS sales_line_total_e6,
+    _tf_update_date
+  FROM gold.fact_sales
+  WHERE hwm_fact_sales_compact IS NULL
+    OR _tf_update_date > hwm_fact_sales_compact
+) AS src
+ON tgt.sales_order_detail_id = src.sales_order_detail_id
+  AND tgt.sales_order_id = src.sales_order_id
+WHEN MATCHED THEN
+  UPDATE SET *
+WHEN NOT MATCHED THEN
+  INSERT *;
+
+-- COMMAND ----------
+
+-- Vue: montants exacts en DECIMAL, aux types de fact_sales
+CREATE OR REPLACE VIEW gold.v_fact_sales_compact AS
+SELECT
+  sales_order_id,
+  sales_order_detail_id,
+  _tf_dim_calendar_sk,
+  CAST(_tf_dim_customer_sk AS BIGINT) AS _tf_dim_customer_sk,
+  CAST(_tf_dim_geography_sk AS BIGINT) AS _tf_dim_geography_sk,
+  CAST(_tf_dim_product_sk AS BIGINT) AS _tf_dim_product_sk,
+  sales_order_qty,
+  CAST(sales_unit_price_e4 * 0.0001 AS DECIMAL(19, 4)) AS sales_unit_price,
+  CAST(sales_unit_price_discount_e4 * 0.0001 AS DECIMAL(19, 4)) AS sales_unit_price_discount,
+  CAST(sales_line_total_e6 * 0.000001 AS DECIMAL(38, 6)) AS sales_line_total,
+  _tf_update_date
+FROM gold.fact_sales_compact;
+
+-- COMMAND ----------
+
+-- Contrôle: les deux représentations ont les mêmes lignes et les mêmes totaux
+-- Pour agréger, sommer les colonnes entières puis convertir le total une seule fois
+SELECT
+  f.row_count = c.row_count AND f.total_sales = c.total_sales AS is_consistent,
+  f.row_count,
+  f.total_sales,
+  c.row_count AS compact_row_count,
+  c.total_sales AS compact_total_sales
+FROM (
+  SELECT COUNT(*) AS row_count, SUM(sales_line_total) AS total_sales FROM gold.fact_sales
+) f
+CROSS JOIN (
+  SELECT COUNT(*) AS row_count, CAST(SUM(sales_line_total_e6) * 0.000001 AS DECIMAL(38, 6)) AS total_sales
+  FROM gold.fact_sales_compact
+) c;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Chargement de fact_sales_order
+-- MAGIC
+-- MAGIC Une ligne par commande, avec les montants de l'en-tête (`sub_total`, `tax_amt`, `freight`, `total_due`) absents
+-- MAGIC de `fact_sales` : les rapports au niveau commande lisent cette table au lieu de réagréger les lignes.
+-- MAGIC
+-- MAGIC Chargement incrémental : seules les commandes dont l'en-tête, le client ou l'adresse de facturation a une nouvelle
+-- MAGIC version depuis le dernier chargement (`_tf_update_date` le plus récent de la table) sont relues. Les clés client et
+-- MAGIC géographie sont celles de la date de commande (vues `_asof_*`).
+
+-- COMMAND ----------
+
+DECLARE OR REPLACE hwm_fact_sales_order TIMESTAMP;
+SET VAR hwm_fact_sales_order = (SELECT MAX(_tf_update_date) FROM gold.fact_sales_order);
+
+CREATE OR REPLACE TEMP VIEW _tmp_fact_sales_order AS
+SELECT
+  -- Business keys
+  CAST(soh.sales_order_id AS INT) AS sales_order_id,
+  soh.sales_order_number,
+
+  -- Dimension foreign keys
+  10000 * YEAR(soh.order_date) + 100 * MONTH(soh.order_date) + DAY(soh.order_date) AS _tf_dim_calendar_sk,
+  10000 * YEAR(soh.due_date) + 100 * MONTH(soh.due_date) + DAY(soh.due_date) AS _tf_dim_due_date_sk,
+  10000 * YEAR(soh.ship_date) + 100 * MONTH(soh.ship_date) + DAY(soh.ship_date) AS _tf_dim_ship_date_sk,
+  COALESCE(cust._tf_dim_customer_sk, -9) AS _tf_dim_customer_sk,
+  COALESCE(geo._tf_dim_geography_sk, -9) AS _tf_dim_geography_sk,
+
+  -- Measures
+  COALESCE(soh.sub_total, 0) AS sales_sub_total,
+  COALESCE(soh.tax_amt, 0) AS sales_tax_amt,
+  COALESCE(soh.freight, 0) AS sales_freight,
+  COALESCE(soh.total_due, 0) AS sales_total_due
+
+FROM silver.sales_order_header soh
+
+-- Clé client à la date de commande
+LEFT OUTER JOIN _asof_customer cust
+  ON soh.customer_id = cust.customer_id
+  AND soh.order_date = cust.order_date
+
+-- Clé géographie (adresse de facturation) à la date de commande
+LEFT OUTER JOIN _asof_geography geo
+  ON soh.bill_to_address_id = geo.address_id
+  AND soh.order_date = geo.order_date
+
+WHERE soh._tf_is_current = TRUE
+  AND (
+    hwm_fact_sales_order IS NULL
+    OR soh._tf_valid_from >= hwm_fact_sales_order
+    OR soh.customer_id IN (
+      SELECT cust_customer_id FROM gold.dim_customer_all WHERE _tf_valid_from >= hwm_fact_sales_order
+    )
+    OR soh.bill_to_address_id IN (
+      SELECT geo_address_id FROM gold.dim_geography_all WHERE _tf_valid_from >= hwm_fact_sales_order
+    )
+  );
+
+SELECT hwm_fact_sales_order, COUNT(*) AS orders_to_merge FROM _tmp_fact_sales_order;
+
+-- COMMAND ----------
+
+MERGE INTO gold.fact_sales_order AS tgt
+USING _tmp_fact_sales_order AS src
+ON tgt.sales_order_id = src.sales_order_id
+
+-- 1) Update existing records when a difference is detected
+WHEN MATCHED AND NOT (
+  tgt.sales_order_number <=> src.sales_order_number AND
+  tgt._tf_dim_calendar_sk <=> src._tf_dim_calendar_sk AND
+  tgt._tf_dim_due_date_sk <=> src._tf_dim_due_date_sk AND
+  tgt._tf_dim_ship_date_sk <=> src._tf_dim_ship_date_sk AND
+  tgt._tf_dim_customer_sk <=> src._tf_dim_customer_sk AND
+  tgt._tf_dim_geography_sk <=> src._tf_dim_geography_sk AND
+  tgt.sales_sub_total <=> src.sales_sub_total AND
+  tgt.sales_tax_amt <=> src.sales_tax_amt AND
+  tgt.sales_freight <=> src.sales_freight AND
+  tgt.sales_total_due <=> src.sales_total_due
+) THEN
+  UPDATE SET
+    tgt.sales_order_number = src.sales_order_number,
+    tgt._tf_dim_calendar_sk = src._tf_dim_calendar_sk,
+    tgt._tf_dim_due_date_sk = src._tf_dim_due_date_sk,
+    tgt._tf_dim_ship_date_sk = src._tf_dim_ship_date_sk,
+    tgt._tf_dim_customer_sk = src._tf_dim_customer_sk,
+    tgt._tf_dim_geography_sk = src._tf_dim_geography_sk,
+    tgt.sales_sub_total = src.sales_sub_total,
+    tgt.sales_tax_amt = src.sales_tax_amt,
+    tgt.sales_freight = src.sales_freight,
+    tgt.sales_total_due = src.sales_total_due,
+    tgt._tf_update_date = load_date
+
+-- 2) Insert new records
+WHEN NOT MATCHED THEN
+  INSERT (
+    sales_order_id,
+    sales_order_number,
+    _tf_dim_calendar_sk,
+    _tf_dim_due_date_sk,
+    _tf_dim_ship_date_sk,
+    _tf_dim_customer_sk,
+    _tf_dim_geography_sk,
+    sales_sub_total,
+    sales_tax_amt,
+    sales_freight,
+    sales_total_due,
+    _tf_create_date,
+    _tf_update_date
+  )
+  VALUES (
+    src.sales_order_id,
+    src.sales_order_number,
+    src._tf_dim_calendar_sk,
+    src._tf_dim_due_date_sk,
+    src._tf_dim_ship_date_sk,
+    src._tf_dim_customer_sk,
+    src._tf_dim_geography_sk,
+    src.sales_sub_total,
+    src.sales_tax_amt,
+    src.sales_freight,
+    src.sales_total_due,
+    load_date,  -- _tf_create_date
+    load_date   -- _tf_update_date
+  );
+
+-- COMMAND ----------
+
 -- MAGIC %md
 -- MAGIC Afficher le résultat du MERGE
 
@@ -165,7 +498,7 @@ SELECT
 
 -- COMMAND ----------
 
--- Vérifier l'intégrité référentielle
+-- Vérifier l'intégrité référentielle (versions archivées par 06 comprises, via les vues `dim_<name>_all`)
 SELECT 
   'Missing Calendar Keys' AS check_type,
   COUNT(*) AS violation_count
@@ -183,7 +516,7 @@ SELECT
   COUNT(*) AS violation_count
 FROM gold.fact_sales f
 WHERE NOT EXISTS (
-  SELECT 1 FROM gold.dim_customer c
+  SELECT 1 FROM gold.dim_customer_all c
   WHERE c._tf_dim_customer_sk = f._tf_dim_customer_sk
 )
 AND f._tf_dim_customer_sk != -9
@@ -195,7 +528,7 @@ SELECT
   COUNT(*) AS violation_count
 FROM gold.fact_sales f
 WHERE NOT EXISTS (
-  SELECT 1 FROM gold.dim_geography g
+  SELECT 1 FROM gold.dim_geography_all g
   WHERE g._tf_dim_geography_sk = f._tf_dim_geography_sk
 )
 AND f._tf_dim_geography_sk != -9
@@ -207,7 +540,7 @@ SELECT
   COUNT(*) AS violation_count
 FROM gold.fact_sales f
 WHERE NOT EXISTS (
-  SELECT 1 FROM gold.dim_product p
+  SELECT 1 FROM gold.dim_product_all p
   WHERE p._tf_dim_product_sk = f._tf_dim_product_sk
 )
 AND f._tf_dim_product_sk != -9;
@@ -547,3 +880,42 @@ GROUP BY
   c.cust_full_name,
   c.cust_company_name,
   c.cust_email_address;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Recherche d'une commande
+-- MAGIC
+-- MAGIC Lignes d'une commande pour le support et les rapprochements. Le filtre d'égalité sur `sales_order_id` est évalué
+-- MAGIC sur l'index Bloom de `fact_sales` (`00_Init`) : seuls les fichiers pouvant contenir la commande sont lus.
+
+-- COMMAND ----------
+
+CREATE OR REPLACE FUNCTION gold.sales_order_lines(order_id INT)
+RETURNS TABLE (
+  sales_order_id INT,
+  sales_order_detail_id INT,
+  _tf_dim_calendar_sk INT,
+  _tf_dim_customer_sk BIGINT,
+  _tf_dim_geography_sk BIGINT,
+  _tf_dim_product_sk BIGINT,
+  sales_order_qty SMALLINT,
+  sales_unit_price DECIMAL(19, 4),
+  sales_unit_price_discount DECIMAL(19, 4),
+  sales_line_total DECIMAL(38, 6)
+)
+COMMENT 'Lines of one sales order in fact_sales'
+RETURN
+  SELECT
+    sales_order_id,
+    sales_order_detail_id,
+    _tf_dim_calendar_sk,
+    _tf_dim_customer_sk,
+    _tf_dim_geography_sk,
+    _tf_dim_product_sk,
+    sales_order_qty,
+    sales_unit_price,
+    sales_unit_price_discount,
+    sales_line_total
+  FROM gold.fact_sales
+  WHERE sales_order_id = order_id;
@@ -0,0 +1,808 @@
+-- Databricks notebook source
+-- MAGIC %md
+-- MAGIC # Archiving the closed versions of the SCD2 tables
+-- MAGIC
+-- MAGIC Les versions fermées depuis plus de `retention_days` jours quittent les tables silver et les dimensions gold SCD2
+-- MAGIC pour une table d'archive `<table>_history`, afin que les tables réécrites par les MERGE quotidiens ne grossissent
+-- MAGIC plus qu'avec le nombre de clés et les changements récents.
+-- MAGIC
+-- MAGIC - Archive: compression zstd, gros fichiers, clustering sur la période de validité et la clé, pas de Change Data Feed.
+-- MAGIC   Le codec est une propriété de la table d'archive (`delta.parquet.compression.codec`): il s'applique aussi aux
+-- MAGIC   fichiers réécrits plus tard par OPTIMIZE ou l'auto-compaction, et ne touche pas les DELETE des tables sources.
+-- MAGIC - Vue `<table>_all`: union de la table et de son archive, l'historique complet reste interrogeable
+-- MAGIC
+-- MAGIC Chaque table est traitée en deux étapes avec la même date limite: insertion dans l'archive des versions absentes,
+-- MAGIC puis suppression dans la table. Relancer le notebook après un échec entre les deux termine le déplacement sans doublons.
+-- MAGIC Seules les versions de l'archive fermées après la plus ancienne version à déplacer (`archive_from`) sont comparées:
+-- MAGIC les fichiers plus anciens sont écartés par les statistiques de `_tf_valid_to` au lieu de relire toute l'archive.
+-- MAGIC
+-- MAGIC Les faits gold référencent aussi les anciennes versions des dimensions: une analyse sur l'historique complet joint
+-- MAGIC `gold.dim_<name>_all` au lieu de `gold.dim_<name>`.
+
+-- COMMAND ----------
+
+USE CATALOG jeromeaymon_lakehouse;
+
+DECLARE OR REPLACE retention_days = 90;
+DECLARE OR REPLACE archive_cutoff = current_timestamp() - make_dt_interval(retention_days);
+-- Plus ancienne version à déplacer pour la table en cours: borne l'anti-doublon de l'archive à la dernière fenêtre
+DECLARE OR REPLACE archive_from TIMESTAMP;
+VALUES archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Silver layer
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.address
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.address_history
+CLUSTER BY (_tf_valid_from, address_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.address archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.address WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.address_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.address_all AS
+SELECT * FROM silver.address
+UNION ALL
+SELECT * FROM silver.address_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.address
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.address_history AS tgt
+USING (
+  SELECT * FROM silver.address
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.address
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.customer
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.customer_history
+CLUSTER BY (_tf_valid_from, customer_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.customer archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.customer WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.customer_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.customer_all AS
+SELECT * FROM silver.customer
+UNION ALL
+SELECT * FROM silver.customer_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.customer
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.customer_history AS tgt
+USING (
+  SELECT * FROM silver.customer
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.customer
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.customeraddress
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.customeraddress_history
+CLUSTER BY (_tf_valid_from, customer_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.customeraddress archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.customeraddress WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.customeraddress_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.customeraddress_all AS
+SELECT * FROM silver.customeraddress
+UNION ALL
+SELECT * FROM silver.customeraddress_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.customeraddress
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.customeraddress_history AS tgt
+USING (
+  SELECT * FROM silver.customeraddress
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.customeraddress
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.sales_order_header
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.sales_order_header_history
+CLUSTER BY (_tf_valid_from, sales_order_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.sales_order_header archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.sales_order_header WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.sales_order_header_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.sales_order_header_all AS
+SELECT * FROM silver.sales_order_header
+UNION ALL
+SELECT * FROM silver.sales_order_header_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.sales_order_header
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.sales_order_header_history AS tgt
+USING (
+  SELECT * FROM silver.sales_order_header
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.sales_order_header
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.sales_order_detail
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.sales_order_detail_history
+CLUSTER BY (_tf_valid_from, sales_order_detail_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.sales_order_detail archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.sales_order_detail WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.sales_order_detail_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.sales_order_detail_all AS
+SELECT * FROM silver.sales_order_detail
+UNION ALL
+SELECT * FROM silver.sales_order_detail_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.sales_order_detail
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.sales_order_detail_history AS tgt
+USING (
+  SELECT * FROM silver.sales_order_detail
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.sales_order_detail
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.product
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.product_history
+CLUSTER BY (_tf_valid_from, product_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.product archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.product WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.product_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.product_all AS
+SELECT * FROM silver.product
+UNION ALL
+SELECT * FROM silver.product_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.product
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.product_history AS tgt
+USING (
+  SELECT * FROM silver.product
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.product
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.productcategory
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.productcategory_history
+CLUSTER BY (_tf_valid_from, product_category_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.productcategory archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.productcategory WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.productcategory_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.productcategory_all AS
+SELECT * FROM silver.productcategory
+UNION ALL
+SELECT * FROM silver.productcategory_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.productcategory
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.productcategory_history AS tgt
+USING (
+  SELECT * FROM silver.productcategory
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.productcategory
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.productdescription
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.productdescription_history
+CLUSTER BY (_tf_valid_from, product_description_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.productdescription archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.productdescription WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.productdescription_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.productdescription_all AS
+SELECT * FROM silver.productdescription
+UNION ALL
+SELECT * FROM silver.productdescription_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.productdescription
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.productdescription_history AS tgt
+USING (
+  SELECT * FROM silver.productdescription
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.productdescription
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.productmodel
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.productmodel_history
+CLUSTER BY (_tf_valid_from, product_model_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.productmodel archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.productmodel WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.productmodel_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.productmodel_all AS
+SELECT * FROM silver.productmodel
+UNION ALL
+SELECT * FROM silver.productmodel_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.productmodel
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.productmodel_history AS tgt
+USING (
+  SELECT * FROM silver.productmodel
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.productmodel
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.productmodelproductdescription
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.productmodelproductdescription_history
+CLUSTER BY (_tf_valid_from, product_model_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.productmodelproductdescription archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.productmodelproductdescription WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.productmodelproductdescription_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.productmodelproductdescription_all AS
+SELECT * FROM silver.productmodelproductdescription
+UNION ALL
+SELECT * FROM silver.productmodelproductdescription_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.productmodelproductdescription
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.productmodelproductdescription_history AS tgt
+USING (
+  SELECT * FROM silver.productmodelproductdescription
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.productmodelproductdescription
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.vgetallcategories
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.vgetallcategories_history
+CLUSTER BY (_tf_valid_from, product_category_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.vgetallcategories archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.vgetallcategories WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.vgetallcategories_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.vgetallcategories_all AS
+SELECT * FROM silver.vgetallcategories
+UNION ALL
+SELECT * FROM silver.vgetallcategories_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.vgetallcategories
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.vgetallcategories_history AS tgt
+USING (
+  SELECT * FROM silver.vgetallcategories
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.vgetallcategories
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.vproductanddescription
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.vproductanddescription_history
+CLUSTER BY (_tf_valid_from, product_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.vproductanddescription archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.vproductanddescription WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.vproductanddescription_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.vproductanddescription_all AS
+SELECT * FROM silver.vproductanddescription
+UNION ALL
+SELECT * FROM silver.vproductanddescription_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.vproductanddescription
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.vproductanddescription_history AS tgt
+USING (
+  SELECT * FROM silver.vproductanddescription
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.vproductanddescription
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of silver.vproductmodelcatalogdescription
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS silver.vproductmodelcatalogdescription_history
+CLUSTER BY (_tf_valid_from, product_model_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of silver.vproductmodelcatalogdescription archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM silver.vproductmodelcatalogdescription WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE silver.vproductmodelcatalogdescription_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS silver.vproductmodelcatalogdescription_all AS
+SELECT * FROM silver.vproductmodelcatalogdescription
+UNION ALL
+SELECT * FROM silver.vproductmodelcatalogdescription_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM silver.vproductmodelcatalogdescription
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO silver.vproductmodelcatalogdescription_history AS tgt
+USING (
+  SELECT * FROM silver.vproductmodelcatalogdescription
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_id = src._tf_id
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM silver.vproductmodelcatalogdescription
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Gold layer
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of gold.dim_geography
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS gold.dim_geography_history
+CLUSTER BY (_tf_valid_from, geo_address_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of gold.dim_geography archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM gold.dim_geography WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE gold.dim_geography_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+-- Remplace la vue provisoire (dimension seule) créée par 07 Data Engineering Gold Aggregates
+CREATE OR REPLACE VIEW gold.dim_geography_all AS
+SELECT * FROM gold.dim_geography
+UNION ALL
+SELECT * FROM gold.dim_geography_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM gold.dim_geography
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO gold.dim_geography_history AS tgt
+USING (
+  SELECT * FROM gold.dim_geography
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_dim_geography_sk = src._tf_dim_geography_sk
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM gold.dim_geography
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of gold.dim_customer
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS gold.dim_customer_history
+CLUSTER BY (_tf_valid_from, cust_customer_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of gold.dim_customer archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM gold.dim_customer WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE gold.dim_customer_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+-- Remplace la vue provisoire (dimension seule) créée par 07 Data Engineering Gold Aggregates
+CREATE OR REPLACE VIEW gold.dim_customer_all AS
+SELECT * FROM gold.dim_customer
+UNION ALL
+SELECT * FROM gold.dim_customer_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM gold.dim_customer
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO gold.dim_customer_history AS tgt
+USING (
+  SELECT * FROM gold.dim_customer
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_dim_customer_sk = src._tf_dim_customer_sk
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM gold.dim_customer
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of gold.dim_product_category
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS gold.dim_product_category_history
+CLUSTER BY (_tf_valid_from, prod_cat_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of gold.dim_product_category archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM gold.dim_product_category WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE gold.dim_product_category_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+CREATE VIEW IF NOT EXISTS gold.dim_product_category_all AS
+SELECT * FROM gold.dim_product_category
+UNION ALL
+SELECT * FROM gold.dim_product_category_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM gold.dim_product_category
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO gold.dim_product_category_history AS tgt
+USING (
+  SELECT * FROM gold.dim_product_category
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_dim_product_category_sk = src._tf_dim_product_category_sk
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM gold.dim_product_category
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Archiving of gold.dim_product
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS gold.dim_product_history
+CLUSTER BY (_tf_valid_from, prod_product_id)
+TBLPROPERTIES (
+  'delta.parquet.compression.codec' = 'zstd',
+  'delta.targetFileSize' = '256mb',
+  'description' = 'Closed versions of gold.dim_product archived by 06 Data Engineering Archive History'
+)
+AS SELECT * FROM gold.dim_product WHERE FALSE;
+
+-- Archives créées avant que le codec soit une propriété de la table
+ALTER TABLE gold.dim_product_history SET TBLPROPERTIES ('delta.parquet.compression.codec' = 'zstd');
+
+-- Remplace la vue provisoire (dimension seule) créée par 07 Data Engineering Gold Aggregates
+CREATE OR REPLACE VIEW gold.dim_product_all AS
+SELECT * FROM gold.dim_product
+UNION ALL
+SELECT * FROM gold.dim_product_history;
+
+-- COMMAND ----------
+
+-- Étape 1: Copier les versions fermées avant la date limite dans l'archive
+SET VAR archive_from = (
+  SELECT MIN(_tf_valid_to) FROM gold.dim_product
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+);
+
+MERGE INTO gold.dim_product_history AS tgt
+USING (
+  SELECT * FROM gold.dim_product
+  WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff
+) AS src
+ON tgt._tf_dim_product_sk = src._tf_dim_product_sk
+  AND tgt._tf_valid_to >= archive_from -- Seule la dernière fenêtre peut contenir des doublons
+WHEN NOT MATCHED THEN INSERT *;
+
+-- Étape 2: Les supprimer de la table
+DELETE FROM gold.dim_product
+WHERE _tf_is_current = FALSE AND _tf_valid_to < archive_cutoff;
@@ -0,0 +1,577 @@
+-- Databricks notebook source
+-- MAGIC %md
+-- MAGIC # Loading the aggregate tables in the Gold layer
+-- MAGIC
+-- MAGIC Les rapports de `Queries` agrègent les lignes de commande à chaque rafraîchissement. Les tables `gold.agg_*`
+-- MAGIC stockent ces agrégats à un grain bien plus petit que `gold.fact_sales` :
+-- MAGIC
+-- MAGIC - `agg_sales_daily_by_customer` : jour × client
+-- MAGIC - `agg_sales_monthly_by_geo` : mois × géographie
+-- MAGIC - `agg_revenue_by_category` : mois × catégorie de produit
+-- MAGIC - `agg_distinct_daily` : jour × géographie × catégorie de produit, esquisses HyperLogLog des clients, commandes et
+-- MAGIC   produits distincts
+-- MAGIC
+-- MAGIC Le nombre de commandes est exact et additif : toutes les lignes d'une commande ont la même date, le même client
+-- MAGIC et la même adresse de facturation, une commande n'est donc comptée que dans un seul groupe jour × client ou
+-- MAGIC mois × géographie. Il n'est pas stocké par catégorie, une commande pouvant en couvrir plusieurs.
+-- MAGIC
+-- MAGIC À exécuter après `05 Data Engineering Gold Fact`.
+
+-- COMMAND ----------
+
+USE CATALOG jeromeaymon_lakehouse;
+USE SCHEMA gold;
+
+DECLARE OR REPLACE load_date = current_timestamp();
+VALUES load_date;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Création des tables
+
+-- COMMAND ----------
+
+CREATE TABLE IF NOT EXISTS gold.agg_sales_daily_by_customer (
+  _tf_dim_calendar_sk INT NOT NULL, -- -9 pour les lignes sans date de commande
+  _tf_dim_customer_sk BIGINT NOT NULL,
+  order_count BIGINT,
+  line_count BIGINT,
+  sales_order_qty BIGINT,
+  sales_gross_amount DECIMAL(38,6), -- Prix unitaire × quantité, avant remise
+  sales_discount_amount DECIMAL(38,6),
+  sales_line_total DECIMAL(38,6),
+  _tf_update_date TIMESTAMP NOT NULL
+)
+CLUSTER BY (_tf_dim_calendar_sk)
+TBLPROPERTIES (
+  'description' = 'Sales aggregated by day and customer, maintained from the changes of fact_sales'
+);
+
+CREATE TABLE IF NOT EXISTS gold.agg_sales_monthly_by_geo (
+  calendar_month INT NOT NULL, -- yyyymm, -9 pour les lignes sans date de commande
+  _tf_dim_geography_sk BIGINT NOT NULL,
+  order_count BIGINT,
+  line_count BIGINT,
+  sales_order_qty BIGINT,
+  sales_gross_amount DECIMAL(38,6),
+  sales_discount_amount DECIMAL(38,6),
+  sales_line_total DECIMAL(38,6),
+  _tf_update_date TIMESTAMP NOT NULL
+)
+CLUSTER BY (calendar_month)
+TBLPROPERTIES (
+  'description' = 'Sales aggregated by month and billing geography, maintained from the changes of fact_sales'
+);
+
+CREATE TABLE IF NOT EXISTS gold.agg_revenue_by_category (
+  calendar_month INT NOT NULL, -- yyyymm, -9 pour les lignes sans date de commande
+  prod_category_id INT NOT NULL, -- Catégorie du produit vendu (dim_product.prod_category_id)
+  line_count BIGINT,
+  sales_order_qty BIGINT,
+  sales_gross_amount DECIMAL(38,6),
+  sales_discount_amount DECIMAL(38,6),
+  sales_line_total DECIMAL(38,6),
+  _tf_update_date TIMESTAMP NOT NULL
+)
+CLUSTER BY (calendar_month)
+TBLPROPERTIES (
+  'description' = 'Sales aggregated by month and product category, maintained from the changes of fact_sales'
+);
+
+CREATE TABLE IF NOT EXISTS gold.agg_distinct_daily (
+  _tf_dim_calendar_sk INT NOT NULL, -- -9 pour les lignes sans date de commande
+  _tf_dim_geography_sk BIGINT NOT NULL,
+  prod_category_id INT NOT NULL,
+  line_count BIGINT,
+  customer_sketch BINARY, -- hll_sketch_agg des _tf_dim_customer_sk, sans le membre inconnu
+  order_sketch BINARY, -- hll_sketch_agg des sales_order_id
+  product_sketch BINARY, -- hll_sketch_agg des prod_product_id
+  _tf_update_date TIMESTAMP NOT NULL
+)
+CLUSTER BY (_tf_dim_calendar_sk)
+TBLPROPERTIES (
+  'description' = 'HyperLogLog sketches of distinct customers, orders and products by day, geography and category'
+);
+
+CREATE TABLE IF NOT EXISTS gold.agg_watermark (
+  source_table STRING NOT NULL, -- Table dont les changements sont lus
+  hwm_value TIMESTAMP, -- Début du dernier rafraîchissement
+  updated_at TIMESTAMP
+);
+
+-- COMMAND ----------
+
+-- Les faits référencent aussi des versions archivées des dimensions : les agrégats et les rapports joignent
+-- `gold.dim_<name>_all`. Tant que `06 Data Engineering Archive History` n'a pas tourné, il n'y a pas d'archive et la vue
+-- se limite à la dimension (06 la remplace par l'union avec `<name>_history`).
+CREATE VIEW IF NOT EXISTS gold.dim_customer_all AS SELECT * FROM gold.dim_customer;
+CREATE VIEW IF NOT EXISTS gold.dim_geography_all AS SELECT * FROM gold.dim_geography;
+CREATE VIEW IF NOT EXISTS gold.dim_product_all AS SELECT * FROM gold.dim_product;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Périodes modifiées
+-- MAGIC
+-- MAGIC Le Change Data Feed de `gold.fact_sales` depuis le dernier rafraîchissement donne les jours touchés, avec les
+-- MAGIC anciennes (`update_preimage`, `delete`) comme les nouvelles valeurs. Seuls les groupes de ces jours et de leurs
+-- MAGIC mois sont recalculés, en ne lisant que les fichiers de ces jours (fact_sales est clusterisée sur
+-- MAGIC `_tf_dim_calendar_sk`). Les changements relus deux fois (`>=`) sont sans effet : le recalcul d'un groupe est
+-- MAGIC idempotent. Sans watermark, tout est recalculé.
+
+-- COMMAND ----------
+
+DECLARE OR REPLACE hwm_fact_sales TIMESTAMP;
+DECLARE OR REPLACE changed_days ARRAY<INT>;
+DECLARE OR REPLACE changed_months ARRAY<INT>;
+
+SET VAR hwm_fact_sales = (
+  SELECT MAX(hwm_value) FROM gold.agg_watermark WHERE source_table = 'gold.fact_sales'
+);
+
+-- Un watermark postérieur au dernier commit donne un résultat vide au lieu d'une erreur
+SET spark.databricks.delta.changeDataFeed.timestampOutOfRange.enabled = true;
+
+SET VAR (changed_days, changed_months) = (
+  SELECT
+    COALESCE(collect_set(COALESCE(_tf_dim_calendar_sk, -9)), array()),
+    COALESCE(collect_set(COALESCE(_tf_dim_calendar_sk DIV 100, -9)), array())
+  FROM table_changes('gold.fact_sales', COALESCE(hwm_fact_sales, load_date))
+);
+
+SELECT hwm_fact_sales, size(changed_days) AS changed_day_count, size(changed_months) AS changed_month_count;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Ventes par jour et par client
+
+-- COMMAND ----------
+
+MERGE INTO gold.agg_sales_daily_by_customer AS tgt
+USING (
+  SELECT
+    COALESCE(_tf_dim_calendar_sk, -9) AS _tf_dim_calendar_sk,
+    _tf_dim_customer_sk,
+    COUNT(DISTINCT sales_order_id) AS order_count,
+    COUNT(*) AS line_count,
+    SUM(sales_order_qty) AS sales_order_qty,
+    SUM(sales_order_qty * sales_unit_price) AS sales_gross_amount,
+    SUM(sales_discount_amount) AS sales_discount_amount,
+    SUM(sales_line_total) AS sales_line_total
+  FROM gold.fact_sales
+  WHERE hwm_fact_sales IS NULL
+    OR _tf_dim_calendar_sk IN (SELECT explode(changed_days))
+    OR (_tf_dim_calendar_sk IS NULL AND array_contains(changed_days, -9))
+  GROUP BY COALESCE(_tf_dim_calendar_sk, -9), _tf_dim_customer_sk
+) AS src
+ON tgt._tf_dim_calendar_sk = src._tf_dim_calendar_sk
+  AND tgt._tf_dim_customer_sk = src._tf_dim_customer_sk
+
+-- Groupe recalculé différent
+WHEN MATCHED AND NOT (
+  tgt.order_count <=> src.order_count AND
+  tgt.line_count <=> src.line_count AND
+  tgt.sales_order_qty <=> src.sales_order_qty AND
+  tgt.sales_gross_amount <=> src.sales_gross_amount AND
+  tgt.sales_discount_amount <=> src.sales_discount_amount AND
+  tgt.sales_line_total <=> src.sales_line_total
+) THEN UPDATE SET
+  tgt.order_count = src.order_count,
+  tgt.line_count = src.line_count,
+  tgt.sales_order_qty = src.sales_order_qty,
+  tgt.sales_gross_amount = src.sales_gross_amount,
+  tgt.sales_discount_amount = src.sales_discount_amount,
+  tgt.sales_line_total = src.sales_line_total,
+  tgt._tf_update_date = load_date
+
+-- Nouveau groupe
+WHEN NOT MATCHED THEN INSERT (
+  _tf_dim_calendar_sk, _tf_dim_customer_sk, order_count, line_count, sales_order_qty,
+  sales_gross_amount, sales_discount_amount, sales_line_total, _tf_update_date
+) VALUES (
+  src._tf_dim_calendar_sk, src._tf_dim_customer_sk, src.order_count, src.line_count, src.sales_order_qty,
+  src.sales_gross_amount, src.sales_discount_amount, src.sales_line_total, load_date
+)
+
+-- Groupe d'un jour recalculé qui n'a plus de lignes
+WHEN NOT MATCHED BY SOURCE AND (hwm_fact_sales IS NULL OR array_contains(changed_days, tgt._tf_dim_calendar_sk)) THEN
+  DELETE;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Ventes par mois et par géographie
+
+-- COMMAND ----------
+
+MERGE INTO gold.agg_sales_monthly_by_geo AS tgt
+USING (
+  SELECT
+    COALESCE(_tf_dim_calendar_sk DIV 100, -9) AS calendar_month,
+    _tf_dim_geography_sk,
+    COUNT(DISTINCT sales_order_id) AS order_count,
+    COUNT(*) AS line_count,
+    SUM(sales_order_qty) AS sales_order_qty,
+    SUM(sales_order_qty * sales_unit_price) AS sales_gross_amount,
+    SUM(sales_discount_amount) AS sales_discount_amount,
+    SUM(sales_line_total) AS sales_line_total
+  FROM gold.fact_sales
+  WHERE hwm_fact_sales IS NULL
+    OR _tf_dim_calendar_sk DIV 100 IN (SELECT explode(changed_months))
+    OR (_tf_dim_calendar_sk IS NULL AND array_contains(changed_months, -9))
+  GROUP BY COALESCE(_tf_dim_calendar_sk DIV 100, -9), _tf_dim_geography_sk
+) AS src
+ON tgt.calendar_month = src.calendar_month
+  AND tgt._tf_dim_geography_sk = src._tf_dim_geography_sk
+
+WHEN MATCHED AND NOT (
+  tgt.order_count <=> src.order_count AND
+  tgt.line_count <=> src.line_count AND
+  tgt.sales_order_qty <=> src.sales_order_qty AND
+  tgt.sales_gross_amount <=> src.sales_gross_amount AND
+  tgt.sales_discount_amount <=> src.sales_discount_amount AND
+  tgt.sales_line_total <=> src.sales_line_total
+) THEN UPDATE SET
+  tgt.order_count = src.order_count,
+  tgt.line_count = src.line_count,
+  tgt.sales_order_qty = src.sales_order_qty,
+  tgt.sales_gross_amount = src.sales_gross_amount,
+  tgt.sales_discount_amount = src.sales_discount_amount,
+  tgt.sales_line_total = src.sales_line_total,
+  tgt._tf_update_date = load_date
+
+WHEN NOT MATCHED THEN INSERT (
+  calendar_month, _tf_dim_geography_sk, order_count, line_count, sales_order_qty,
+  sales_gross_amount, sales_discount_amount, sales_line_total, _tf_update_date
+) VALUES (
+  src.calendar_month, src._tf_dim_geography_sk, src.order_count, src.line_count, src.sales_order_qty,
+  src.sales_gross_amount, src.sales_discount_amount, src.sales_line_total, load_date
+)
+
+WHEN NOT MATCHED BY SOURCE AND (hwm_fact_sales IS NULL OR array_contains(changed_months, tgt.calendar_month)) THEN
+  DELETE;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Chiffre d'affaires par mois et par catégorie
+-- MAGIC
+-- MAGIC La catégorie est celle de la version du produit référencée par la ligne (`dim_product` est SCD2, la catégorie
+-- MAGIC d'une version ne change pas), cherchée dans `dim_product_all` : la version peut être archivée.
+
+-- COMMAND ----------
+
+MERGE INTO gold.agg_revenue_by_category AS tgt
+USING (
+  SELECT
+    COALESCE(f._tf_dim_calendar_sk DIV 100, -9) AS calendar_month,
+    COALESCE(p.prod_category_id, 0) AS prod_category_id,
+    COUNT(*) AS line_count,
+    SUM(f.sales_order_qty) AS sales_order_qty,
+    SUM(f.sales_order_qty * f.sales_unit_price) AS sales_gross_amount,
+    SUM(f.sales_discount_amount) AS sales_discount_amount,
+    SUM(f.sales_line_total) AS sales_line_total
+  FROM gold.fact_sales f
+  LEFT JOIN gold.dim_product_all p
+    ON f._tf_dim_product_sk = p._tf_dim_product_sk
+  WHERE hwm_fact_sales IS NULL
+    OR f._tf_dim_calendar_sk DIV 100 IN (SELECT explode(changed_months))
+    OR (f._tf_dim_calendar_sk IS NULL AND array_contains(changed_months, -9))
+  GROUP BY COALESCE(f._tf_dim_calendar_sk DIV 100, -9), COALESCE(p.prod_category_id, 0)
+) AS src
+ON tgt.calendar_month = src.calendar_month
+  AND tgt.prod_category_id = src.prod_category_id
+
+WHEN MATCHED AND NOT (
+  tgt.line_count <=> src.line_count AND
+  tgt.sales_order_qty <=> src.sales_order_qty AND
+  tgt.sales_gross_amount <=> src.sales_gross_amount AND
+  tgt.sales_discount_amount <=> src.sales_discount_amount AND
+  tgt.sales_line_total <=> src.sales_line_total
+) THEN UPDATE SET
+  tgt.line_count = src.line_count,
+  tgt.sales_order_qty = src.sales_order_qty,
+  tgt.sales_gross_amount = src.sales_gross_amount,
+  tgt.sales_discount_amount = src.sales_discount_amount,
+  tgt.sales_line_total = src.sales_line_total,
+  tgt._tf_update_date = load_date
+
+WHEN NOT MATCHED THEN INSERT (
+  calendar_month, prod_category_id, line_count, sales_order_qty,
+  sales_gross_amount, sales_discount_amount, sales_line_total, _tf_update_date
+) VALUES (
+  src.calendar_month, src.prod_category_id, src.line_count, src.sales_order_qty,
+  src.sales_gross_amount, src.sales_discount_amount, src.sales_line_total, load_date
+)
+
+WHEN NOT MATCHED BY SOURCE AND (hwm_fact_sales IS NULL OR array_contains(changed_months, tgt.calendar_month)) THEN
+  DELETE;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Comptages distincts par jour, géographie et catégorie
+-- MAGIC
+-- MAGIC Un `COUNT(DISTINCT ...)` ne s'additionne pas : les clients distincts d'un mois ne sont pas la somme de ceux de ses
+-- MAGIC jours, et chaque période demande de relire et d'échanger (shuffle) toutes les lignes. Une esquisse HyperLogLog
+-- MAGIC (`hll_sketch_agg`, quelques Ko) résume les valeurs distinctes d'un groupe et se fusionne avec celles des autres
+-- MAGIC groupes (`hll_union_agg`) : les clients, commandes et produits distincts de n'importe quelle plage de jours et de
+-- MAGIC n'importe quelle sélection de géographies ou de catégories sont l'union des esquisses de ses groupes, estimée par
+-- MAGIC `hll_sketch_estimate` (erreur relative d'environ 1,6 % avec `lgConfigK` = 12, la valeur par défaut).
+-- MAGIC
+-- MAGIC Les produits sont comptés par `prod_product_id` : les versions SCD2 d'un même produit ne comptent qu'une fois.
+-- MAGIC
+-- MAGIC La table partage le watermark de `gold.fact_sales` avec les autres agrégats : vide (première exécution, ou
+-- MAGIC ajoutée après eux), elle est recalculée entièrement au lieu de ne recevoir que les jours modifiés.
+
+-- COMMAND ----------
+
+DECLARE OR REPLACE distinct_daily_full BOOLEAN;
+SET VAR distinct_daily_full = (
+  SELECT hwm_fact_sales IS NULL OR COUNT(*) = 0 FROM (SELECT 1 FROM gold.agg_distinct_daily LIMIT 1)
+);
+
+MERGE INTO gold.agg_distinct_daily AS tgt
+USING (
+  SELECT
+    COALESCE(f._tf_dim_calendar_sk, -9) AS _tf_dim_calendar_sk,
+    f._tf_dim_geography_sk,
+    COALESCE(p.prod_category_id, 0) AS prod_category_id,
+    COUNT(*) AS line_count,
+    hll_sketch_agg(NULLIF(f._tf_dim_customer_sk, -9)) AS customer_sketch,
+    hll_sketch_agg(f.sales_order_id) AS order_sketch,
+    hll_sketch_agg(p.prod_product_id) AS product_sketch
+  FROM gold.fact_sales f
+  LEFT JOIN gold.dim_product_all p
+    ON f._tf_dim_product_sk = p._tf_dim_product_sk
+    AND p._tf_dim_product_sk != -9
+  WHERE distinct_daily_full
+    OR f._tf_dim_calendar_sk IN (SELECT explode(changed_days))
+    OR (f._tf_dim_calendar_sk IS NULL AND array_contains(changed_days, -9))
+  GROUP BY COALESCE(f._tf_dim_calendar_sk, -9), f._tf_dim_geography_sk, COALESCE(p.prod_category_id, 0)
+) AS src
+ON tgt._tf_dim_calendar_sk = src._tf_dim_calendar_sk
+  AND tgt._tf_dim_geography_sk = src._tf_dim_geography_sk
+  AND tgt.prod_category_id = src.prod_category_id
+
+WHEN MATCHED AND NOT (
+  tgt.line_count <=> src.line_count AND
+  tgt.customer_sketch <=> src.customer_sketch AND
+  tgt.order_sketch <=> src.order_sketch AND
+  tgt.product_sketch <=> src.product_sketch
+) THEN UPDATE SET
+  tgt.line_count = src.line_count,
+  tgt.customer_sketch = src.customer_sketch,
+  tgt.order_sketch = src.order_sketch,
+  tgt.product_sketch = src.product_sketch,
+  tgt._tf_update_date = load_date
+
+WHEN NOT MATCHED THEN INSERT (
+  _tf_dim_calendar_sk, _tf_dim_geography_sk, prod_category_id, line_count,
+  customer_sketch, order_sketch, product_sketch, _tf_update_date
+) VALUES (
+  src._tf_dim_calendar_sk, src._tf_dim_geography_sk, src.prod_category_id, src.line_count,
+  src.customer_sketch, src.order_sketch, src.product_sketch, load_date
+)
+
+WHEN NOT MATCHED BY SOURCE AND (distinct_daily_full OR array_contains(changed_days, tgt._tf_dim_calendar_sk)) THEN
+  DELETE;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ### Mise à jour du watermark
+-- MAGIC
+-- MAGIC Début de ce rafraîchissement : les commits de fact_sales arrivés pendant celui-ci seront relus la prochaine fois.
+
+-- COMMAND ----------
+
+MERGE INTO gold.agg_watermark AS tgt
+USING (SELECT 'gold.fact_sales' AS source_table, load_date AS hwm_value) AS src
+ON tgt.source_table = src.source_table
+WHEN MATCHED THEN UPDATE SET
+  tgt.hwm_value = src.hwm_value,
+  tgt.updated_at = current_timestamp()
+WHEN NOT MATCHED THEN INSERT (source_table, hwm_value, updated_at)
+  VALUES (src.source_table, src.hwm_value, current_timestamp());
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ## Routage des rapports
+-- MAGIC
+-- MAGIC Chaque vue `gold.rpt_*` répond à une requête de `Queries` depuis le plus petit agrégat qui suffit :
+-- MAGIC
+-- MAGIC | Requête | Vue | Source |
+-- MAGIC |---|---|---|
+-- MAGIC | `02_sales_by_customer` | `rpt_sales_by_customer` | `agg_sales_daily_by_customer` |
+-- MAGIC | `05_total_revenue` | `rpt_total_revenue` | `fact_sales_order` (une ligne par commande) |
+-- MAGIC | `06_sell_by_region` | `rpt_sales_by_region` | `agg_sales_monthly_by_geo` |
+-- MAGIC | `07_nbproducts_by_category` | `rpt_products_by_category` | `dim_product` (déjà au grain produit) |
+-- MAGIC | `08_top_3_client` | `rpt_top_clients` | `fact_sales_order` |
+-- MAGIC | `09_revenu_par_categorie` | `rpt_revenue_by_category` | `agg_revenue_by_category` |
+-- MAGIC
+-- MAGIC Le chiffre d'affaires des commandes (`total_due`, taxes et frais de port compris) n'existe qu'au niveau en-tête :
+-- MAGIC `05_total_revenue` et `08_top_3_client` lisent `fact_sales_order`, qui reste bien plus petite que `fact_sales`.
+-- MAGIC
+-- MAGIC `rpt_revenue_by_category_rollup` et `rpt_products_by_category_rollup` cumulent les mêmes mesures à chaque niveau de
+-- MAGIC la hiérarchie des catégories, par une équi-jointure sur `dim_product_category_closure` (maintenue par
+-- MAGIC `04 Data Engineering Gold Dim`).
+
+-- COMMAND ----------
+
+CREATE OR REPLACE VIEW gold.rpt_total_revenue AS
+SELECT SUM(sales_total_due) AS total_revenue
+FROM gold.fact_sales_order;
+
+-- COMMAND ----------
+
+CREATE OR REPLACE VIEW gold.rpt_sales_by_customer AS
+SELECT
+  c.cust_last_name AS nom,
+  c.cust_first_name AS prenom,
+  COALESCE(SUM(a.order_count), 0) AS nb_orders
+FROM gold.dim_customer_all c
+LEFT JOIN (
+  SELECT _tf_dim_customer_sk, SUM(order_count) AS order_count
+  FROM gold.agg_sales_daily_by_customer
+  GROUP BY _tf_dim_customer_sk
+) a
+  ON c._tf_dim_customer_sk = a._tf_dim_customer_sk
+WHERE c._tf_dim_customer_sk != -9
+GROUP BY c.cust_last_name, c.cust_first_name;
+
+-- COMMAND ----------
+
+CREATE OR REPLACE VIEW gold.rpt_top_clients AS
+SELECT
+  c.cust_first_name AS prenom,
+  c.cust_last_name AS nom,
+  SUM(o.sales_total_due) AS total
+FROM gold.fact_sales_order o
+INNER JOIN gold.dim_customer_all c
+  ON o._tf_dim_customer_sk = c._tf_dim_customer_sk
+WHERE o._tf_dim_customer_sk != -9
+GROUP BY c.cust_first_name, c.cust_last_name;
+
+-- COMMAND ----------
+
+CREATE OR REPLACE VIEW gold.rpt_sales_by_region AS
+SELECT
+  g.geo_state_province AS region,
+  SUM(a.order_count) AS nombre_commandes
+FROM gold.agg_sales_monthly_by_geo a
+INNER JOIN gold.dim_geography_all g
+  ON a._tf_dim_geography_sk = g._tf_dim_geography_sk
+WHERE a._tf_dim_geography_sk != -9
+GROUP BY g.geo_state_province;
+
+-- COMMAND ----------
+
+CREATE OR REPLACE VIEW gold.rpt_revenue_by_category AS
+SELECT
+  COALESCE(pc.prod_cat_name, 'Unknown') AS categorie,
+  SUM(a.sales_gross_amount) AS total_revenue
+FROM gold.agg_revenue_by_category a
+LEFT JOIN gold.dim_product_category pc
+  ON a.prod_category_id = pc.prod_cat_id
+  AND pc._tf_is_current = TRUE
+GROUP BY COALESCE(pc.prod_cat_name, 'Unknown');
+
+-- COMMAND ----------
+
+-- Cumul à chaque niveau de la hiérarchie : une catégorie reçoit le chiffre d'affaires de tous ses descendants
+CREATE OR REPLACE VIEW gold.rpt_revenue_by_category_rollup AS
+SELECT
+  pc.prod_cat_level AS niveau,
+  pc.prod_cat_hierarchy_path AS categorie,
+  SUM(a.sales_gross_amount) AS total_revenue
+FROM gold.agg_revenue_by_category a
+INNER JOIN gold.dim_product_category_closure cl
+  ON a.prod_category_id = cl.descendant_cat_id
+INNER JOIN gold.dim_product_category pc
+  ON cl.ancestor_cat_id = pc.prod_cat_id
+  AND pc._tf_is_current = TRUE
+GROUP BY pc.prod_cat_level, pc.prod_cat_hierarchy_path;
+
+-- COMMAND ----------
+
+CREATE OR REPLACE VIEW gold.rpt_products_by_category AS
+SELECT
+  prod_category_name AS categorie,
+  COUNT(*) AS nb_products
+FROM gold.dim_product
+WHERE _tf_is_current = TRUE
+  AND _tf_dim_product_sk != -9
+GROUP BY prod_category_name;
+
+-- COMMAND ----------
+
+CREATE OR REPLACE VIEW gold.rpt_products_by_category_rollup AS
+SELECT
+  pc.prod_cat_level AS niveau,
+  pc.prod_cat_hierarchy_path AS categorie,
+  COUNT(*) AS nb_products
+FROM gold.dim_product p
+INNER JOIN gold.dim_product_category_closure cl
+  ON p.prod_category_id = cl.descendant_cat_id
+INNER JOIN gold.dim_product_category pc
+  ON cl.ancestor_cat_id = pc.prod_cat_id
+  AND pc._tf_is_current = TRUE
+WHERE p._tf_is_current = TRUE
+  AND p._tf_dim_product_sk != -9
+GROUP BY pc.prod_cat_level, pc.prod_cat_hierarchy_path;
+
+-- COMMAND ----------
+
+-- MAGIC %md
+-- MAGIC ### Comptages distincts approchés
+-- MAGIC
+-- MAGIC `rpt_distinct_monthly` fusionne les esquisses journalières par mois. `gold.distinct_counts` donne les comptages
+-- MAGIC d'une plage de dates quelconque, éventuellement limitée à un pays ou à une catégorie (et ses sous-catégories, par
+-- MAGIC `dim_product_category_closure`) : seules les lignes de `agg_distinct_daily` de la plage sont lues.
+
+-- COMMAND ----------
+
+CREATE OR REPLACE VIEW gold.rpt_distinct_monthly AS
+SELECT
+  _tf_dim_calendar_sk DIV 100 AS calendar_month,
+  hll_sketch_estimate(hll_union_agg(customer_sketch)) AS distinct_customers,
+  hll_sketch_estimate(hll_union_agg(order_sketch)) AS distinct_orders,
+  hll_sketch_estimate(hll_union_agg(product_sketch)) AS distinct_products
+FROM gold.agg_distinct_daily
+WHERE _tf_dim_calendar_sk != -9
+GROUP BY _tf_dim_calendar_sk DIV 100;
+
+-- COMMAND ----------
+
+CREATE OR REPLACE FUNCTION gold.distinct_counts(
+  from_date DATE,
+  to_date DATE,
+  country STRING DEFAULT NULL, -- geo_country_region, NULL pour tous les pays
+  category_id INT DEFAULT NULL -- prod_cat_id, sous-catégories comprises, NULL pour toutes
+)
+RETURNS TABLE (distinct_customers BIGINT, distinct_orders BIGINT, distinct_products BIGINT)
+COMMENT 'Approximate distinct customers, orders and products between two dates, from the daily HyperLogLog sketches'
+RETURN
+  SELECT
+    hll_sketch_estimate(hll_union_agg(a.customer_sketch)) AS distinct_customers,
+    hll_sketch_estimate(hll_union_agg(a.order_sketch)) AS distinct_orders,
+    hll_sketch_estimate(hll_union_agg(a.product_sketch)) AS distinct_products
+  FROM gold.agg_distinct_daily a
+  WHERE a._tf_dim_calendar_sk BETWEEN CAST(date_format(from_date, 'yyyyMMdd') AS INT)
+      AND CAST(date_format(to_date, 'yyyyMMdd') AS INT)
+    AND (
+      country IS NULL
+      OR a._tf_dim_geography_sk IN (
+        SELECT _tf_dim_geography_sk FROM gold.dim_geography_all WHERE geo_country_region = country
+      )
+    )
+    AND (
+      category_id IS NULL
+      OR a.prod_category_id IN (
+        SELECT descendant_cat_id FROM gold.dim_product_category_closure WHERE ancestor_cat_id = category_id
+      )
+    );